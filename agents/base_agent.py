@@ -1,63 +1,336 @@
 from abc import ABC, abstractmethod
-from langchain_ollama import OllamaLLM
-from langchain_groq import ChatGroq
-from langchain_anthropic import ChatAnthropic
-from langchain.schema.messages import HumanMessage
+from typing import List, Optional
+import asyncio
+import time
+from langchain_core.messages import HumanMessage
 from utils.config import Config
-import chainlit as cl
+from utils import session
+from utils.metrics import llm_metrics, failover_metrics, estimate_tokens
+from utils.prompt_builder import RenderedPrompt
+from utils.providers import CHAT_PROVIDERS, ProviderUnavailable, provider_pool
+from utils import cancellation, deadline, tracing
+
+# Appended to an answer whose LLM stream was cut off at its time budget
+TRUNCATED_NOTE = "\n\n[Answer cut short: the time budget for this query ran out]"
+# Appended when the provider failed after part of the answer had been streamed
+INTERRUPTED_NOTE = "\n\n[Answer cut short: the model provider stopped responding]"
+
+
+class _Replay:
+    """Async iterator over a stream whose first chunk was already read (None for an empty stream)"""
+
+    def __init__(self, first, stream):
+        self.first = first
+        self.stream = stream
+        self.started = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.started:
+            self.started = True
+            if self.first is not None:
+                return self.first
+            raise StopAsyncIteration
+        return await self.stream.__anext__()
+
+    async def aclose(self):
+        await self.stream.aclose()
+
 
 class BaseAgent(ABC):
-    def __init__(self, name: str, callbacks=None):
+    def __init__(self, name: str, role: Optional[str] = None, stream=None):
         self.name = name
-        self.callbacks = callbacks or []
+        # Model role from Config.model_config.roles; agents default to their own name
+        self.role = role or name
+        # StreamMultiplexer routing this agent's start/end and token events to the current request's dispatcher
+        self.stream = stream
+        self.role_llms = {}
         self.llm = self._initialize_llm()
         
-    def _initialize_llm(self):
-        if Config.model_config.provider == "anthropic":
+    def _initialize_llm(self, role: Optional[str] = None, provider: Optional[str] = None):
+        role = role or self.role
+        settings = Config.model_config.for_provider(role, provider) if provider else Config.model_config.for_role(role)
+        token_cap = {"max_tokens": settings.max_tokens} if settings.max_tokens else {}
+        timeout = Config.deadline_config.llm_timeout
+        
+        # Provider SDKs are imported on first use, only the configured ones are ever loaded
+        if settings.provider == "anthropic":
+            from langchain_anthropic import ChatAnthropic
             return ChatAnthropic(
                 api_key=Config.model_config.anthropic_api_key,
-                model_name=Config.model_config.anthropic_model_name,
-                callbacks=self.callbacks,
-                streaming=True
+                model_name=settings.model_name,
+                streaming=True,
+                default_request_timeout=timeout,
+                **token_cap
             )
-        elif Config.model_config.provider == "groq":
+        elif settings.provider == "groq":
+            from langchain_groq import ChatGroq
             return ChatGroq(
                 api_key=Config.model_config.groq_api_key,
-                model_name=Config.model_config.groq_model_name,
-                callbacks=self.callbacks,
-                streaming=True
+                model_name=settings.model_name,
+                streaming=True,
+                request_timeout=timeout,
+                **token_cap
             )
-        elif Config.model_config.provider == "ollama":
+        elif settings.provider == "ollama":
+            from langchain_ollama import OllamaLLM
             return OllamaLLM(
-                model=Config.model_config.model_name,
-                callbacks=self.callbacks
+                model=settings.model_name,
+                client_kwargs={"timeout": timeout},
+                **({"num_predict": settings.max_tokens} if settings.max_tokens else {})
             )
         else:
-            raise ValueError(f"Unknown provider: {Config.model_config.provider}")
+            raise ValueError(f"Unknown provider: {settings.provider}")
+
+    def _llm_for(self, role: Optional[str], provider: Optional[str] = None):
+        """Get the LLM bound to a role, or the role's LLM on a failover provider, creating it on first use"""
+        role = role or self.role
+        if provider is None or provider == Config.model_config.for_role(role).provider:
+            if role == self.role:
+                return self.llm
+            key = role
+        else:
+            key = (role, provider)
+        if key not in self.role_llms:
+            self.role_llms[key] = self._initialize_llm(role, provider)
+        return self.role_llms[key]
+
+    def _llm_input(self, prompt: str, role: str, provider: Optional[str] = None):
+        """Chat providers take a message list, ollama takes the raw prompt"""
+        provider = provider or Config.model_config.for_role(role).provider
+        if provider in CHAT_PROVIDERS:
+            if isinstance(prompt, RenderedPrompt):
+                # Static instructions go in the system message; Anthropic caches it across calls
+                return prompt.messages(cache=provider == "anthropic" and Config.prompt_config.cache_static)
+            return [HumanMessage(content=prompt)]
+        return prompt
+
+    def _providers(self, role: str) -> List[str]:
+        """Providers to try for a role, in order; raises when every circuit is open"""
+        providers = provider_pool.candidates(role)
+        if not providers:
+            raise ProviderUnavailable(f"No LLM provider available for {role}, every circuit is open")
+        return providers
+
+    def _note_provider(self, role: str, provider: str) -> None:
+        """Tag the LLM span with the provider that answered and count failovers"""
+        primary = Config.model_config.for_role(role).provider
+        tracing.annotate(provider=provider, failover=provider != primary)
+        if provider != primary:
+            failover_metrics.failover(role, primary, provider)
         
-    def _invoke_llm(self, prompt: str) -> str:
-        """Invoke LLM with consistent callbacks"""
+    def _invoke_llm(self, prompt: str, role: Optional[str] = None) -> str:
+        """Invoke LLM, failing over to the next provider on errors"""
+        role = role or self.role
+        with self._llm_span(role):
+            start = time.perf_counter()
+            try:
+                cancellation.checkpoint("llm")
+                error = None
+                for provider in self._providers(role):
+                    try:
+                        llm_input = self._llm_input(prompt, role, provider)
+                        response = self._llm_for(role, provider).invoke(llm_input)
+                    except Exception as e:
+                        provider_pool.failure(provider, e)
+                        error = e
+                        continue
+                    provider_pool.success(provider)
+                    self._note_provider(role, provider)
+                    text = self._chunk_text(response)
+                    self._record_metrics(role, start, prompt, text, response)
+                    return text
+                raise error
+                
+            except Exception as e:
+                return self._llm_error(role, start, prompt, e)
+
+    async def _ainvoke_llm(self, prompt: str, role: Optional[str] = None) -> str:
+        """Invoke LLM without blocking the event loop; fails over and hedges across providers"""
+        role = role or self.role
+        with self._llm_span(role):
+            start = time.perf_counter()
+            first_token_at = None
+            chunks = []
+            final = None
+            note = ""
+            try:
+                cancellation.checkpoint("llm")
+                # Capped to what is left of the current deadline stage
+                async with asyncio.timeout(deadline.cap(Config.deadline_config.llm_timeout)):
+                    provider, stream = await self._aopen_stream(prompt, role)
+                    self._note_provider(role, provider)
+                    try:
+                        async for chunk in stream:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            text = self._chunk_text(chunk)
+                            chunks.append(text)
+                            await self._emit_token(text, role)
+                            if not isinstance(chunk, str):
+                                final = chunk if final is None else final + chunk
+                    except Exception as e:
+                        provider_pool.failure(provider, e)
+                        if not chunks:
+                            raise
+                        # The provider broke off mid-answer; the reader already saw what was streamed
+                        note = INTERRUPTED_NOTE
+                        await self._emit_token(note, role)
+                    else:
+                        provider_pool.success(provider)
+                    finally:
+                        # Closes the provider request when cut off by the deadline or a stop
+                        await stream.aclose()
+                text = "".join(chunks) + note
+                first_token_latency = first_token_at - start if first_token_at else None
+                self._record_metrics(role, start, prompt, text, final, first_token_latency)
+                return text
+
+            except TimeoutError:
+                if not chunks:
+                    return self._llm_error(role, start, prompt, TimeoutError("LLM call timed out"))
+                # Keep what was streamed, the reader already saw it
+                deadline.truncated()
+                tracing.annotate(truncated=True)
+                await self._emit_token(TRUNCATED_NOTE, role)
+                text = "".join(chunks) + note + TRUNCATED_NOTE
+                self._record_metrics(role, start, prompt, text, final, first_token_at - start)
+                return text
+            except asyncio.CancelledError:
+                # Stopped mid-stream: the provider request is closed with the generator
+                cancellation.note("llm")
+                raise
+            except Exception as e:
+                return self._llm_error(role, start, prompt, e)
+
+    async def _emit_token(self, token: str, role: Optional[str] = None):
+        """Stream a token into this agent's message outside of an LLM call"""
+        if self.stream:
+            await self.stream.emit("token", self.name, role=role or self.role, token=token)
+
+    async def _aopen_stream(self, prompt: str, role: str):
+        """(provider, stream) from the first provider to produce a token; a slow one is hedged, a failed one skipped"""
+        queue = self._providers(role)
+        hedging = Config.failover_config.hedge
+        attempts = {}
+        hedged = set()
+        error = None
+
+        def launch(hedge: bool = False):
+            provider = queue.pop(0)
+            attempts[asyncio.create_task(self._afirst_chunk(prompt, role, provider))] = provider
+            if hedge:
+                hedged.add(provider)
+
+        launch()
         try:
-            if Config.model_config.provider in ["groq", "anthropic"]:
-                for callback in self.callbacks:
-                    if hasattr(callback, 'on_llm_start'):
-                        callback.on_llm_start(metadata={'agent_name': self.name})
-                    
-                response = self.llm.invoke(
-                    [HumanMessage(content=prompt)]
-                )
-                return response.content
-            else:
-                return self.llm.invoke(prompt)
-            
-        except Exception as e:
-            print(f"\nError invoking LLM: {str(e)}")
-            return f"Error: {str(e)}"
+            while attempts:
+                # Only one hedge at a time: wait for the first token as long as the lone attempt usually takes
+                timeout = None
+                if hedging and queue and len(attempts) == 1:
+                    timeout = provider_pool.health(next(iter(attempts.values()))).hedge_delay()
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch(hedge=True)
+                    continue
+                for task in done:
+                    provider = attempts.pop(task)
+                    try:
+                        stream = task.result()
+                    except Exception as e:
+                        provider_pool.failure(provider, e)
+                        error = e
+                        if provider in hedged:
+                            failover_metrics.hedge(provider, won=False)
+                        continue
+                    if hedged:
+                        for hedge_provider in hedged:
+                            failover_metrics.hedge(hedge_provider, won=hedge_provider == provider)
+                    return provider, stream
+                if queue and not attempts:
+                    launch()
+            raise error
+        finally:
+            # Losers are cancelled; one that also produced a token has its stream closed
+            for task in attempts:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    asyncio.ensure_future(task.result().aclose())
+                else:
+                    task.cancel()
+
+    async def _afirst_chunk(self, prompt: str, role: str, provider: str):
+        """Open a provider's stream and wait for its first chunk; returns a stream that replays it"""
+        started = time.perf_counter()
+        stream = self._llm_for(role, provider).astream(self._llm_input(prompt, role, provider))
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await stream.aclose()
+            raise
+        provider_pool.health(provider).record_ttft(time.perf_counter() - started)
+        return _Replay(first, stream)
+
+    def _llm_span(self, role: str):
+        """Tracing span for one LLM call; _record_metrics fills in timings and tokens"""
+        settings = Config.model_config.for_role(role)
+        return tracing.span(
+            "llm.invoke",
+            agent=self.name,
+            role=role,
+            provider=settings.provider,
+            model=settings.model_name
+        )
+
+    def _llm_error(self, role: str, start: float, prompt: str, error: Exception) -> str:
+        """Record a failed LLM call and return the error string agents expect"""
+        llm_metrics.record(role, time.perf_counter() - start, estimate_tokens(prompt), 0, error=True)
+        tracing.mark_error(str(error))
+        print(f"\nError invoking LLM: {str(error)}")
+        return f"Error: {str(error)}"
+
+    def _record_metrics(self, role: str, start: float, prompt: str, text: str, message=None,
+                        first_token_latency: Optional[float] = None) -> None:
+        """Record per-role latency and tokens, preferring provider-reported usage"""
+        usage = getattr(message, "usage_metadata", None) or {}
+        latency = time.perf_counter() - start
+        input_tokens = usage.get("input_tokens") or estimate_tokens(prompt)
+        output_tokens = usage.get("output_tokens") or estimate_tokens(text)
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        sections = getattr(prompt, "sections", None)
+        llm_metrics.record(role, latency, input_tokens, output_tokens, first_token_latency=first_token_latency,
+                           cached_tokens=cached_tokens, sections=sections)
+        tracing.annotate(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_input_tokens=cached_tokens,
+            ttft_s=first_token_latency,
+            tokens_per_second=output_tokens / latency if latency else None,
+            **{f"prompt.{name}_tokens": tokens for name, tokens in (sections or {}).items()}
+        )
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Extract text from an LLM output (str for LLMs, message/chunk for chat models)"""
+        if isinstance(chunk, str):
+            return chunk
+        content = chunk.content
+        if isinstance(content, list):
+            return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        return content
     
-    def _get_memory_context(self) -> str:
-        """Get memory context for this agent"""
+    def _get_memory_context(self, query: Optional[str] = None):
+        """Get memory context for this agent (only turns relevant to query with MEMORY_RETRIEVAL)"""
         try:
-            memory_manager = cl.user_session.get("memory_manager")
+            memory_manager = session.get("memory_manager")
+            settings = Config.memory_config
+            if memory_manager and query and settings.retrieval:
+                return memory_manager.relevant_history(
+                    self.name, query, settings.retrieval_k, settings.retrieval_recent
+                )
             if memory_manager:
                 memory_vars = memory_manager.get_memory(self.name)
                 history_key = f"{self.name}_history"
@@ -72,10 +345,24 @@ class BaseAgent(ABC):
             print(f"Error getting memory: {str(e)}")
             return ""
         
+    async def _aget_memory_context(self, query: str):
+        """Async variant of _get_memory_context; embedding the query runs off the event loop"""
+        if Config.memory_config.retrieval:
+            return await asyncio.to_thread(self._get_memory_context, query)
+        return self._get_memory_context(query)
+        
+    @staticmethod
+    def _is_error_output(content: str) -> bool:
+        """Agent and LLM failures come back as error text rather than exceptions"""
+        stripped = content.lstrip()
+        return stripped.startswith(("Error", "PDF processing error", '{\n  "error"'))
+
     def _save_to_memory(self, query: str, response: str):
-        """Save interaction to agent memory"""
+        """Save interaction to agent memory; failures are not remembered as answers"""
+        if self._is_error_output(response):
+            return
         try:
-            memory_manager = cl.user_session.get("memory_manager")
+            memory_manager = session.get("memory_manager")
             if memory_manager:
                 memory_manager.save_context(self.name, query, response)
         except Exception as e:
@@ -83,4 +370,8 @@ class BaseAgent(ABC):
     
     @abstractmethod
     def process(self, query: str) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    async def aprocess(self, query: str) -> str:
+        """Async variant of process; runs the sync path in a worker thread by default"""
+        return await asyncio.to_thread(self.process, query)
@@ -1,25 +1,32 @@
+import asyncio
 from agents.base_agent import BaseAgent
 from tools.finance_tools import VantageFinanceTool
+from tools.price_history import PriceHistoryTool
+from tools.symbol_index import get_symbol_index
+from utils.config import Config
 from utils.prompts import FINANCE_AGENT_PROMPT
 import json
-import re
 from typing import List
 
 class FinanceAgent(BaseAgent):
-    def __init__(self, callbacks=None):
-        super().__init__("finance", callbacks)
+    def __init__(self, stream=None):
+        super().__init__("finance", stream=stream)
         self.finance_tool = VantageFinanceTool()
+        self.history_tool = (PriceHistoryTool(self.finance_tool.session)
+                             if Config.price_history_config.enabled else None)
         self.prompt = FINANCE_AGENT_PROMPT
         
     def process(self, query: str) -> str:
         """Process financial queries with comprehensive analysis"""
         try:
-            finance_history = self._get_memory_context()
+            finance_history = self._get_memory_context(query)
             symbols = self._extract_symbols(query)
             market_data = {symbol: self.finance_tool.get_stock_data(symbol) for symbol in symbols}
+            technicals = self.history_tool.technicals(symbols) if self.history_tool else None
             
             prompt = self.prompt.format(
-                market_data=json.dumps(market_data, indent=2),
+                market_data=market_data,
+                technicals=technicals,
                 query=query,
                 finance_history=finance_history
             )
@@ -30,55 +37,45 @@ class FinanceAgent(BaseAgent):
             
         except Exception as e:
             return self._format_error_response(str(e))
+
+    async def aprocess(self, query: str) -> str:
+        """Process financial queries, fetching all symbols concurrently"""
+        try:
+            finance_history = await self._aget_memory_context(query)
+            symbols = self._extract_symbols(query)
+            quotes = asyncio.gather(*(
+                asyncio.to_thread(self.finance_tool.get_stock_data, symbol)
+                for symbol in symbols
+            ))
+            # Price history is read from the local store, refreshed at most once per PRICE_HISTORY_REFRESH_HOURS
+            technicals = (asyncio.to_thread(self.history_tool.technicals, symbols)
+                          if self.history_tool else asyncio.sleep(0))
+            quotes, technicals = await asyncio.gather(quotes, technicals)
+            market_data = dict(zip(symbols, quotes))
             
-    def _extract_symbols(self, query: str) -> List[str]:
-        """Extract stock symbols with strict formatting requirements"""
-        symbols = set()
-        
-        # Primary check: Look for properly formatted symbols in parentheses
-        parens_pattern = r'\(([A-Z]{1,4})\)'  # 1-4 capital letters in parentheses
-        parens_symbols = set(re.findall(parens_pattern, query))
-        if parens_symbols:
-            symbols.update(parens_symbols)
-            return list(symbols)  # Return early if we find properly formatted symbols
+            prompt = self.prompt.format(
+                market_data=market_data,
+                technicals=technicals,
+                query=query,
+                finance_history=finance_history
+            )
             
-        # Secondary check: Look for standalone capital letters that match stock pattern
-        # Only if no parenthesized symbols were found
-        standalone_pattern = r'\b[A-Z]{1,4}\b'  # 1-4 capital letters as whole word
-        standalone_matches = set(re.findall(standalone_pattern, query))
-        
-        # Only process standalone matches if they look like stock symbols
-        # (optional LLM validation could be added here if needed)
-        for match in standalone_matches:
-            if self._looks_like_stock_symbol(match):
-                symbols.add(match)
-        
+            response = await self._ainvoke_llm(prompt)
+            self._save_to_memory(query, response)
+            return response
+            
+        except Exception as e:
+            return self._format_error_response(str(e))
+            
+    def _extract_symbols(self, query: str) -> List[str]:
+        """Listed symbols named in the query, by ticker or company name"""
+        symbols = get_symbol_index().extract(query)
         if not symbols:
             raise Exception(
-                "No valid stock symbols found. Please use format (AAPL) or AAPL. "
-                "Examples: (MSFT), (GOOGL), AAPL, TSLA"
+                "No valid stock symbols found. Please use a ticker like (AAPL) or a company name. "
+                "Examples: (MSFT), TSLA, Nvidia, Bank of America"
             )
-        
-        return list(symbols)
-        
-    def _looks_like_stock_symbol(self, text: str) -> bool:
-        """
-        Stricter validation for potential stock symbols
-        Helps avoid matching random capital words
-        """
-        if not (1 <= len(text) <= 4 and text.isalpha() and text.isupper()):
-            return False
-            
-        # Additional checks that might help identify stock symbols
-        # Avoid common word patterns
-        if text.endswith('S'):  # Plural words
-            return False
-        if len(text) == 1:  # Single letters are rarely stocks
-            return False
-        if all(c == text[0] for c in text):  # Repeated letters (e.g., 'AAA')
-            return False
-            
-        return True
+        return symbols
         
     def _format_error_response(self, error_msg: str) -> str:
         """Format error messages consistently"""
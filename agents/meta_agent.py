@@ -1,74 +1,248 @@
-from typing import List
+from typing import List, Optional
+import asyncio
 import json
-from agents.base_agent import BaseAgent
+import re
+import time
+from agents.base_agent import BaseAgent, TRUNCATED_NOTE
+from utils.providers import CHAT_PROVIDERS, ProviderUnavailable, provider_pool
 from agents.registry import AgentRegistry
-from utils.prompts import META_AGENT_PROMPT, SYNTHESIS_PROMPT
+from utils.config import Config
+from utils.prompts import (
+    META_AGENT_PROMPT,
+    SYNTHESIS_PROMPT,
+    LIGHT_SYNTHESIS_PROMPT,
+    INCREMENTAL_SYNTHESIS_PROMPT,
+    CONTINUATION_SYNTHESIS_PROMPT
+)
+from utils.routing import RoutingError, ROUTING_RETRY_SUFFIX, parse_routing_plan, routing_schema
 from utils.workpad import Workpad
-import chainlit as cl
+from utils.deadline import StageTimeout
+from utils import cancellation, deadline, session, tracing
+
+# Words that signal a follow-up question referring back to the conversation
+FOLLOW_UP_WORDS = {
+    "it", "its", "that", "this", "those", "these", "they", "them", "their",
+    "above", "previous", "earlier", "again", "also", "instead", "same"
+}
 
 class MetaAgent(BaseAgent):
-    def __init__(self, callbacks=None):
-        super().__init__("meta", callbacks)
+    def __init__(self, stream=None):
+        # self.llm is the "synthesizer" role; routing and light synthesis use the "router" and "light_synthesizer" roles
+        super().__init__("meta", role="synthesizer", stream=stream)
         self.registry = AgentRegistry()
         self.prompt = META_AGENT_PROMPT
         self.synthesis_prompt = SYNTHESIS_PROMPT
+        self.light_synthesis_prompt = LIGHT_SYNTHESIS_PROMPT
+        self.incremental_synthesis_prompt = INCREMENTAL_SYNTHESIS_PROMPT
+        self.continuation_synthesis_prompt = CONTINUATION_SYNTHESIS_PROMPT
         self.workpad = Workpad()
+        self._cached_plan = None
+        
+    def _initialize_llm(self, role: Optional[str] = None, provider: Optional[str] = None):
+        llm = super()._initialize_llm(role, provider)
+        if role == "router" and (provider or Config.model_config.for_role("router").provider) == "ollama":
+            # Local models have no tool calling, constrain them to JSON output instead
+            return llm.bind(format="json")
+        return llm
         
     async def process(self, query: str) -> str:
         """Process query through appropriate agents"""
         try:
             # Get all relevant memories
-            memory_manager = cl.user_session.get("memory_manager")
-            meta_memory = memory_manager.get_memory("meta")
+            memory_manager = session.get("memory_manager")
+            history = await self._aget_memory_context(query)
             
-            required_agents = self._analyze_query(query)
+            required_agents = await self._aanalyze_query(query)
             self.workpad.clear()
             
-            # Process each agent
-            for agent_name in required_agents:
-                agent = self.registry.get_agent(agent_name)
-                if agent:
-                    # Manually trigger start callback
-                    if self.callbacks and hasattr(self.callbacks[0], 'on_llm_start'):
-                        await self.callbacks[0].on_llm_start(
-                            serialized={},
-                            prompts=[query],
-                            metadata={"agent_name": agent_name}
-                        )
-                    
-                    response = agent.process(query)
-                    self.workpad.write(agent_name, response)
-                    
-                    # Manually trigger end callback
-                    if self.callbacks and hasattr(self.callbacks[0], 'on_llm_end'):
-                        await self.callbacks[0].on_llm_end()
-            
-            # Synthesis with manual callbacks
-            if self.callbacks and hasattr(self.callbacks[0], 'on_llm_start'):
-                await self.callbacks[0].on_llm_start(
-                    serialized={},
-                    prompts=[query],
-                    metadata={"agent_name": "meta"}
-                )
+            query_deadline = deadline.current()
+            mode = "synthesize"
+            if len(required_agents) == 1:
+                mode = self._single_agent_mode(query, history)
             
-            # Synthesis with memory
-            synthesis_response = self._synthesize_with_memory(
-                query,
-                meta_memory.get("chat_history", "")
-            )
+            if mode == "direct":
+                # Stream the specialist's answer straight into the user message
+                agent_name = required_agents[0]
+                agent = self.registry.get_agent(agent_name)
+                await self._emit("start", agent_name, direct=True)
+                try:
+                    response = await query_deadline.run(
+                        f"agent.{agent_name}", self._aprocess_agent(agent_name, query), query_deadline.budget("direct")
+                    )
+                except StageTimeout as e:
+                    response = f"No answer could be gathered within this query's time budget ({e.budget:.1f}s)."
+                    await agent._emit_token(response)
+                    await self._emit("end", agent_name)
+                    return response
+                
+                if agent_name in self.workpad.missing:
+                    response = self._no_results_message()
+                    await agent._emit_token(response)
+                else:
+                    memory_manager.save_context("meta", query, response)
+                await self._emit("end", agent_name)
+                return response
             
-            # End callback for synthesis
-            if self.callbacks and hasattr(self.callbacks[0], 'on_llm_end'):
-                await self.callbacks[0].on_llm_end()
+            if mode == "synthesize" and Config.synthesis_config.incremental and len(required_agents) > 1:
+                synthesis_response = await self._aincremental_synthesis(query, history, required_agents)
+            else:
+                # Process each agent; each gets an equal share of what is left of the agent budget
+                for i, agent_name in enumerate(required_agents):
+                    await self._arun_agent(agent_name, query, query_deadline.budget("agents", len(required_agents) - i))
+                
+                # Synthesis with memory
+                await self._emit("start", "meta")
+                with tracing.span("meta.synthesis", mode=mode, agents=required_agents, missing=list(self.workpad.missing)):
+                    if mode == "light" and self.workpad.get_all_content():
+                        synthesis_response = await self._asynthesis_stage(self._alight_synthesis(query, history))
+                    else:
+                        synthesis_response = await self._asynthesis_stage(self._asynthesize_with_memory(query, history))
+                await self._emit("end", "meta")
             
             # Save to memory
-            memory_manager.save_context("meta", query, synthesis_response)
+            if not self._is_error_output(synthesis_response):
+                memory_manager.save_context("meta", query, synthesis_response)
             return synthesis_response
                 
         except Exception as e:
             print(f"Error in workflow: {str(e)}")
             return str(e)
 
+    async def _emit(self, kind: str, agent_name: str, **metadata):
+        """Send an agent start/end event to the current request's dispatcher"""
+        if self.stream:
+            await self.stream.emit(kind, agent_name, **metadata)
+
+    async def _arun_agent(self, agent_name: str, query: str, budget: Optional[float] = None) -> None:
+        """Run one agent inside its UI step and write its output to the workpad, cutting it off after budget seconds"""
+        if not self.registry.get_agent(agent_name):
+            return
+        await self._emit("start", agent_name)
+        try:
+            await deadline.current().run(f"agent.{agent_name}", self._aprocess_agent(agent_name, query), budget)
+        except StageTimeout as e:
+            # Synthesis goes ahead with the other agents and is told this source is missing
+            self.workpad.mark_missing(agent_name, f"no answer within its {e.budget:.1f}s time budget")
+        await self._emit("end", agent_name)
+
+    async def _asynthesis_stage(self, synthesis) -> str:
+        """Run a synthesis call within what is left of the query's deadline"""
+        query_deadline = deadline.current()
+        try:
+            return await query_deadline.run("synthesis", synthesis, query_deadline.budget("synthesis"))
+        except StageTimeout:
+            await self._emit_token(TRUNCATED_NOTE)
+            return TRUNCATED_NOTE.strip()
+
+    async def _aprocess_agent(self, agent_name: str, query: str) -> str:
+        """Run one agent in a tracing span and write its output to the workpad"""
+        with tracing.span("agent.process", agent=agent_name):
+            try:
+                response = await self.registry.get_agent(agent_name).aprocess(query)
+            except asyncio.CancelledError:
+                cancellation.note("agent")
+                raise
+            if self._is_error_output(response):
+                tracing.mark_error(response[:200])
+                # Error text is not content: synthesis is told the source is missing instead of reading it
+                self.workpad.mark_missing(agent_name, f"failed ({response.strip()[:160]})")
+                return response
+        self.workpad.write(agent_name, response)
+        return response
+
+    async def _aincremental_synthesis(self, query: str, history, agents: List[str]) -> str:
+        """Run agents concurrently and start synthesis on the first results while the rest finish"""
+        self.workpad.expect(agents)
+        budget = deadline.current().budget("agents")
+        tasks = [asyncio.create_task(self._arun_agent(agent_name, query, budget)) for agent_name in agents]
+        try:
+            # Wait until at least one usable result is in
+            pending = set(tasks)
+            while pending and not self._usable_agents():
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            
+            await self._emit("start", "meta")
+            if not pending:
+                # Everything finished before we could start early, no need to split the answer
+                with tracing.span("meta.synthesis", mode="synthesize", agents=agents):
+                    response = await self._asynthesis_stage(self._asynthesize_with_memory(query, history))
+                await self._emit("end", "meta")
+                return response
+            
+            early_agents = self._usable_agents()
+            print(f"Starting synthesis on {early_agents}, still waiting for {self.workpad.pending}")
+            with tracing.span("meta.synthesis", mode="draft", agents=early_agents, pending=self.workpad.pending):
+                draft = await self._asynthesis_stage(self._ainvoke_llm(self.incremental_synthesis_prompt.format(
+                    query=query,
+                    agent_responses=self.workpad.render(early_agents),
+                    pending_agents=", ".join(self.workpad.pending),
+                    chat_history=history
+                )))
+            
+            if self._is_error_output(draft):
+                # Nothing was streamed; once every agent is in, answer with one full synthesis pass instead
+                await asyncio.gather(*pending)
+                if deadline.current().remaining() > 0:
+                    with tracing.span("meta.synthesis", mode="synthesize", agents=agents, draft_failed=True):
+                        draft = await self._asynthesis_stage(self._asynthesize_with_memory(query, history))
+                await self._emit("end", "meta")
+                return draft
+
+            if draft.endswith(TRUNCATED_NOTE.strip()) or deadline.current().remaining() <= 0:
+                # The deadline cut the draft off; a continuation would only repeat the truncation note
+                await self._emit("end", "meta")
+                return draft
+            
+            await asyncio.gather(*pending)
+            late_agents = [agent for agent in self._usable_agents() + list(self.workpad.missing) if agent not in early_agents]
+            if not late_agents or deadline.current().remaining() <= 0:
+                # Slower agents produced nothing usable (or took the rest of the time), the draft stands on its own
+                await self._emit("end", "meta")
+                return draft
+            
+            await self._emit_token("\n\n")
+            with tracing.span("meta.synthesis", mode="continuation", agents=late_agents):
+                continuation = await self._asynthesis_stage(self._ainvoke_llm(self.continuation_synthesis_prompt.format(
+                    query=query,
+                    draft=draft,
+                    agent_responses=self.workpad.render(late_agents),
+                    chat_history=history
+                )))
+            await self._emit("end", "meta")
+            return f"{draft}\n\n{continuation}"
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let cancelled agents unwind here, not after the system moves on to its next query
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _no_results_message(self) -> str:
+        reasons = "; ".join(f"{agent}: {reason}" for agent, reason in self.workpad.missing.items())
+        return f"Sorry, none of the agents could answer this query right now ({reasons}). Please try again shortly."
+
+    def _usable_agents(self) -> List[str]:
+        """Agents whose workpad output is content rather than an error"""
+        return [
+            agent for agent, content in self.workpad.get_all_content().items()
+            if content and not self._is_error_output(content)
+        ]
+
+    def _single_agent_mode(self, query: str, history) -> str:
+        """Pick how to answer when routing selected one agent: direct, light or synthesize"""
+        mode = Config.synthesis_config.single_agent_mode
+        if mode == "direct":
+            return "direct"
+        if mode == "auto":
+            return "light" if self._needs_history(query, history) else "direct"
+        return "synthesize"
+
+    def _needs_history(self, query: str, history) -> bool:
+        """Follow-ups that lean on earlier turns still need a (cheap) synthesis pass"""
+        if not history:
+            return False
+        words = re.findall(r"[a-z']+", query.lower())
+        return len(words) < 5 or any(word in FOLLOW_UP_WORDS for word in words)
+
     def _synthesize_from_workpad(self, query: str) -> str:
         """Synthesize final response from workpad content"""
         try:
@@ -97,73 +271,233 @@ Information from {agent}:
             return f"Synthesis failed: {str(e)}"
         
     def _analyze_workflow(self, query: str) -> List[dict]:
+        return self._plan_workflow(query)["workflow"]
+
+    async def _aanalyze_workflow(self, query: str) -> List[dict]:
+        """Async variant of _analyze_workflow"""
+        return (await self._aplan_workflow(query))["workflow"]
+
+    def _plan_workflow(self, query: str) -> dict:
+        """Get a validated routing plan, re-asking once if the response is invalid"""
+        cached = self._take_cached_plan(query)
+        if cached:
+            return cached
+        
+        with tracing.span("meta.route"):
+            prompt = self._build_workflow_prompt(query)
+            agents = self.registry.list_agents()
+            try:
+                try:
+                    plan = parse_routing_plan(self._route(prompt, agents), agents)
+                except RoutingError as e:
+                    print(f"Invalid routing plan ({str(e)}), re-asking")
+                    plan = parse_routing_plan(self._route(prompt + ROUTING_RETRY_SUFFIX.format(error=e), agents), agents)
+            except RoutingError as e:
+                plan = self._routing_failure(e)
+            self._annotate_plan(plan)
+        
+        self._cached_plan = (query, plan)
+        return plan
+
+    async def _aplan_workflow(self, query: str) -> dict:
+        """Async variant of _plan_workflow"""
+        cached = self._take_cached_plan(query)
+        if cached:
+            return cached
+        
+        with tracing.span("meta.route"):
+            query_deadline = deadline.current()
+            try:
+                plan = await query_deadline.run("routing", self._aroute_plan(query), query_deadline.budget("routing"))
+            except RoutingError as e:
+                plan = self._routing_failure(e)
+            except StageTimeout as e:
+                plan = self._routing_failure(RoutingError(str(e)))
+            self._annotate_plan(plan)
+        
+        self._cached_plan = (query, plan)
+        return plan
+
+    async def _aroute_plan(self, query: str) -> dict:
+        """Ask the router for a plan, re-asking once if the response is invalid"""
+        prompt = self._build_workflow_prompt(query, await self._aget_memory_context(query))
+        agents = self.registry.list_agents()
         try:
-            meta_memory = self._get_memory_context()
-            analysis_prompt = self.prompt.format(
-                query=query,
-                available_agents=self.registry.list_agents(),
-                meta_history=meta_memory
-            )
-            
-            response = self._invoke_llm(analysis_prompt)
-            workflow = []
-            
-            if "WORKFLOW:" in response:
-                workflow_text = response.split("WORKFLOW:")[1]
-                if "REASON:" in workflow_text:
-                    workflow_text = workflow_text.split("REASON:")[0]
-                
-                lines = [line.strip() for line in workflow_text.split('\n') if line.strip()]
-                for line in lines:
-                    if "->" in line:
-                        parts = line.split("->")
-                        agent = parts[0].strip().lstrip('-')
-                        reason = parts[1].split("-")[0].strip()
-                        if agent in self.registry.list_agents():
-                            workflow.append({
-                                "agent": agent,
-                                "reason": reason
-                            })
-            
-            return workflow or [{"agent": "web", "reason": "fallback"}]
-                
-        except Exception as e:
-            print(f"Workflow analysis failed: {str(e)}")
-            return [{"agent": "web", "reason": "error fallback"}]
+            return parse_routing_plan(await self._aroute(prompt, agents), agents)
+        except RoutingError as e:
+            print(f"Invalid routing plan ({str(e)}), re-asking")
+            return parse_routing_plan(await self._aroute(prompt + ROUTING_RETRY_SUFFIX.format(error=e), agents), agents)
+
+    @staticmethod
+    def _annotate_plan(plan: dict) -> None:
+        tracing.annotate(
+            query_type=plan["query_type"],
+            complexity=plan["complexity"],
+            agents=[step["agent"] for step in plan["workflow"]],
+            fallback=plan.get("fallback", False)
+        )
+
+    def _take_cached_plan(self, query: str) -> Optional[dict]:
+        """Reuse the plan shown in the Query Analysis step instead of routing twice"""
+        if self._cached_plan and self._cached_plan[0] == query:
+            plan = self._cached_plan[1]
+            self._cached_plan = None
+            return plan
+        return None
+
+    def _routing_failure(self, error: RoutingError) -> dict:
+        """Explicit, flagged fallback plan when routing stays invalid after a retry"""
+        print(f"Routing failed after retry: {str(error)}")
+        return {
+            "query_type": "UNKNOWN",
+            "complexity": "UNKNOWN",
+            "workflow": [{"agent": "web", "reason": "routing failed"}],
+            "reason": f"Routing failed ({str(error)}), answering with the web agent",
+            "fallback": True
+        }
+
+    def _uses_tool_calling(self) -> bool:
+        return Config.model_config.for_role("router").provider in CHAT_PROVIDERS
+
+    def _route(self, prompt: str, agents: List[str]):
+        """Ask the router model for a plan: tool call on chat providers, JSON text otherwise"""
+        if not self._uses_tool_calling():
+            return self._invoke_llm(prompt, role="router")
+        
+        with self._llm_span("router"):
+            start = time.perf_counter()
+            error = None
+            for provider in self._router_providers():
+                try:
+                    if provider in CHAT_PROVIDERS:
+                        result = self._structured_router(agents, provider).invoke(
+                            self._llm_input(prompt, "router", provider)
+                        )
+                    else:
+                        result = self._chunk_text(self._llm_for("router", provider).invoke(prompt))
+                except Exception as e:
+                    provider_pool.failure(provider, e)
+                    error = e
+                    continue
+                provider_pool.success(provider)
+                return self._router_result(provider, result, prompt, start)
+            tracing.mark_error(str(error))
+            raise RoutingError(f"Router call failed: {str(error)}")
+
+    async def _aroute(self, prompt: str, agents: List[str]):
+        """Async variant of _route"""
+        if not self._uses_tool_calling():
+            return await self._ainvoke_llm(prompt, role="router")
+        
+        with self._llm_span("router"):
+            start = time.perf_counter()
+            error = None
+            for provider in self._router_providers():
+                try:
+                    if provider in CHAT_PROVIDERS:
+                        result = await self._structured_router(agents, provider).ainvoke(
+                            self._llm_input(prompt, "router", provider)
+                        )
+                    else:
+                        result = self._chunk_text(await self._llm_for("router", provider).ainvoke(prompt))
+                except Exception as e:
+                    provider_pool.failure(provider, e)
+                    error = e
+                    continue
+                provider_pool.success(provider)
+                return self._router_result(provider, result, prompt, start)
+            tracing.mark_error(str(error))
+            raise RoutingError(f"Router call failed: {str(error)}")
+
+    def _router_providers(self) -> List[str]:
+        try:
+            return self._providers("router")
+        except ProviderUnavailable as e:
+            tracing.mark_error(str(e))
+            raise RoutingError(str(e))
+
+    def _router_result(self, provider: str, result, prompt: str, start: float):
+        """Plan from a tool call, or JSON text from a local model the router failed over to"""
+        self._note_provider("router", provider)
+        if isinstance(result, str):
+            self._record_metrics("router", start, prompt, result)
+            return result
+        return self._structured_result(result, prompt, start)
+
+    def _structured_router(self, agents: List[str], provider: Optional[str] = None):
+        """Router LLM bound to the routing plan tool schema"""
+        return self._llm_for("router", provider).with_structured_output(routing_schema(agents), include_raw=True)
+
+    def _structured_result(self, result: dict, prompt: str, start: float) -> dict:
+        parsed = result.get("parsed")
+        self._record_metrics("router", start, prompt, json.dumps(parsed or {}), result.get("raw"))
+        if result.get("parsing_error") or not parsed:
+            raise RoutingError(f"Tool call could not be parsed: {result.get('parsing_error')}")
+        return parsed
+
+    def _build_workflow_prompt(self, query: str, meta_memory=None) -> str:
+        """Format the routing prompt for a query"""
+        if meta_memory is None:
+            meta_memory = self._get_memory_context(query)
+        return self.prompt.format(
+            query=query,
+            available_agents=self.registry.list_agents(),
+            meta_history=meta_memory
+        )
 
     def _analyze_query(self, query: str) -> List[str]:
         """Extract required agents from workflow analysis"""
-        try:
-            workflow = self._analyze_workflow(query)
-            required_agents = []
-            
-            # Extract agents from workflow and validate them
-            for step in workflow:
-                agent = step.get("agent")
-                if agent and agent in self.registry.list_agents():
-                    if agent not in required_agents:
-                        required_agents.append(agent)
-            
-            # If no valid agents found, use web as fallback
-            if not required_agents:
-                print("No valid agents found in workflow, falling back to web")
-                return ["web"]
-            
-            print(f"Selected agents from workflow: {required_agents}")
-            return required_agents
-            
-        except Exception as e:
-            print(f"Workflow analysis failed: {str(e)}, falling back to web")
-            return ["web"]
+        return self._select_agents(self._analyze_workflow(query))
+
+    async def _aanalyze_query(self, query: str) -> List[str]:
+        """Async variant of _analyze_query"""
+        return self._select_agents(await self._aanalyze_workflow(query))
+
+    def _select_agents(self, workflow: List[dict]) -> List[str]:
+        """Validate and de-duplicate agents named in a workflow"""
+        required_agents = []
+        
+        # Plans are validated against the registry, this only guards against agents removed since
+        for step in workflow:
+            agent = step.get("agent")
+            if agent and agent in self.registry.list_agents():
+                if agent not in required_agents:
+                    required_agents.append(agent)
+        
+        print(f"Selected agents from workflow: {required_agents}")
+        return required_agents
 
     def _synthesize_with_memory(self, query: str, history: str) -> str:
         """Synthesize response with conversation history"""
-        content = self.workpad.get_all_content()
-        
         synthesis_prompt = self.synthesis_prompt.format(
             query=query,
-            agent_responses=json.dumps(content, indent=2),
+            agent_responses=self.workpad.render(),
             chat_history=history
         )
         
         return self._invoke_llm(synthesis_prompt)
+
+    async def _asynthesize_with_memory(self, query: str, history: str) -> str:
+        """Async variant of _synthesize_with_memory"""
+        if not self.workpad.get_all_content():
+            # Nothing to synthesize from; say so instead of letting the model improvise
+            message = self._no_results_message()
+            await self._emit_token(message)
+            return message
+        synthesis_prompt = self.synthesis_prompt.format(
+            query=query,
+            agent_responses=self.workpad.render(),
+            chat_history=history
+        )
+        
+        return await self._ainvoke_llm(synthesis_prompt)
+
+    async def _alight_synthesis(self, query: str, history) -> str:
+        """Short pass that adapts a single agent's answer to the conversation"""
+        agent_name, response = next(iter(self.workpad.get_all_content().items()))
+        prompt = self.light_synthesis_prompt.format(
+            query=query,
+            agent_response=response,
+            chat_history=history
+        )
+        return await self._ainvoke_llm(prompt, role="light_synthesizer")
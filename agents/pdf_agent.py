@@ -1,10 +1,11 @@
+import asyncio
 from agents.base_agent import BaseAgent
 from utils.prompts import PDF_AGENT_PROMPT
 from tools.pdf_tools import PDFTool
 
 class PDFAgent(BaseAgent):
-    def __init__(self, callbacks=None):
-        super().__init__("pdf", callbacks)
+    def __init__(self, stream=None):
+        super().__init__("pdf", stream=stream)
         self.prompt = PDF_AGENT_PROMPT
         self.pdf_tool = PDFTool()  # Initialize the PDF tool
         
@@ -12,7 +13,7 @@ class PDFAgent(BaseAgent):
         """Process PDF-related queries"""
         try:
             # Get memory context and relevant documents
-            pdf_history = self._get_memory_context()
+            pdf_history = self._get_memory_context(query)
             context = self._get_relevant_context(query)
             
             # Format the prompt with context and history
@@ -30,6 +31,27 @@ class PDFAgent(BaseAgent):
             
         except Exception as e:
             return f"PDF processing error: {str(e)}"
+
+    async def aprocess(self, query: str) -> str:
+        """Process PDF-related queries without blocking the event loop"""
+        try:
+            pdf_history = await self._aget_memory_context(query)
+            # Embedding + FAISS search is CPU bound, keep it off the event loop
+            context = await asyncio.to_thread(self._get_relevant_context, query)
+            
+            prompt = self.prompt.format(
+                context=context,
+                query=query,
+                pdf_history=pdf_history
+            )
+            
+            response = await self._ainvoke_llm(prompt)
+            self._save_to_memory(query, response)
+            
+            return response
+            
+        except Exception as e:
+            return f"PDF processing error: {str(e)}"
             
     def _get_relevant_context(self, query: str) -> str:
         """Get relevant context from PDF documents using RAG"""
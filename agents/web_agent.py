@@ -1,19 +1,24 @@
+import asyncio
 from agents.base_agent import BaseAgent
-from tools.web_tools import SerperTool
+from tools.web_tools import PageEnricher, SerperTool
+from utils.config import Config
 from utils.prompts import WEB_AGENT_PROMPT
 
 class WebAgent(BaseAgent):
-    def __init__(self, callbacks=None):
-        super().__init__("web", callbacks)
+    def __init__(self, stream=None):
+        super().__init__("web", stream=stream)
         self.search_tool = SerperTool()
+        self.enricher = PageEnricher() if Config.web_enrich_config.enabled else None
         self.prompt = WEB_AGENT_PROMPT
         
     def process(self, query: str) -> str:
         """Process web-based queries with search and analysis"""
         try:
             # Get memory context
-            web_history = self._get_memory_context()
+            web_history = self._get_memory_context(query)
             search_results = self.search_tool.search(query)
+            if self.enricher:
+                search_results = self.enricher.enrich_sync(query, search_results)
             
             prompt = self.prompt.format(
                 search_results=search_results,
@@ -29,4 +34,26 @@ class WebAgent(BaseAgent):
             return response
             
         except Exception as e:
-            return f"Error in web agent: {str(e)}" 
\ No newline at end of file
+            return f"Error in web agent: {str(e)}"
+
+    async def aprocess(self, query: str) -> str:
+        """Process web-based queries without blocking the event loop"""
+        try:
+            web_history = await self._aget_memory_context(query)
+            search_results = await asyncio.to_thread(self.search_tool.search, query)
+            if self.enricher:
+                search_results = await self.enricher.enrich(query, search_results)
+            
+            prompt = self.prompt.format(
+                search_results=search_results,
+                query=query,
+                web_history=web_history
+            )
+            
+            response = await self._ainvoke_llm(prompt)
+            self._save_to_memory(query, response)
+            
+            return response
+            
+        except Exception as e:
+            return f"Error in web agent: {str(e)}"
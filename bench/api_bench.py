@@ -0,0 +1,165 @@
+"""
+Headless HTTP API (expert_chat/api.py) under a burst of SSE clients.
+
+Starts the API in-process on a local port with fake LLMs, the stub
+Serper/Alpha Vantage API and canned PDF context, then checks:
+
+- burst:      --clients requests at once against SERVICE_MAX_CONCURRENT and
+              SERVICE_MAX_WAITING; reports answered and 503-rejected
+              requests, first answer token and total latency, and the most
+              queries /health ever saw running
+- disconnect: clients that hang up after the first answer token; reports
+              how long until their slots are free again
+
+    python bench/api_bench.py --clients 24 --concurrent 4 --waiting 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import httpx
+import uvicorn
+from utils.config import Config
+from bench.e2e_bench import StubPDFTool, install_fake_llms, load_corpus, percentile, DEFAULT_CORPUS
+from bench.stub_server import StubAPIServer
+
+
+class APIServer:
+    """expert_chat.api:app on a free local port, served from a background thread"""
+
+    def __init__(self):
+        from expert_chat import api
+        self.api = api
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(api.app, port=self.port, log_level="warning", lifespan="on"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("API server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(10)
+
+
+async def sse_query(client, url: str, query: str, hang_up: bool = False) -> dict:
+    """POST /query and read its event stream; status, time to first answer token and total time"""
+    start = time.perf_counter()
+    result = {"status": None, "first_token": None, "total": None, "events": 0}
+    async with client.stream("POST", f"{url}/query", json={"query": query}) as response:
+        result["status"] = response.status_code
+        if response.status_code != 200:
+            return result
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                result["events"] += 1
+                if event == "token" and result["first_token"] is None:
+                    result["first_token"] = time.perf_counter() - start
+                    if hang_up:
+                        break
+                if event in ("done", "error"):
+                    result["final"] = event
+                    result["data"] = json.loads(line[len("data: "):])
+                    break
+    result["total"] = time.perf_counter() - start
+    return result
+
+
+async def poll_running(client, url: str, stop: asyncio.Event, peak: dict):
+    while not stop.is_set():
+        status = (await client.get(f"{url}/health")).json()
+        peak["running"] = max(peak["running"], status["running"])
+        peak["waiting"] = max(peak["waiting"], status["waiting"])
+        await asyncio.sleep(0.05)
+
+
+async def burst(url: str, queries, clients: int):
+    async with httpx.AsyncClient(timeout=120) as client:
+        stop, peak = asyncio.Event(), {"running": 0, "waiting": 0}
+        poller = asyncio.create_task(poll_running(client, url, stop, peak))
+        results = await asyncio.gather(*(sse_query(client, url, queries[i % len(queries)]) for i in range(clients)))
+        stop.set()
+        await poller
+    return results, peak
+
+
+async def disconnects(url: str, queries, clients: int):
+    async with httpx.AsyncClient(timeout=120) as client:
+        await asyncio.gather(*(sse_query(client, url, queries[i % len(queries)], hang_up=True) for i in range(clients)))
+        hung_up = time.perf_counter()
+        while (await client.get(f"{url}/health")).json()["running"]:
+            await asyncio.sleep(0.005)
+        return time.perf_counter() - hung_up
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=24)
+    parser.add_argument("--concurrent", type=int, default=4, help="SERVICE_MAX_CONCURRENT")
+    parser.add_argument("--waiting", type=int, default=8, help="SERVICE_MAX_WAITING")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake LLM time to first token (s)")
+    parser.add_argument("--tps", type=float, default=200.0, help="fake LLM tokens per second")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per fake LLM reply")
+    parser.add_argument("--api-latency", type=float, default=0.2, help="stub Serper/Alpha Vantage latency (s)")
+    parser.add_argument("--verbose", action="store_true", help="show system output")
+    args = parser.parse_args()
+
+    queries = load_corpus(args.corpus)
+    Config.service_config.provider = "ollama"
+    Config.service_config.max_concurrent = args.concurrent
+    Config.service_config.max_waiting = args.waiting
+    Config.api_config.serper_api_key = "bench"
+    Config.api_config.alpha_vantage_key = "bench"
+    Config.web_enrich_config.enabled = False
+    Config.price_history_config.enabled = False
+    install_fake_llms(SimpleNamespace(ttft=args.ttft, router_ttft=None, tps=args.tps, tokens=args.tokens))
+    from agents import pdf_agent
+    pdf_agent.PDFTool = StubPDFTool
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with StubAPIServer(latency=args.api_latency) as stub:
+        Config.api_config.serper_base_url = f"{stub.url}/search"
+        Config.api_config.alpha_vantage_base_url = f"{stub.url}/query"
+        with output:
+            with APIServer() as server:
+                results, peak = asyncio.run(burst(server.url, queries, args.clients))
+                freed = asyncio.run(disconnects(server.url, queries, args.concurrent))
+
+    answered = [r for r in results if r["status"] == 200 and r.get("final") == "done"]
+    rejected = [r for r in results if r["status"] == 503]
+    ttfts = [r["first_token"] for r in answered if r["first_token"] is not None] or [0.0]
+    totals = [r["total"] for r in answered] or [0.0]
+    print(f"burst: {args.clients} clients, {args.concurrent} concurrent, {args.waiting} waiting")
+    print(f"  answered {len(answered)}, rejected 503 {len(rejected)}, other {args.clients - len(answered) - len(rejected)}")
+    print(f"  first token p50 {percentile(ttfts, 0.5):.2f}s p95 {percentile(ttfts, 0.95):.2f}s, "
+          f"total p95 {percentile(totals, 0.95):.2f}s")
+    print(f"  peak running {peak['running']} (limit {args.concurrent}), peak waiting {peak['waiting']} (limit {args.waiting})")
+    print(f"disconnect: {args.concurrent} clients hung up after the first token, slots free after {freed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+SerperTool query cache: normalized keys and superset reuse vs the old raw keys.
+
+Replays search traffic where users phrase the same question differently (case,
+punctuation, filler words) and agents ask for different result counts, against
+the local stub Serper API. The old scheme (raw "query_num" keys, a fresh
+request for every new count) is replayed on the same trace for comparison.
+Reports API requests, hit rate and how many entries each cache holds, and
+checks that a small max_entries bounds the cache and that distinct searches
+(other scripts, C++ vs C#, exclusion operators) never share a cache key.
+
+    python bench/cache_bench.py --topics 40 --lookups 2000 --max-entries 50
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.cache_store import cache_stats
+from bench.stub_server import StubAPIServer
+
+TEMPLATES = ["{}", "{}?", "What is the {}?", "what's the {}", "  {}  ", "{} please", "Tell me about the {}!"]
+SUBJECTS = ["federal funds rate", "NVDA earnings", "S&P 500 outlook", "10-year treasury yield", "oil price",
+            "bitcoin price", "jobs report", "inflation data", "AAPL guidance", "housing starts"]
+# Searches that return different results and so must not share a cache entry
+DISTINCT = ["日本の株価", "ドル円 為替", "Börse Frankfurt", "C++ jobs", "C# jobs", "C jobs", "apple -fruit",
+            "apple fruit", "S&P 500", "S 500", "???", "!!!", "the", "a"]
+
+
+def trace(topics: int, lookups_count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    subjects = [SUBJECTS[i % len(SUBJECTS)] + (f" {i // len(SUBJECTS)}" if i >= len(SUBJECTS) else "")
+                for i in range(topics)]
+    # Popular topics come up far more often, like real traffic
+    weights = [1 / (rank + 1) for rank in range(topics)]
+    lookups = []
+    for _ in range(lookups_count):
+        query = rng.choice(TEMPLATES).format(rng.choices(subjects, weights)[0])
+        if rng.random() < 0.3:
+            query = query.title()
+        lookups.append((query, rng.choice([3, 5, 8])))
+    return lookups
+
+
+def raw_key_replay(lookups: list) -> dict:
+    """Requests and entries with the previous f"{query}_{num_results}" keys and an unbounded dict"""
+    keys = set()
+    requests = 0
+    for query, num in lookups:
+        key = f"{query}_{num}"
+        if key not in keys:
+            keys.add(key)
+            requests += 1
+    return {"requests": requests, "hit_rate": 1 - requests / len(lookups), "entries": len(keys)}
+
+
+def key_collisions(queries: list) -> list:
+    """Pairs of distinct queries that normalize to the same cache key"""
+    from tools.web_tools import normalize_query
+    seen = {}
+    collisions = []
+    for query in queries:
+        key = normalize_query(query)
+        if key in seen:
+            collisions.append((seen[key], query, key))
+        seen.setdefault(key, query)
+    return collisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--max-entries", type=int, default=1000)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--db", default="/tmp/cache_bench.sqlite3")
+    args = parser.parse_args()
+
+    Config.cache_config.backend = args.backend
+    Config.cache_config.path = args.db
+    Config.cache_config.max_entries = args.max_entries
+    Config.api_config.serper_api_key = "bench"
+    lookups = trace(args.topics, args.lookups)
+
+    from tools.web_tools import SerperTool
+    with StubAPIServer(latency=0) as server:
+        Config.api_config.serper_base_url = f"{server.url}/search"
+        tool = SerperTool()
+        tool.cache.clear()
+        start = time.perf_counter()
+        for query, num in lookups:
+            results = tool.search(query, num)
+            assert len(results) == num, (query, num, len(results))
+        elapsed = time.perf_counter() - start
+        api_requests = server.requests
+
+    stats = cache_stats()["serper"]
+    entries = len(tool.cache._data) if args.backend == "memory" else tool.cache._connect().execute(
+        "SELECT COUNT(*) FROM cache WHERE namespace = 'serper'").fetchone()[0]
+    old = raw_key_replay(lookups)
+    print(f"{len(lookups)} lookups over {args.topics} topics, num_results in (3, 5, 8), "
+          f"{args.backend} cache, max_entries={args.max_entries}")
+    print(f"{'':<12} {'api calls':>9} {'hit rate':>8} {'entries':>8}")
+    print(f"{'raw keys':<12} {old['requests']:>9} {old['hit_rate']:>8.1%} {old['entries']:>8}")
+    print(f"{'normalized':<12} {api_requests:>9} {stats.hit_rate:>8.1%} {entries:>8}  "
+          f"(evicted {stats.evictions}, {elapsed / len(lookups) * 1000:.2f} ms per lookup)")
+
+    collisions = key_collisions(DISTINCT)
+    print(f"key collisions among {len(DISTINCT)} distinct searches: {len(collisions)}")
+    for first, second, key in collisions:
+        print(f"  {first!r} and {second!r} both -> {key!r}")
+    if collisions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
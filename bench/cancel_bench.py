@@ -0,0 +1,140 @@
+"""
+Cancelling in-flight queries (utils/cancellation.py) on stop and disconnect.
+
+Each query runs through ExpertSystem with fake LLMs, the stub Serper/Alpha
+Vantage API and canned PDF context, and is interrupted --cancel-after seconds
+in. Three ways of ending it are compared:
+
+- stop:        what Chainlit does on the stop button, cancel the task, then
+               on_stop cancels the query's token
+- disconnect:  on_chat_end cancels the token; Chainlit does not cancel the task
+- ignored:     a disconnect before this change, nothing cancels the query
+
+For each it reports how long the query took to release after the cancel and
+the API requests and LLM tokens spent after it, against a full uncancelled run.
+
+    python bench/cancel_bench.py --queries 6 --cancel-after 0.4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.cancellation import CancelToken
+from utils.memory import AgentMemoryManager
+from utils.metrics import cancel_metrics
+from utils.streaming import StreamDispatcher
+from utils import session
+from agents.base_agent import BaseAgent
+from bench.e2e_bench import build_system, load_corpus, percentile, DEFAULT_CORPUS
+from bench.fake_llm import FakeStreamingLLM
+from bench.stub_server import StubAPIServer
+
+MODES = ["full", "stop", "disconnect", "ignored"]
+
+
+class TokenCounter(StreamDispatcher):
+    """Counts streamed LLM tokens across queries"""
+
+    def __init__(self):
+        self.tokens = 0
+
+    async def on_token(self, event) -> None:
+        self.tokens += 1
+
+
+def install_fake_llms(args) -> None:
+    def fake_llm(agent, role=None, provider=None):
+        return FakeStreamingLLM(ttft=args.ttft, tokens_per_second=args.tps, max_tokens=args.tokens)
+
+    BaseAgent._initialize_llm = fake_llm
+
+
+async def run_query(system, counter, server, query: str, mode: str, cancel_after: float, settle: float):
+    """(release seconds, api requests after cancel, llm tokens after cancel) for one query"""
+    token = CancelToken()
+    with session.local_session(memory_manager=AgentMemoryManager()):
+        task = asyncio.create_task(system.process_query(query, cancel_token=token))
+        if mode == "full":
+            start_requests, start_tokens = server.started, counter.tokens
+            await task
+            return 0.0, server.started - start_requests, counter.tokens - start_tokens
+
+        await asyncio.sleep(cancel_after)
+        cancelled_at = time.perf_counter()
+        requests, tokens = server.started, counter.tokens
+        if mode == "stop":
+            task.cancel()
+            token.cancel("stopped")
+        elif mode == "disconnect":
+            token.cancel("disconnected")
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        release = time.perf_counter() - cancelled_at
+        # Let worker threads that were mid-request finish before counting
+        await asyncio.sleep(settle)
+        return release, server.started - requests, counter.tokens - tokens
+
+
+async def run(system, counter, server, queries, args):
+    results = {mode: [] for mode in MODES}
+    for query in queries:
+        for mode in MODES:
+            results[mode].append(await run_query(system, counter, server, query, mode, args.cancel_after, args.settle))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=6)
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--cancel-after", type=float, default=0.4, help="seconds into the query (s)")
+    parser.add_argument("--settle", type=float, default=0.5, help="wait after release before counting (s)")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake LLM time to first token (s)")
+    parser.add_argument("--tps", type=float, default=100.0, help="fake LLM tokens per second")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per fake LLM reply")
+    parser.add_argument("--api-latency", type=float, default=0.3, help="stub Serper/Alpha Vantage latency (s)")
+    parser.add_argument("--verbose", action="store_true", help="show system output")
+    args = parser.parse_args()
+
+    queries = load_corpus(args.corpus)[:args.queries]
+    Config.model_config.provider = "ollama"
+    Config.api_config.serper_api_key = "bench"
+    Config.api_config.alpha_vantage_key = "bench"
+    Config.web_enrich_config.enabled = False
+    Config.price_history_config.enabled = False
+    install_fake_llms(args)
+    args.stub_pdf = True
+
+    with StubAPIServer(latency=args.api_latency) as server:
+        Config.api_config.serper_base_url = f"{server.url}/search"
+        Config.api_config.alpha_vantage_base_url = f"{server.url}/query"
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        counter = TokenCounter()
+        with output:
+            system = build_system(args, counter)
+            cancel_metrics.reset()
+            results = asyncio.run(run(system, counter, server, queries, args))
+
+    print(f"{len(queries)} queries, cancelled {args.cancel_after}s in, ttft={args.ttft}s, {args.tps} tok/s, "
+          f"api latency={args.api_latency}s")
+    print(f"{'mode':<11} {'release p50':>11} {'release max':>11} {'api requests':>13} {'llm tokens':>11}")
+    for mode in MODES:
+        releases = [r[0] for r in results[mode]]
+        label = "(whole run)" if mode == "full" else ""
+        print(f"{mode:<11} {percentile(releases, 0.5) * 1000:>9.0f}ms {max(releases) * 1000:>9.0f}ms "
+              f"{sum(r[1] for r in results[mode]):>13} {sum(r[2] for r in results[mode]):>11} {label}")
+    print("api requests and llm tokens for stop/disconnect/ignored are those spent after the cancel")
+    print(f"cancel metrics: {cancel_metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Per-query deadlines (utils/deadline.py) against a slow agent.
+
+Replays bench/queries.txt through ExpertSystem with fake LLMs, the stub
+Serper/Alpha Vantage API and canned PDF context. A share of the PDF lookups
+stall for --slow-latency seconds, the way a cold index or an overloaded
+embedding host does. The same queries run without a deadline and with
+QUERY_SLO_SECONDS=--slo, and the bench reports latency, queries over the SLO,
+sources synthesis had to go without, and per-stage budget usage
+(utils.metrics.deadline_metrics) for tuning the SLO and its split.
+
+    python bench/deadline_bench.py --slo 4 --slow-share 0.3 --slow-latency 6
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.deadline import QueryDeadline
+from utils.memory import AgentMemoryManager
+from utils.metrics import deadline_metrics
+from utils import session
+from bench import e2e_bench
+from bench.e2e_bench import AnswerTimer, build_system, install_fake_llms, load_corpus, percentile, DEFAULT_CORPUS
+from bench.stub_server import StubAPIServer
+
+
+class SlowPDFTool(e2e_bench.StubPDFTool):
+    """Canned retrieval where a seeded share of lookups stall"""
+    slow_share = 0.3
+    slow_latency = 6.0
+    rng = random.Random(0)
+
+    def query_documents(self, query: str) -> str:
+        if self.rng.random() < self.slow_share:
+            time.sleep(self.slow_latency)
+        return super().query_documents(query)
+
+
+async def run(system, queries, slo):
+    results = []
+    for query in queries:
+        with session.local_session(memory_manager=AgentMemoryManager()):
+            start = time.perf_counter()
+            await system.process_query(query, query_deadline=QueryDeadline(slo=slo))
+            results.append((time.perf_counter() - start, len(system.meta_agent.workpad.missing)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--slo", type=float, default=4.0, help="query deadline (s)")
+    parser.add_argument("--slow-share", type=float, default=0.3, help="share of PDF lookups that stall")
+    parser.add_argument("--slow-latency", type=float, default=6.0, help="stall of a slow PDF lookup (s)")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake LLM time to first token (s)")
+    parser.add_argument("--tps", type=float, default=200.0, help="fake LLM tokens per second")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per fake LLM reply")
+    parser.add_argument("--router-ttft", type=float, default=None, help="router model time to first token (s)")
+    parser.add_argument("--api-latency", type=float, default=0.3, help="stub Serper/Alpha Vantage latency (s)")
+    parser.add_argument("--verbose", action="store_true", help="show system output")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    queries = [corpus[i % len(corpus)] for i in range(args.queries)]
+    Config.model_config.provider = "ollama"
+    Config.synthesis_config.single_agent_mode = "synthesize"
+    Config.api_config.serper_api_key = "bench"
+    Config.api_config.alpha_vantage_key = "bench"
+    Config.web_enrich_config.enabled = False
+    Config.price_history_config.enabled = False
+    install_fake_llms(args)
+    SlowPDFTool.slow_share = args.slow_share
+    SlowPDFTool.slow_latency = args.slow_latency
+    e2e_bench.StubPDFTool = SlowPDFTool
+    args.stub_pdf = True
+
+    runs = {}
+    with StubAPIServer(latency=args.api_latency) as server:
+        Config.api_config.serper_base_url = f"{server.url}/search"
+        Config.api_config.alpha_vantage_base_url = f"{server.url}/query"
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            system = build_system(args, AnswerTimer())
+            for name, slo in (("no deadline", 0), (f"slo {args.slo:g}s", args.slo)):
+                SlowPDFTool.rng = random.Random(0)
+                deadline_metrics.reset()
+                runs[name] = asyncio.run(run(system, queries, slo))
+
+    print(f"{len(queries)} queries, {args.slow_share:.0%} of PDF lookups stall {args.slow_latency}s, "
+          f"ttft={args.ttft}s, {args.tps} tok/s, api latency={args.api_latency}s")
+    print(f"{'':<12} {'p50 s':>7} {'p95 s':>7} {'max s':>7} {'over slo':>9} {'missing sources':>16}")
+    for name, results in runs.items():
+        latencies = [r[0] for r in results]
+        print(f"{name:<12} {percentile(latencies, 0.5):>7.2f} {percentile(latencies, 0.95):>7.2f} "
+              f"{max(latencies):>7.2f} {sum(l > args.slo for l in latencies):>9} {sum(r[1] for r in results):>16}")
+    print()
+    print(deadline_metrics.format_summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Near-duplicate chunk removal at index time (utils/dedup.py, scripts/json_to_index.py).
+
+Builds the index from data/processed (run scripts/pdf_to_json.py first) as
+is and with planted copies: --copies documents re-extracted with a few words
+changed and different line breaks (a re-issued PDF), and the same number of
+excerpts, where a copy starts part way into a document so its chunk
+boundaries no longer line up with the original's. Each corpus is indexed
+with and without dedup. Reports:
+
+    chunks     chunks embedded into the index
+    removed    chunks dropped as near-duplicates
+    planted    share of chunks from planted copies that were dropped
+    original   dropped chunks from original documents (text the corpus repeats itself)
+    lsh miss   chunks covered by the kept index as a whole but not by LSH candidates
+    dedup s    time spent finding duplicates
+    build s    chunking + dedup + embedding + FAISS build time
+    size MB    index size on disk
+
+Embedding time scales with the chunk count. Pass --real-embeddings to time
+MiniLM itself; by default fake embeddings keep the bench offline.
+
+    python bench/dedup_bench.py --copies 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.dedup import find_near_duplicates, shingles
+from bench.rag_bench import load_embeddings
+
+PLANTED = ("_reissue", "_excerpt")
+
+
+def reissue(text: str, rng: random.Random, edit_rate: float = 0.02) -> str:
+    """Same document extracted again: a few words changed and lines wrapped differently"""
+    words = text.split()
+    for i in range(len(words)):
+        if rng.random() < edit_rate:
+            words[i] = rng.choice(["the", "a", "revised", "updated", "note"])
+    lines, line = [], []
+    for word in words:
+        line.append(word)
+        if len(line) >= rng.randint(8, 14):
+            lines.append(" ".join(line))
+            line = []
+    return "\n".join(lines + [" ".join(line)])
+
+
+def excerpt(text: str, rng: random.Random) -> str:
+    """The back part of a document starting mid-paragraph, so chunk boundaries shift"""
+    start = int(len(text) * rng.uniform(0.2, 0.4))
+    return text[start:]
+
+
+def planted_corpus(source: str, target: str, copies: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    files = sorted(f for f in os.listdir(source) if f.endswith(".json"))
+    for file_name in files:
+        shutil.copy(os.path.join(source, file_name), target)
+    for file_name in rng.sample(files, min(copies, len(files))):
+        with open(os.path.join(source, file_name)) as f:
+            data = json.load(f)
+        stem = file_name[:-len(".json")]
+        for suffix, make in zip(PLANTED, (reissue, excerpt)):
+            copy = {"text": make(data["text"], rng),
+                    "metadata": {**data["metadata"], "source_file": f"{stem}{suffix}.pdf"}}
+            # "zz_" sorts the copies after every original, so the original is the chunk that stays
+            with open(os.path.join(target, f"zz_{stem}{suffix}.json"), "w") as f:
+                json.dump(copy, f)
+
+
+def exhaustive_duplicates(texts, sources, threshold: float, shingle_words: int) -> set:
+    """Chunks at least threshold covered by all earlier kept chunks together (bar their document's previous chunk), without LSH"""
+    sets = [shingles(text, shingle_words) for text in texts]
+    kept, duplicates = [], set()
+    for i, chunk in enumerate(sets):
+        covered = set()
+        for j in kept:
+            if not (j == i - 1 and sources[j] == sources[i]):
+                covered |= chunk & sets[j]
+        if chunk and len(covered) / len(chunk) >= threshold:
+            duplicates.add(i)
+        else:
+            kept.append(i)
+    return duplicates
+
+
+def measure(folder: str, embeddings, dedup: bool) -> dict:
+    from scripts.json_to_index import create_faiss_index, load_and_split_texts
+
+    settings = Config.rag_config
+    texts, metadatas = load_and_split_texts(folder)
+    sources = [metadata["source_file"] for metadata in metadatas]
+    result = {"chunks": len(texts), "removed": 0, "planted": 0.0, "original": 0, "lsh_miss": 0, "dedup_s": 0.0}
+    if dedup:
+        start = time.perf_counter()
+        found = find_near_duplicates(texts, settings.dedup_threshold, settings.dedup_shingle_words, documents=sources)
+        result["dedup_s"] = time.perf_counter() - start
+        removed = set(found.duplicates)
+        planted = [i for i, source in enumerate(sources) if any(s in source for s in PLANTED)]
+        result.update(
+            chunks=len(found.keep),
+            removed=len(removed),
+            planted=len(removed & set(planted)) / len(planted) if planted else 0.0,
+            original=len([i for i in removed if not any(s in sources[i] for s in PLANTED)]),
+            lsh_miss=len(exhaustive_duplicates(texts, sources, settings.dedup_threshold, settings.dedup_shingle_words) - removed),
+        )
+
+    with tempfile.TemporaryDirectory() as index_path:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_faiss_index(folder, index_path, embeddings=embeddings, dedup=dedup)
+        result["build_s"] = time.perf_counter() - start
+        result["size_mb"] = sum(f.stat().st_size for f in Path(index_path).iterdir()) / (1024 * 1024)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--text-folder", default=Config.path_config.processed_dir)
+    parser.add_argument("--copies", type=int, default=3, help="documents planted twice (re-issue and excerpt)")
+    parser.add_argument("--threshold", type=float, default=None, help="INDEX_DEDUP_THRESHOLD")
+    parser.add_argument("--real-embeddings", action="store_true", help="embed with the configured model")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.text_folder):
+        sys.exit(f"{args.text_folder} not found, run scripts/pdf_to_json.py first")
+    if args.threshold is not None:
+        Config.rag_config.dedup_threshold = args.threshold
+    embeddings = load_embeddings(fake=not args.real_embeddings)
+
+    print(f"threshold {Config.rag_config.dedup_threshold}, {Config.rag_config.dedup_shingle_words}-word shingles, "
+          f"{'real' if args.real_embeddings else 'fake'} embeddings")
+    print(f"{'corpus':<9} {'dedup':<6} {'chunks':>6} {'removed':>8} {'planted':>8} {'original':>9} {'lsh miss':>9} "
+          f"{'dedup s':>8} {'build s':>8} {'size MB':>8}")
+    with tempfile.TemporaryDirectory() as planted:
+        planted_corpus(args.text_folder, planted, args.copies)
+        for corpus, folder in (("as is", args.text_folder), ("planted", planted)):
+            for dedup in (False, True):
+                r = measure(folder, embeddings, dedup)
+                print(f"{corpus:<9} {'on' if dedup else 'off':<6} {r['chunks']:>6} {r['removed']:>8} "
+                      f"{r['planted']:>8.0%} {r['original']:>9} {r['lsh_miss']:>9} {r['dedup_s']:>8.2f} "
+                      f"{r['build_s']:>8.2f} {r['size_mb']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+End-to-end benchmark of ExpertSystem with no external services.
+
+Each worker is one chat session (its own ExpertSystem and memory, as in
+Chainlit) replaying queries from the corpus. LLMs are replaced by the
+deterministic FakeStreamingLLM; Serper and Alpha Vantage are served by a
+local stub HTTP server, so the real tools run their request/parse code; the
+PDF agent uses the real FAISS index in Config.path_config.index_dir (build it
+with scripts/pdf_to_json.py and scripts/json_to_index.py, or pass --stub-pdf).
+
+    python bench/e2e_bench.py --concurrency 8 --queries 64 --ttft 0.2 --tps 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import resource
+import sys
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.memory import AgentMemoryManager
+from utils.metrics import llm_metrics
+from utils.cache_store import format_cache_stats
+from utils.streaming import StreamDispatcher, StreamEvent
+from utils import session, tracing
+from agents.base_agent import BaseAgent
+from bench.fake_llm import FakeStreamingLLM
+from bench.stub_server import StubAPIServer
+
+DEFAULT_CORPUS = Path(__file__).parent / "queries.txt"
+
+
+class AnswerTimer(StreamDispatcher):
+    """Discards the stream but records when the user-facing answer starts"""
+
+    def __init__(self):
+        self.answer_agent = None
+        self.first_answer_token = None
+
+    async def on_start(self, event: StreamEvent) -> None:
+        if event.agent == "meta" or event.metadata.get("direct"):
+            self.answer_agent = event.agent
+
+    async def on_token(self, event: StreamEvent) -> None:
+        if event.agent == self.answer_agent and event.role != "router" and self.first_answer_token is None:
+            self.first_answer_token = time.perf_counter()
+
+    def reset(self):
+        self.answer_agent = None
+        self.first_answer_token = None
+
+
+class StubPDFTool:
+    """Canned retrieval for runs without a built FAISS index"""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+
+    def warm_up(self):
+        return None
+
+    def query_documents(self, query: str) -> str:
+        time.sleep(self.latency)
+        return "\n".join(
+            f"Document {i}:\nSource: stub.pdf\nContent: Background on {query} (section {i}).\n"
+            for i in range(1, 6)
+        )
+
+
+def install_fake_llms(args) -> None:
+    """Every agent role gets a FakeStreamingLLM instead of a provider client"""
+    def fake_llm(agent, role=None, provider=None):
+        role = role or agent.role
+        ttft = args.router_ttft if role == "router" and args.router_ttft is not None else args.ttft
+        return FakeStreamingLLM(ttft=ttft, tokens_per_second=args.tps, max_tokens=args.tokens)
+
+    BaseAgent._initialize_llm = fake_llm
+
+
+def build_system(args, dispatcher):
+    from utils.expert_system import ExpertSystem
+    from agents import pdf_agent
+
+    if args.stub_pdf:
+        # Swap the tool before PDFAgent is built so the embedding model is never loaded
+        pdf_agent.PDFTool = StubPDFTool
+    return ExpertSystem(dispatcher=dispatcher)
+
+
+async def _warm_up(systems):
+    # Sessions share one retrieval stack, load it before timing queries
+    await asyncio.gather(*(system.warm_up() for system in systems))
+
+
+def load_corpus(path) -> list:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+async def worker(system, timer, queue: asyncio.Queue, results: list):
+    """One chat session: queries run sequentially against the same system and memory"""
+    with session.local_session(memory_manager=AgentMemoryManager()):
+        while True:
+            try:
+                query = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            timer.reset()
+            start = time.perf_counter()
+            await system.process_query(query)
+            end = time.perf_counter()
+            results.append((end - start, (timer.first_answer_token or end) - start))
+
+
+async def run(systems, corpus, total: int):
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(corpus[i % len(corpus)])
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(system, system.dispatcher, queue, results) for system in systems))
+    return time.perf_counter() - start, results
+
+
+def percentile(values, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct * (len(values) - 1))))]
+
+
+def rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent chat sessions")
+    parser.add_argument("--queries", type=int, default=32, help="total queries to replay")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake LLM time to first token (s)")
+    parser.add_argument("--tps", type=float, default=200.0, help="fake LLM tokens per second")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per fake LLM reply")
+    parser.add_argument("--router-ttft", type=float, default=None, help="router model time to first token (s)")
+    parser.add_argument("--api-latency", type=float, default=0.3, help="stub Serper/Alpha Vantage latency (s)")
+    parser.add_argument("--stub-pdf", action="store_true", help="canned PDF context instead of the FAISS index")
+    parser.add_argument("--incremental", action="store_true", help="enable incremental synthesis")
+    parser.add_argument("--verbose", action="store_true", help="show system output")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    Config.model_config.provider = "ollama"
+    Config.synthesis_config.incremental = args.incremental
+    Config.api_config.serper_api_key = "bench"
+    Config.api_config.alpha_vantage_key = "bench"
+    install_fake_llms(args)
+    tracing.configure_tracing()
+
+    with StubAPIServer(latency=args.api_latency) as server:
+        Config.api_config.serper_base_url = f"{server.url}/search"
+        Config.api_config.alpha_vantage_base_url = f"{server.url}/query"
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        with output:
+            systems = [build_system(args, AnswerTimer()) for _ in range(args.concurrency)]
+            asyncio.run(_warm_up(systems))
+        startup = time.perf_counter() - start
+        rss_loaded = rss_mb()
+
+        llm_metrics.reset()
+        with output:
+            elapsed, results = asyncio.run(run(systems, corpus, args.queries))
+        api_requests = server.requests
+
+    latencies = [r[0] for r in results]
+    ttfts = [r[1] for r in results]
+    print(f"{args.queries} queries, {args.concurrency} sessions, ttft={args.ttft}s, {args.tps} tok/s, "
+          f"api latency={args.api_latency}s, pdf={'stub' if args.stub_pdf else 'faiss'}")
+    print(f"startup      {startup:7.2f}s for {args.concurrency} systems")
+    print(f"wall         {elapsed:7.2f}s  throughput={len(results) / elapsed:6.2f} q/s  stub api requests={api_requests}")
+    print(f"latency      p50={percentile(latencies, 0.50):6.2f}s  p95={percentile(latencies, 0.95):6.2f}s  "
+          f"p99={percentile(latencies, 0.99):6.2f}s")
+    print(f"answer ttft  p50={percentile(ttfts, 0.50):6.2f}s  p95={percentile(ttfts, 0.95):6.2f}s  "
+          f"p99={percentile(ttfts, 0.99):6.2f}s")
+    print(f"memory       peak rss={rss_mb():.0f} MB (before systems {rss_before:.0f} MB, after startup {rss_loaded:.0f} MB)")
+    print()
+    print(llm_metrics.format_summary())
+    print()
+    print("Estimated prompt tokens per section")
+    print(llm_metrics.format_prompt_sections())
+    print()
+    print(format_cache_stats())
+    tracing.shutdown_tracing()
+
+
+if __name__ == "__main__":
+    main()
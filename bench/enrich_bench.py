@@ -0,0 +1,124 @@
+"""
+Page-content enrichment (tools/web_tools.py PageEnricher) against local pages.
+
+Serves article pages wrapped in nav/script/footer boilerplate from
+bench/stub_server.py FixturePageServer, some fast, some slower than the
+per-page budget, plus a non-HTML response. Reports enrichment wall time
+against the total budget, pages enriched vs dropped, whether the excerpts keep
+the article text and leave the boilerplate out, the speedup of a second
+(cached) run, the sequential-fetch baseline, and the size of the web prompt
+section with and without page excerpts.
+
+    python bench/enrich_bench.py --pages 3 --slow 1 --delay 0.3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.prompt_builder import format_search_results
+from utils.metrics import estimate_tokens
+from bench.stub_server import ARTICLE_PARAGRAPHS, FixturePageServer
+
+QUERY = "why did treasury yields rise after the fed held rates"
+BOILERPLATE_MARKERS = ["NAVIGATION", "FOOTER", "Subscribe now", "font-family"]
+
+
+def search_results(base_url: str, args) -> list:
+    """Serper-shaped results: fast pages, slow pages, then a PDF"""
+    results = []
+    for i in range(args.pages):
+        delay = args.slow_delay if i >= args.pages - args.slow else args.delay
+        results.append({
+            "title": f"Fed holds rates steady - source {i + 1}",
+            "snippet": "The Federal Reserve left rates unchanged on Wednesday. Yields rose.",
+            "link": f"{base_url}/page/{i}?delay={delay}",
+            "date": "2024-11-15",
+        })
+    results.append({"title": "Annual report", "snippet": "PDF", "link": f"{base_url}/binary", "date": ""})
+    return results
+
+
+def check_excerpt(content: str) -> dict:
+    return {
+        "article": ARTICLE_PARAGRAPHS[1][:60] in content,
+        "clean": not any(marker in content for marker in BOILERPLATE_MARKERS),
+    }
+
+
+async def sequential_fetch(enricher, results: list) -> float:
+    """Same fetches one after another, without the total budget"""
+    start = time.perf_counter()
+    for result in results:
+        await enricher._fetch_text(result["link"])
+    return time.perf_counter() - start
+
+
+async def run(args, base_url: str) -> None:
+    from tools.web_tools import PageEnricher, close_http_session
+
+    enricher = PageEnricher()
+    results = search_results(base_url, args)
+
+    start = time.perf_counter()
+    cold = await enricher.enrich(QUERY, results)
+    cold_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    warm = await enricher.enrich(QUERY, results)
+    warm_seconds = time.perf_counter() - start
+
+    enricher.cache.clear()
+    fast = [r for r in results[:Config.web_enrich_config.pages] if f"delay={args.slow_delay}" not in r["link"]]
+    sequential_seconds = await sequential_fetch(enricher, fast)
+    await close_http_session()
+
+    enriched = [r for r in cold if r.get("content")]
+    checks = [check_excerpt(r["content"]) for r in enriched]
+    settings = Config.web_enrich_config
+    print(f"{settings.pages} pages enriched at most, page budget {settings.page_timeout}s, "
+          f"total budget {settings.total_timeout}s")
+    print(f"cold run:      {cold_seconds * 1000:7.1f} ms  ({len(enriched)} enriched, "
+          f"{min(settings.pages, len(results)) - len(enriched)} kept snippet only)")
+    print(f"cached run:    {warm_seconds * 1000:7.1f} ms  ({sum(1 for r in warm if r.get('content'))} enriched, "
+          f"{cold_seconds / max(warm_seconds, 1e-6):.0f}x faster)")
+    print(f"sequential:    {sequential_seconds * 1000:7.1f} ms  for the {len(fast)} fast pages one by one")
+    print(f"article text kept: {sum(c['article'] for c in checks)}/{len(checks)}, "
+          f"boilerplate-free: {sum(c['clean'] for c in checks)}/{len(checks)}")
+    plain = format_search_results(results)
+    with_pages = format_search_results(cold)
+    print(f"web results section: {estimate_tokens(plain)} tokens snippets only, "
+          f"{estimate_tokens(with_pages)} tokens with page excerpts")
+    if args.show and enriched:
+        print("\nexcerpt:\n" + enriched[0]["content"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=3, help="result pages served as HTML")
+    parser.add_argument("--slow", type=int, default=1, help="how many of them exceed the page budget")
+    parser.add_argument("--delay", type=float, default=0.3, help="latency of the fast pages")
+    parser.add_argument("--slow-delay", type=float, default=5.0)
+    parser.add_argument("--page-timeout", type=float, default=1.0)
+    parser.add_argument("--total-timeout", type=float, default=1.5)
+    parser.add_argument("--show", action="store_true", help="print one excerpt")
+    args = parser.parse_args()
+
+    Config.web_enrich_config.pages = args.pages
+    Config.web_enrich_config.page_timeout = args.page_timeout
+    Config.web_enrich_config.total_timeout = args.total_timeout
+    # Process-local cache so runs never read pages cached by a previous run
+    Config.cache_config.backend = "memory"
+    with FixturePageServer() as server:
+        asyncio.run(run(args, server.url))
+    os._exit(0)  # slow fixture handlers are still sleeping in daemon threads
+
+
+if __name__ == "__main__":
+    main()
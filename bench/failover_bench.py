@@ -0,0 +1,142 @@
+"""
+LLM provider failover, circuit breakers and hedged requests (utils/providers.py).
+
+Every provider is a local fake (FlakyProviderLLM in bench/fake_llm.py), so
+outages and slow tails are reproducible. Agent LLM calls run concurrently
+through BaseAgent._ainvoke_llm in three scenarios:
+
+- outage: the primary (anthropic) is down for the whole run
+- flaky:  the primary fails on --error-rate of calls
+- tail:   the primary stalls for --slow-ttft on --slow-rate of calls
+
+each with the previous single-provider setup, with failover
+(LLM_FAILOVER=anthropic,groq,ollama) and with failover plus hedging
+(LLM_HEDGE=true). Reports answered calls, error strings returned, time to
+first token and total latency percentiles, and failover_metrics.
+
+    python bench/failover_bench.py --calls 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.metrics import failover_metrics
+from utils.providers import provider_pool
+from utils.streaming import StreamDispatcher, StreamMultiplexer
+from agents.base_agent import BaseAgent
+from bench.e2e_bench import percentile
+from bench.fake_llm import FlakyProviderLLM
+
+SCENARIOS = ["outage", "flaky", "tail"]
+SETUPS = {"single": ([], False), "failover": (["anthropic", "groq", "ollama"], False),
+          "hedged": (["anthropic", "groq", "ollama"], True)}
+
+
+class FirstToken(StreamDispatcher):
+    def __init__(self):
+        self.at = None
+
+    async def on_token(self, event) -> None:
+        if self.at is None:
+            self.at = time.perf_counter()
+
+
+class BenchAgent(BaseAgent):
+    def process(self, query: str) -> str:
+        return self._invoke_llm(query)
+
+
+def providers_for(scenario: str, args) -> dict:
+    primary = dict(ttft=args.ttft, tokens_per_second=args.tps, max_tokens=args.tokens, seed=1)
+    if scenario == "outage":
+        primary["down"] = True
+    elif scenario == "flaky":
+        primary["error_rate"] = args.error_rate
+    else:
+        primary.update(slow_rate=args.slow_rate, slow_ttft=args.slow_ttft)
+    return {
+        "anthropic": FlakyProviderLLM(**primary),
+        "groq": FlakyProviderLLM(ttft=args.ttft * 1.3, tokens_per_second=args.tps, max_tokens=args.tokens, seed=2),
+        "ollama": FlakyProviderLLM(ttft=args.ttft * 3, tokens_per_second=args.tps / 4, max_tokens=args.tokens, seed=3),
+    }
+
+
+async def run(agent, stream, calls: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def call(i):
+        async with semaphore:
+            dispatcher = FirstToken()
+            async with stream.request(dispatcher):
+                start = time.perf_counter()
+                text = await agent._ainvoke_llm(f"bench call {i}")
+                end = time.perf_counter()
+            results.append((agent._is_error_output(text), (dispatcher.at or end) - start, end - start))
+
+    await asyncio.gather(*(call(i) for i in range(calls)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.3, help="fake provider time to first token (s)")
+    parser.add_argument("--tps", type=float, default=400.0, help="fake provider tokens per second")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per reply")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="primary failure rate in the flaky scenario")
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="share of primary calls that stall in the tail scenario")
+    parser.add_argument("--slow-ttft", type=float, default=3.0, help="time to first token of a stalled call (s)")
+    parser.add_argument("--verbose", action="store_true", help="show provider errors as they happen")
+    args = parser.parse_args()
+
+    Config.model_config.provider = "anthropic"
+    Config.model_config.anthropic_api_key = "bench"
+    Config.model_config.groq_api_key = "bench"
+    Config.failover_config.hedge_min_samples = 10
+
+    print(f"{args.calls} calls per run, concurrency {args.concurrency}, primary ttft {args.ttft}s")
+    print(f"{'scenario':<9} {'setup':<9} {'answered':>8} {'errors':>7} {'ttft p50':>9} {'ttft p95':>9} {'ttft p99':>9} "
+          f"{'total p99':>10} {'provider calls':>15}")
+    for scenario in SCENARIOS:
+        for setup, (failover, hedge) in SETUPS.items():
+            llms = providers_for(scenario, args)
+            BaseAgent._initialize_llm = (
+                lambda agent, role=None, provider=None: llms[provider or Config.model_config.for_role(role or agent.role).provider]
+            )
+            Config.failover_config.providers = failover
+            Config.failover_config.hedge = hedge
+            provider_pool.reset()
+            failover_metrics.reset()
+            stream = StreamMultiplexer()
+            agent = BenchAgent("web", stream=stream)
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output:
+                results = asyncio.run(run(agent, stream, args.calls, args.concurrency))
+
+            answered = [r for r in results if not r[0]]
+            ttfts = [r[1] for r in answered] or [0.0]
+            totals = [r[2] for r in answered] or [0.0]
+            calls = ", ".join(f"{name} {llm.calls}" for name, llm in llms.items() if llm.calls)
+            print(f"{scenario:<9} {setup:<9} {len(answered):>8} {len(results) - len(answered):>7} "
+                  f"{percentile(ttfts, 0.5):>8.2f}s {percentile(ttfts, 0.95):>8.2f}s {percentile(ttfts, 0.99):>8.2f}s "
+                  f"{percentile(totals, 0.99):>9.2f}s  {calls}")
+            summary = failover_metrics.summary()
+            if summary["failovers"] or summary["hedges"] or summary["circuits_opened"]:
+                print(f"{'':<19} failovers {summary['failovers']}, circuits opened {summary['circuits_opened']}, "
+                      f"skipped while open {summary['skipped_open']}, hedges {summary['hedges']} "
+                      f"(won {summary['hedges_won']})")
+
+
+if __name__ == "__main__":
+    main()
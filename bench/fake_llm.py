@@ -0,0 +1,137 @@
+import asyncio
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+def default_responder(prompt: str) -> str:
+    """Deterministic replies shaped like the real prompts expect"""
+    if '"workflow"' in prompt:
+        raw_query = prompt.split("Query:")[-1].split("\n")[0]
+        query = raw_query.lower()
+        workflow = []
+        if "(" in query or any(word.isupper() and len(word) <= 4 for word in raw_query.split()):
+            workflow.append({"agent": "finance", "reason": "market data for the requested symbols"})
+        if any(word in query for word in ("explain", "how", "what is", "strateg", "learn")):
+            workflow.append({"agent": "pdf", "reason": "background knowledge"})
+        if not workflow or any(word in query for word in ("current", "news", "latest", "week", "rate")):
+            workflow.append({"agent": "web", "reason": "current context"})
+        return json.dumps({
+            "query_type": "ANALYSIS",
+            "complexity": "INTERMEDIATE",
+            "workflow": workflow,
+            "reason": "benchmark routing"
+        })
+    return " ".join(["lorem"] * 120)
+
+
+class FakeStreamingLLM(BaseChatModel):
+    """Chat model with configurable time-to-first-token and token rate"""
+
+    ttft: float = 0.2
+    tokens_per_second: float = 200.0
+    max_tokens: Optional[int] = None
+    responder: Callable[[str], str] = default_responder
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        words = self.responder(prompt).split(" ")
+        if self.max_tokens:
+            words = words[:self.max_tokens]
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.ttft)
+        for token in self._tokens(messages):
+            time.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.ttft)
+        for token in self._tokens(messages):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = "".join(chunk.text for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        chunks = [chunk.text async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(chunks)))])
+
+
+class FlakyProviderLLM(FakeStreamingLLM):
+    """Fake provider that fails or stalls on a seeded share of calls, or on every call while `down`"""
+
+    error_rate: float = 0.0
+    slow_rate: float = 0.0
+    slow_ttft: float = 3.0
+    down: bool = False
+    seed: int = 0
+    calls: int = 0
+    rng: Any = None
+
+    def _draw(self) -> float:
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+        self.calls += 1
+        return self.rng.random()
+
+    def _outcome(self) -> Optional[float]:
+        """Time to first token for this call; raises for a failed one"""
+        draw = self._draw()
+        if self.down or draw < self.error_rate:
+            raise ConnectionError("provider unavailable (503)")
+        return self.slow_ttft if draw > 1 - self.slow_rate else self.ttft
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        ttft = self._outcome()
+        time.sleep(ttft - self.ttft)
+        yield from super()._stream(messages, stop, run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        ttft = self._outcome()
+        await asyncio.sleep(ttft - self.ttft)
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
@@ -0,0 +1,185 @@
+"""
+Price history store and indicators (tools/price_history.py) against fixture series.
+
+Runs PriceHistoryTool against the stub Alpha Vantage API (bench/stub_server.py
+serves TIME_SERIES_DAILY from deterministic fixture series) with a temporary
+store directory:
+
+- cold fetch, a second call within the refresh window (no API requests), then
+  the stub moves forward a few trading days and a refresh appends only those
+- the stored columns match the fixture series exactly, with no duplicate days
+- each vectorized indicator matches a plain-Python reference implementation
+- indicator time, vectorized vs the reference loops, on full-size histories
+- prompt size of the raw daily series vs the precomputed summary
+
+    python bench/history_bench.py --symbols AAPL MSFT NVDA --advance 3
+"""
+import argparse
+import datetime
+import json
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.metrics import estimate_tokens
+from bench.stub_server import StubAPIServer, daily_response, fixture_series
+
+
+def reference_rsi(close, window=14):
+    changes = [b - a for a, b in zip(close, close[1:])]
+    gains = [max(c, 0) for c in changes]
+    losses = [max(-c, 0) for c in changes]
+    avg_gain = sum(gains[:window]) / window
+    avg_loss = sum(losses[:window]) / window
+    for gain, loss in zip(gains[window:], losses[window:]):
+        avg_gain = (avg_gain * (window - 1) + gain) / window
+        avg_loss = (avg_loss * (window - 1) + loss) / window
+    return 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def reference_volatility(close, window):
+    returns = [math.log(b / a) for a, b in zip(close[-window - 1:], close[-window:])]
+    mean = sum(returns) / len(returns)
+    return math.sqrt(sum((r - mean) ** 2 for r in returns) / (len(returns) - 1)) * math.sqrt(252) * 100
+
+
+def reference_max_drawdown(close):
+    peak, worst = close[0], 0.0
+    for price in close:
+        peak = max(peak, price)
+        worst = min(worst, price / peak - 1)
+    return worst * 100
+
+
+def reference_correlation(a, b):
+    ra = [math.log(y / x) for x, y in zip(a, a[1:])]
+    rb = [math.log(y / x) for x, y in zip(b, b[1:])]
+    ma, mb = sum(ra) / len(ra), sum(rb) / len(rb)
+    cov = sum((x - ma) * (y - mb) for x, y in zip(ra, rb))
+    return cov / math.sqrt(sum((x - ma) ** 2 for x in ra) * sum((y - mb) ** 2 for y in rb))
+
+
+def check_indicators(symbols, end):
+    """Max absolute difference between the vectorized and reference indicators"""
+    from tools.price_history import rsi, volatility, drawdowns, correlations, parse_daily_series
+
+    histories = {s: parse_daily_series(daily_response(s, "full", end)["Time Series (Daily)"]) for s in symbols}
+    errors = {"rsi": 0.0, "volatility": 0.0, "drawdown": 0.0, "correlation": 0.0}
+    for bars in histories.values():
+        close = bars["close"]
+        errors["rsi"] = max(errors["rsi"], abs(rsi(close) - reference_rsi(list(close))))
+        errors["volatility"] = max(errors["volatility"], abs(volatility(close, 60) - reference_volatility(list(close), 60)))
+        errors["drawdown"] = max(errors["drawdown"],
+                                 abs(drawdowns(close)["max"] - reference_max_drawdown(list(close))))
+    if len(symbols) > 1:
+        first, second = symbols[:2]
+        fast = correlations({first: histories[first], second: histories[second]}, 60)[f"{first}/{second}"]
+        slow = reference_correlation(list(histories[first]["close"][-61:]), list(histories[second]["close"][-61:]))
+        errors["correlation"] = abs(fast - slow)
+    return histories, errors
+
+
+def time_indicators(histories, repeat):
+    from tools.price_history import summarize, correlations
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for bars in histories.values():
+            summarize(bars)
+        correlations(histories, 60)
+    vectorized = (time.perf_counter() - start) / repeat
+
+    closes = {s: list(bars["close"]) for s, bars in histories.items()}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for close in closes.values():
+            reference_rsi(close)
+            reference_volatility(close, 20)
+            reference_volatility(close, 60)
+            reference_max_drawdown(close)
+        series = list(closes.values())
+        for i in range(len(series)):
+            for j in range(i + 1, len(series)):
+                reference_correlation(series[i][-61:], series[j][-61:])
+    reference = (time.perf_counter() - start) / repeat
+    return vectorized, reference
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", nargs="+", default=["AAPL", "MSFT", "NVDA"])
+    parser.add_argument("--advance", type=int, default=3, help="trading days the stub moves forward")
+    parser.add_argument("--outputsize", choices=["compact", "full"], default="full")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    store_dir = tempfile.mkdtemp(prefix="prices-")
+    Config.price_history_config.path = store_dir
+    Config.price_history_config.outputsize = args.outputsize
+    Config.api_config.alpha_vantage_key = "bench"
+    from tools.price_history import PriceHistoryTool
+
+    with StubAPIServer(latency=0) as server:
+        Config.api_config.alpha_vantage_base_url = f"{server.url}/query"
+        tool = PriceHistoryTool()
+
+        start = time.perf_counter()
+        summary = tool.technicals(args.symbols)
+        cold = time.perf_counter() - start, server.requests
+
+        before = server.requests
+        start = time.perf_counter()
+        tool.technicals(args.symbols)
+        warm = time.perf_counter() - start, server.requests - before
+
+        end = datetime.date.fromisoformat(server.history_end)
+        while args.advance:
+            end += datetime.timedelta(days=1)
+            args.advance -= end.weekday() < 5
+        server.history_end = end.isoformat()
+        tool.settings.refresh_hours = 0
+        lengths = {s: len(tool.store.load(s)["date"]) for s in args.symbols}
+        before = server.requests
+        start = time.perf_counter()
+        summary = tool.technicals(args.symbols)
+        refresh = time.perf_counter() - start, server.requests - before
+        added = {s: len(tool.store.load(s)["date"]) - lengths[s] for s in args.symbols}
+
+    consistent = True
+    for symbol in args.symbols:
+        bars = tool.store.load(symbol)
+        expected = fixture_series(symbol, server.history_end)[-len(bars["date"]):]
+        dates = [(datetime.date(1970, 1, 1) + datetime.timedelta(days=int(d))).isoformat() for d in bars["date"]]
+        consistent &= dates == [row[0] for row in expected] and bool(np.all(np.diff(bars["date"]) > 0))
+        consistent &= bool(np.allclose(bars["close"], [row[4] for row in expected], atol=1e-4))
+
+    histories, errors = check_indicators(args.symbols, server.history_end)
+    vectorized, reference = time_indicators(histories, args.repeat)
+    raw = sum(estimate_tokens(json.dumps(daily_response(s, args.outputsize, server.history_end)))
+              for s in args.symbols)
+
+    days = len(next(iter(histories.values()))["date"])
+    print(f"{len(args.symbols)} symbols, outputsize={args.outputsize}, store {store_dir}")
+    print(f"cold fetch     {cold[0] * 1000:7.1f} ms  {cold[1]} api requests")
+    print(f"within window  {warm[0] * 1000:7.1f} ms  {warm[1]} api requests")
+    print(f"refresh        {refresh[0] * 1000:7.1f} ms  {refresh[1]} api requests, appended days {added}")
+    print(f"store matches fixture series, no duplicate days: {'yes' if consistent else 'NO'}")
+    print("max abs error vs reference: " + ", ".join(f"{k} {v:.2e}" for k, v in errors.items())
+          + " (correlations are rounded to 2 decimals)")
+    print(f"indicators ({days} days): vectorized {vectorized * 1000:.2f} ms, "
+          f"python loops {reference * 1000:.2f} ms ({reference / vectorized:.0f}x)")
+    print(f"prompt: raw daily series {raw} tokens, summary {estimate_tokens(json.dumps(summary, separators=(',', ':')))} tokens")
+    print(json.dumps(summary, indent=1)[:1500])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Concurrent conversation load test against a local fake LLM.
+
+Compares the blocking path (sync agent.process called from the event loop, as
+the Chainlit handlers used to), the async aprocess path, and incremental
+synthesis (agents run concurrently, synthesis starts on the first result).
+
+    python bench/load_test.py --conversations 20 --ttft 0.2 --tps 200
+
+Set TRACE_EXPORTER=json to also write spans for scripts/trace_report.py.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.memory import AgentMemoryManager
+from utils import session, tracing
+from utils.metrics import llm_metrics
+from bench.fake_llm import FakeStreamingLLM
+from langchain_core.callbacks import BaseCallbackHandler
+
+QUERIES = [
+    "What is the current federal funds rate?",
+    "Tell me whether the sentiment in the market this week is bullish or bearish",
+    "Compare (NVDA) and TSLA performance",
+    "Explain how covered call strategies work",
+]
+
+
+class StubSearchTool:
+    """Blocking stand-in for SerperTool"""
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def search(self, query: str, num_results: int = 5):
+        time.sleep(self.latency)
+        return [{
+            "title": f"Result {i}",
+            "snippet": f"Snippet {i} for {query}",
+            "link": f"https://example.com/{i}",
+            "date": "2024-11-28"
+        } for i in range(num_results)]
+
+
+class StubFinanceTool:
+    """Blocking stand-in for VantageFinanceTool"""
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get_stock_data(self, symbol: str):
+        time.sleep(self.latency)
+        return {
+            "current_price": {"price": 100.0, "change_percent": 1.2, "volume": 1000000, "trading_day": "2024-11-28"},
+            "fundamentals": {"market_cap": "1000000000", "pe_ratio": "20.1", "eps": "5.0"}
+        }
+
+
+class StubPDFAgent:
+    """Replaces PDFAgent so the benchmark does not need the FAISS index"""
+    def __init__(self, llm_agent):
+        self.llm_agent = llm_agent
+
+    def process(self, query: str) -> str:
+        return self.llm_agent.process(query)
+
+    async def aprocess(self, query: str) -> str:
+        return await self.llm_agent.aprocess(query)
+
+
+class FirstToken(BaseCallbackHandler):
+    """Records when the LLMs it is attached to produce their first token"""
+    run_inline = True
+
+    def __init__(self):
+        self.at = None
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if self.at is None:
+            self.at = time.perf_counter()
+
+
+class AnswerTimer:
+    """Records when the first token of the user-facing answer is produced"""
+
+    def __init__(self):
+        # The blocking path streams nothing to a dispatcher, so the fake LLMs report their own tokens
+        self.synthesis = FirstToken()
+        self.agents = FirstToken()
+
+    @property
+    def first_synthesis_token(self):
+        return self.synthesis.at
+
+    @property
+    def first_agent_token(self):
+        return self.agents.at
+
+    def answer_started(self):
+        # Direct single-agent answers have no synthesis pass
+        return self.first_synthesis_token or self.first_agent_token
+
+
+def build_meta_agent(args):
+    """Build one MetaAgent with fake LLMs and stub tools (one per conversation, as in Chainlit)"""
+    from agents.meta_agent import MetaAgent
+    from agents.web_agent import WebAgent
+    from agents.finance_agent import FinanceAgent
+
+    meta = MetaAgent()
+    web = WebAgent()
+    finance = FinanceAgent()
+    pdf_backing = WebAgent()
+    pdf_backing.role = "pdf"
+    # Local retrieval is fast, live APIs are slow
+    pdf_backing.search_tool = StubSearchTool(args.tool_latency)
+    web.search_tool = StubSearchTool(args.slow_tool_latency)
+    finance.finance_tool = StubFinanceTool(args.slow_tool_latency)
+
+    timer = AnswerTimer()
+    for agent in (meta, web, finance, pdf_backing):
+        agent.llm = FakeStreamingLLM(
+            ttft=args.ttft, tokens_per_second=args.tps, max_tokens=args.tokens,
+            callbacks=[timer.synthesis if agent is meta else timer.agents]
+        )
+    # Routing tokens are not part of the answer
+    meta.role_llms["router"] = FakeStreamingLLM(
+        ttft=args.router_ttft if args.router_ttft is not None else args.ttft,
+        tokens_per_second=args.tps
+    )
+    meta.role_llms["light_synthesizer"] = FakeStreamingLLM(
+        ttft=args.ttft, tokens_per_second=args.tps, max_tokens=args.tokens, callbacks=[timer.synthesis]
+    )
+    meta.answer_timer = timer
+
+    meta.registry.register("pdf", StubPDFAgent(pdf_backing))
+    meta.registry.register("finance", finance)
+    meta.registry.register("web", web)
+    return meta
+
+
+async def run_blocking(meta, query: str) -> str:
+    """The pre-async MetaAgent.process: every call blocks the event loop"""
+    memory_manager = session.get("memory_manager")
+    agents = meta._analyze_query(query)
+    meta.workpad.clear()
+    for agent_name in agents:
+        meta.workpad.write(agent_name, meta.registry.get_agent(agent_name).process(query))
+    response = meta._synthesize_with_memory(query, memory_manager.get_memory("meta").get("chat_history", ""))
+    memory_manager.save_context("meta", query, response)
+    return response
+
+
+async def run_async(meta, query: str) -> str:
+    return await meta.process(query)
+
+
+async def run_conversation(runner, meta, query: str):
+    with session.local_session(memory_manager=AgentMemoryManager()):
+        start = time.perf_counter()
+        with tracing.span("query", query=query):
+            await runner(meta, query)
+        end = time.perf_counter()
+        answer_started = meta.answer_timer.answer_started() or end
+        return end - start, answer_started - start
+
+
+async def run_mode(runner, args):
+    metas = [build_meta_agent(args) for _ in range(args.conversations)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_conversation(runner, meta, QUERIES[i % len(QUERIES)])
+        for i, meta in enumerate(metas)
+    ))
+    return time.perf_counter() - start, sorted(r[0] for r in results), sorted(r[1] for r in results)
+
+
+def _p95(values):
+    return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+
+def report(name: str, elapsed: float, latencies, answer_ttfts, conversations: int):
+    print(
+        f"{name:<12} wall={elapsed:7.2f}s  throughput={conversations / elapsed:6.2f} conv/s  "
+        f"mean={statistics.mean(latencies):6.2f}s  p95={_p95(latencies):6.2f}s  "
+        f"answer ttft mean={statistics.mean(answer_ttfts):6.2f}s  p95={_p95(answer_ttfts):6.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake LLM time to first token (s)")
+    parser.add_argument("--tps", type=float, default=200.0, help="fake LLM tokens per second")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per fake LLM reply")
+    parser.add_argument("--router-ttft", type=float, default=None, help="router model time to first token (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.1, help="stub PDF retrieval latency (s)")
+    parser.add_argument("--slow-tool-latency", type=float, default=0.5, help="stub web/finance API latency (s)")
+    parser.add_argument("--mode", choices=["blocking", "async", "incremental", "all"], default="all")
+    args = parser.parse_args()
+
+    # Tools are stubbed, but the agents validate keys on construction
+    Config.model_config.provider = "ollama"
+    Config.api_config.serper_api_key = Config.api_config.serper_api_key or "bench"
+    Config.api_config.alpha_vantage_key = Config.api_config.alpha_vantage_key or "bench"
+
+    modes = {"blocking": run_blocking, "async": run_async, "incremental": run_async}
+    selected = modes if args.mode == "all" else {args.mode: modes[args.mode]}
+
+    tracing.configure_tracing()
+    print(f"{args.conversations} concurrent conversations, ttft={args.ttft}s, {args.tps} tok/s, {args.tokens} tok/reply")
+    for name, runner in selected.items():
+        llm_metrics.reset()
+        Config.synthesis_config.incremental = name == "incremental"
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, latencies, answer_ttfts = asyncio.run(run_mode(runner, args))
+        report(name, elapsed, latencies, answer_ttfts, args.conversations)
+        print(llm_metrics.format_summary() + "\n")
+    tracing.shutdown_tracing()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Retrieval quality and latency of the PDF RAG path per chunking and retrieval
+configuration.
+
+For every chunking config an index is built from data/processed (run
+scripts/pdf_to_json.py first) with scripts/json_to_index.py, then every
+retrieval config replays the labeled queries in bench/rag_queries.json
+(query -> relevant source PDFs) through RAGSystem.retrieve. Reports:
+
+    recall@k  share of a query's relevant documents among the top-k chunks
+    hit@k     share of queries with at least one relevant document in the top-k
+    MRR       mean reciprocal rank of the first chunk from a relevant document
+    build s   chunking + embedding + FAISS build time
+    size MB   index size on disk
+    p50/p95   per-query retrieval latency (query embedding + search)
+
+    python bench/rag_bench.py
+    python bench/rag_bench.py --chunking baseline small --retrieval mmr similarity-k10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+
+DEFAULT_LABELS = Path(__file__).parent / "rag_queries.json"
+
+# Keyword arguments for scripts/json_to_index.load_and_split_texts
+CHUNKING_CONFIGS = {
+    "baseline": {"dense_chunk_size": 800, "dense_chunk_overlap": 400,
+                 "regular_chunk_size": 1000, "regular_chunk_overlap": 200},
+    "small": {"dense_chunk_size": 400, "dense_chunk_overlap": 100,
+              "regular_chunk_size": 500, "regular_chunk_overlap": 100},
+    "large": {"dense_chunk_size": 1500, "dense_chunk_overlap": 300,
+              "regular_chunk_size": 2000, "regular_chunk_overlap": 300},
+    "low-overlap": {"dense_chunk_size": 800, "dense_chunk_overlap": 100,
+                    "regular_chunk_size": 1000, "regular_chunk_overlap": 100},
+}
+
+# Keyword arguments for RAGSystem.retrieve
+RETRIEVAL_CONFIGS = {
+    "mmr": {"search_type": "mmr", "k": 5, "fetch_k": 15, "lambda_mult": 0.7},
+    "mmr-diverse": {"search_type": "mmr", "k": 5, "fetch_k": 25, "lambda_mult": 0.4},
+    "similarity": {"search_type": "similarity", "k": 5},
+    "similarity-k10": {"search_type": "similarity", "k": 10},
+}
+
+
+def load_labels(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_embeddings(fake: bool):
+    if fake:
+        # Hash-based vectors: exercises the pipeline offline, quality numbers are meaningless
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=384)
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=Config.rag_config.embedding_model,
+        model_kwargs={"device": Config.rag_config.embedding_device}
+    )
+
+
+def build_index(text_folder, index_path, embeddings, chunking: dict, dedup: bool = None):
+    """Build and save an index; returns (RAGSystem, chunk count, build seconds, size MB)"""
+    from scripts.json_to_index import create_faiss_index
+    from tools.pdf_tools import RAGSystem
+
+    start = time.perf_counter()
+    store = create_faiss_index(text_folder, index_path, embeddings=embeddings, dedup=dedup, **chunking)
+    build_time = time.perf_counter() - start
+    size = sum(f.stat().st_size for f in Path(index_path).iterdir()) / (1024 * 1024)
+    return RAGSystem(index_path=index_path, embeddings=embeddings), store.index.ntotal, build_time, size
+
+
+def evaluate(rag, labels, retrieval: dict) -> dict:
+    """Recall@k, hit@k, MRR and latency for one retrieval config"""
+    recalls, hits, reciprocal_ranks, latencies = [], [], [], []
+    for item in labels:
+        relevant = set(item["relevant"])
+        start = time.perf_counter()
+        docs = rag.retrieve(item["query"], **retrieval)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        sources = [doc.metadata.get("source_file") for doc in docs]
+        # A chunk kept by dedup also stands for the documents whose copies were dropped
+        covered = sources + [d["source_file"] for doc in docs for d in doc.metadata.get("duplicates", [])]
+        found = relevant & set(covered)
+        recalls.append(len(found) / len(relevant))
+        hits.append(1.0 if found else 0.0)
+        rank = next((i for i, source in enumerate(sources, 1) if source in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    latencies.sort()
+    return {
+        "recall": statistics.mean(recalls),
+        "hit": statistics.mean(hits),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", default=str(DEFAULT_LABELS))
+    parser.add_argument("--text-folder", default=Config.path_config.processed_dir)
+    parser.add_argument("--chunking", nargs="+", choices=list(CHUNKING_CONFIGS), default=list(CHUNKING_CONFIGS))
+    parser.add_argument("--retrieval", nargs="+", choices=list(RETRIEVAL_CONFIGS), default=list(RETRIEVAL_CONFIGS))
+    parser.add_argument("--no-dedup", action="store_true", help="index every chunk, without near-duplicate removal")
+    parser.add_argument("--fake-embeddings", action="store_true", help="offline smoke test, quality is meaningless")
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.text_folder):
+        sys.exit(f"{args.text_folder} not found, run scripts/pdf_to_json.py first")
+    labels = load_labels(args.labels)
+    embeddings = load_embeddings(args.fake_embeddings)
+    if args.fake_embeddings:
+        print("Using fake embeddings: recall/MRR are not meaningful\n")
+
+    results = []
+    print(f"{'chunking':<12} {'retrieval':<15} {'chunks':>6} {'build s':>8} {'size MB':>8} "
+          f"{'recall@k':>9} {'hit@k':>6} {'MRR':>6} {'p50 ms':>7} {'p95 ms':>7}")
+    for chunk_name in args.chunking:
+        with tempfile.TemporaryDirectory() as index_path:
+            rag, chunks, build_time, size = build_index(
+                args.text_folder, index_path, embeddings, CHUNKING_CONFIGS[chunk_name], dedup=not args.no_dedup
+            )
+            for retrieval_name in args.retrieval:
+                scores = evaluate(rag, labels, RETRIEVAL_CONFIGS[retrieval_name])
+                results.append({"chunking": chunk_name, "retrieval": retrieval_name, "chunks": chunks,
+                                "build_s": build_time, "size_mb": size, **scores})
+                print(f"{chunk_name:<12} {retrieval_name:<15} {chunks:>6} {build_time:>8.2f} {size:>8.2f} "
+                      f"{scores['recall']:>9.3f} {scores['hit']:>6.2f} {scores['mrr']:>6.3f} "
+                      f"{scores['p50_ms']:>7.1f} {scores['p95_ms']:>7.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+ASGI app served by expert_chat/serve.py in bench/worker_scaling.py.
+
+POST /query {"session": ..., "query": ...} runs ExpertSystem.process_query
+with fake LLMs. Each session keeps its own system and AgentMemoryManager in
+the worker that first saw it, like a Chainlit user_session; the response
+reports the worker pid and the session's turn count so the load test can
+check affinity. Settings come from BENCH_* environment variables.
+"""
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from fastapi import FastAPI
+from utils.config import Config
+from utils.memory import AgentMemoryManager
+from utils import session
+from agents.base_agent import BaseAgent
+from bench.e2e_bench import AnswerTimer, StubPDFTool, install_fake_llms
+from bench.fake_llm import FakeStreamingLLM
+
+
+class BlockingFakeLLM(FakeStreamingLLM):
+    """Waits for the first token with time.sleep, stalling the event loop like a sync provider client"""
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.ttft)
+        ttft, self.ttft = self.ttft, 0
+        try:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+        finally:
+            self.ttft = ttft
+
+
+def _configure():
+    if os.getenv("BENCH_VERBOSE") != "1":
+        sys.stdout = open(os.devnull, "w")
+    Config.model_config.provider = "ollama"
+    Config.api_config.serper_api_key = "bench"
+    Config.api_config.alpha_vantage_key = "bench"
+    Config.api_config.serper_base_url = os.environ["BENCH_SERPER_URL"]
+    Config.api_config.alpha_vantage_base_url = os.environ["BENCH_ALPHA_VANTAGE_URL"]
+    install_fake_llms(SimpleNamespace(
+        ttft=float(os.getenv("BENCH_TTFT", "0.2")),
+        router_ttft=None,
+        tps=float(os.getenv("BENCH_TPS", "200")),
+        tokens=int(os.getenv("BENCH_TOKENS", "60"))
+    ))
+    if os.getenv("BENCH_STUB_PDF") == "1":
+        from agents import pdf_agent
+        pdf_agent.PDFTool = StubPDFTool
+    if os.getenv("BENCH_BLOCKING") == "1":
+        fake_llm = BaseAgent._initialize_llm
+
+        def blocking_llm(agent, role=None, provider=None):
+            llm = fake_llm(agent, role, provider)
+            return BlockingFakeLLM(ttft=llm.ttft, tokens_per_second=llm.tokens_per_second, max_tokens=llm.max_tokens)
+
+        BaseAgent._initialize_llm = blocking_llm
+
+
+_configure()
+app = FastAPI()
+_sessions = {}  # session id -> (ExpertSystem, AgentMemoryManager, turns)
+
+
+@app.post("/query")
+async def query(payload: dict):
+    from utils.expert_system import ExpertSystem
+
+    session_id = payload["session"]
+    if session_id not in _sessions:
+        _sessions[session_id] = [ExpertSystem(dispatcher=AnswerTimer()), AgentMemoryManager(), 0]
+    entry = _sessions[session_id]
+    system, memory_manager = entry[0], entry[1]
+
+    start = time.perf_counter()
+    with session.local_session(memory_manager=memory_manager):
+        await system.process_query(payload["query"])
+    entry[2] += 1
+    return {"pid": os.getpid(), "turns": entry[2], "seconds": time.perf_counter() - start}
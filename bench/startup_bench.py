@@ -0,0 +1,151 @@
+"""
+Startup profile: import cost per module (python -X importtime) and time from
+process start to "System Ready!" for the CLI and the Chainlit app module,
+plus "RAG Ready!" once the deferred embedding model and FAISS index are loaded.
+The CLI target runs main.py itself (picking provider 1 at the menu), so its
+number covers everything a user waits for before the first prompt.
+
+Every measurement runs in a fresh interpreter so nothing is cached in
+sys.modules. API keys are dummies; nothing talks to a provider.
+
+    python bench/startup_bench.py --runs 5 --top 15
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+
+# Each target prints "System Ready!" once the system can accept a query,
+# then "RAG Ready!" once the PDF agent's retrieval stack is loaded.
+# Answers the CLI's provider menu; stdin stays open so the CLI waits at its prompt
+MENU_INPUT = "1\n"
+WARM_UP = (
+    "import asyncio\n"
+    "asyncio.run(system.warm_up())\n"
+    "print('RAG Ready!', flush=True)\n"
+)
+TARGETS = {
+    # main.py prints System Ready! itself; RAG Ready! is printed when its background warm-up finishes
+    "cli": (
+        "import sys\n"
+        "sys.argv = ['main.py']\n"
+        "from utils.expert_system import ExpertSystem\n"
+        "_warm_up = ExpertSystem.warm_up\n"
+        "async def warm_up(self):\n"
+        "    await _warm_up(self)\n"
+        "    print('RAG Ready!', flush=True)\n"
+        "ExpertSystem.warm_up = warm_up\n"
+        "import main\n"
+        "main.main()\n"
+    ),
+    "chainlit": (
+        "import expert_chat.main as app\n"
+        "system, provider = app.init_system()\n"
+        "print('System Ready!', flush=True)\n" + WARM_UP
+    ),
+}
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = project_root + os.pathsep + env.get("PYTHONPATH", "")
+    for key in ("SERPER_API_KEY", "ALPHA_VANTAGE_API_KEY", "ANTHROPIC_API_KEY", "GROQ_API_KEY"):
+        env.setdefault(key, "bench")
+    return env
+
+
+def _run_from_project_root(func):
+    """Targets resolve ./data paths from the repo root; drop the .chainlit/ dir chainlit creates there"""
+    chainlit_dir = Path(project_root) / ".chainlit"
+    existed = chainlit_dir.exists()
+    try:
+        return func(project_root)
+    finally:
+        if not existed:
+            shutil.rmtree(chainlit_dir, ignore_errors=True)
+
+
+def time_to_ready(code: str):
+    """Seconds from spawning the interpreter until it prints System Ready! and RAG Ready!"""
+    def run(cwd):
+        with tempfile.TemporaryFile("w+") as stderr:
+            start = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable, "-c", code], cwd=cwd, env=_env(),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr, text=True
+            )
+            proc.stdin.write(MENU_INPUT)
+            proc.stdin.flush()
+            ready = rag_ready = None
+            # Either can come first: a target that loads RAG before its prompt prints RAG Ready! first
+            for line in proc.stdout:
+                if "System Ready!" in line:
+                    ready = time.perf_counter() - start
+                elif "RAG Ready!" in line:
+                    rag_ready = time.perf_counter() - start
+                if ready is not None and rag_ready is not None:
+                    proc.kill()
+                    proc.wait()
+                    return ready, rag_ready
+            proc.wait()
+            stderr.seek(0)
+            raise RuntimeError(f"target exited with {proc.returncode} before it was ready\n{stderr.read()[-2000:]}")
+    return _run_from_project_root(run)
+
+
+def import_profile(code: str):
+    """(module, self us, cumulative us) rows from -X importtime"""
+    result = _run_from_project_root(lambda cwd: subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=_env(),
+        input=MENU_INPUT, capture_output=True, text=True
+    ))
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report_imports(name: str, code: str, top: int):
+    rows = import_profile(code)
+    total = sum(row[1] for row in rows)
+    print(f"\n[{name}] {len(rows)} modules imported, {total / 1e6:.2f}s total import time")
+    # Top-level packages by self time aggregated across their submodules
+    packages = {}
+    for module, self_us, _ in rows:
+        package = module.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    print(f"{'package':<32} {'self s':>8}")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{package:<32} {self_us / 1e6:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12, help="packages to show in the import profile")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    args = parser.parse_args()
+
+    print(f"{'target':<10} {'ready p50 s':>12} {'min s':>7} {'max s':>7} {'rag ready p50 s':>16}")
+    for name in args.targets:
+        timings = [time_to_ready(TARGETS[name]) for _ in range(args.runs)]
+        ready = [t[0] for t in timings]
+        print(f"{name:<10} {statistics.median(ready):>12.2f} {min(ready):>7.2f} {max(ready):>7.2f} "
+              f"{statistics.median(t[1] for t in timings):>16.2f}")
+
+    for name in args.targets:
+        report_imports(name, TARGETS[name], args.top)
+
+
+if __name__ == "__main__":
+    main()
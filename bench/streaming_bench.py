@@ -0,0 +1,132 @@
+"""
+CPU cost of streaming tokens through the Chainlit handler, before and after
+buffering.
+
+"legacy" replays the original per-token handler (string concatenation and a
+UI update per token); "buffered" is ChainlitDispatcher with TokenBuffer
+flushes. Chainlit is replaced by an in-memory fake that serializes every UI
+update the way the websocket emitter would.
+
+    python bench/streaming_bench.py --tokens 1000 10000 50000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import types
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+
+class FakeUIElement:
+    """Stands in for cl.Step / cl.Message and counts UI emissions"""
+    emits = 0
+
+    def __init__(self, **kwargs):
+        self.id = id(self)
+        self.output = ""
+        self.content = ""
+
+    def _emit(self, payload: dict):
+        json.dumps(payload)
+        FakeUIElement.emits += 1
+
+    async def send(self):
+        self._emit({"id": self.id})
+        return self
+
+    async def update(self):
+        self._emit({"id": self.id, "content": self.content})
+
+    async def __aenter__(self):
+        self._emit({"id": self.id})
+        return self
+
+    async def __aexit__(self, *args):
+        self._emit({"id": self.id, "output": self.output})
+
+    async def stream_token(self, token: str):
+        self.output += token
+        self._emit({"id": self.id, "token": token})
+
+
+fake_cl = types.ModuleType("chainlit")
+fake_cl.Step = FakeUIElement
+fake_cl.Message = FakeUIElement
+sys.modules.setdefault("chainlit", fake_cl)
+
+from expert_chat import handlers
+from utils.streaming import StreamEvent
+handlers.cl = fake_cl
+
+
+class LegacyHandler:
+    """The original token path: text += token and a UI call per token"""
+    def __init__(self):
+        self.text = ""
+        self.current_step = None
+        self.current_message = None
+
+    async def on_step_token(self, token: str):
+        self.text += token
+        if self.current_step:
+            self.current_step.output = self.text
+
+    async def on_message_token(self, token: str):
+        if self.current_message is None:
+            self.current_message = await FakeUIElement().send()
+        await self.current_message.stream_token(token)
+
+
+async def run_legacy(tokens):
+    handler = LegacyHandler()
+    handler.current_step = await FakeUIElement().__aenter__()
+    for token in tokens:
+        await handler.on_step_token(token)
+    await handler.current_step.__aexit__()
+    for token in tokens:
+        await handler.on_message_token(token)
+    await handler.current_message.update()
+
+
+async def run_buffered(tokens):
+    dispatcher = handlers.ChainlitDispatcher()
+    await dispatcher.dispatch(StreamEvent("start", "web", "bench"))
+    for token in tokens:
+        await dispatcher.dispatch(StreamEvent("token", "web", "bench", role="web", token=token))
+    await dispatcher.dispatch(StreamEvent("end", "web", "bench"))
+    await dispatcher.dispatch(StreamEvent("start", "meta", "bench"))
+    for token in tokens:
+        await dispatcher.dispatch(StreamEvent("token", "meta", "bench", role="synthesizer", token=token))
+    await dispatcher.dispatch(StreamEvent("end", "meta", "bench"))
+
+
+def measure(runner, count: int):
+    tokens = [f"tok{i % 97} " for i in range(count)]
+    FakeUIElement.emits = 0
+    start = time.process_time()
+    asyncio.run(runner(tokens))
+    cpu = time.process_time() - start
+    return cpu, FakeUIElement.emits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8} {'handler':<10} {'cpu ms':>9} {'ms/1k tok':>10} {'ui emits':>9}")
+    for count in args.tokens:
+        for name, runner in (("legacy", run_legacy), ("buffered", run_buffered)):
+            cpu, emits = measure(runner, count)
+            # Each run streams the tokens twice: into an agent step and into the answer message
+            per_1k = cpu * 1000 / (2 * count / 1000)
+            print(f"{count:>8} {name:<10} {cpu * 1000:>9.1f} {per_1k:>10.3f} {emits:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Local stand-in for the Serper and Alpha Vantage HTTP APIs.
+
+Serves deterministic responses with a configurable latency so SerperTool and
+VantageFinanceTool run their real request/parse code offline:
+
+    POST /search                      Serper organic results
+    GET  /query?function=GLOBAL_QUOTE Alpha Vantage quote
+    GET  /query?function=OVERVIEW     Alpha Vantage company overview
+    GET  /query?function=TIME_SERIES_DAILY  daily bars from a fixture series
+
+FixturePageServer serves HTML article pages for the web page enricher.
+"""
+import datetime
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+
+
+def serper_response(query: str, num: int) -> dict:
+    return {
+        "searchParameters": {"q": query, "num": num},
+        "organic": [{
+            "title": f"{query.title()} - result {i + 1}",
+            "snippet": f"Coverage of {query} from source {i + 1}: rates, earnings and market sentiment this week. " * 2,
+            "link": f"https://news.example.com/{_seed(query) % 9973}/{i}",
+            "date": "2024-11-15"
+        } for i in range(num)]
+    }
+
+
+def quote_response(symbol: str) -> dict:
+    seed = _seed(symbol)
+    price = 20 + seed % 500 + (seed % 100) / 100
+    return {"Global Quote": {
+        "01. symbol": symbol,
+        "05. price": f"{price:.4f}",
+        "06. volume": str(1_000_000 + seed % 9_000_000),
+        "07. latest trading day": "2024-11-15",
+        "10. change percent": f"{(seed % 700) / 100 - 3.5:.4f}%"
+    }}
+
+
+def overview_response(symbol: str) -> dict:
+    seed = _seed(symbol)
+    return {
+        "Symbol": symbol,
+        "MarketCapitalization": str((seed % 3000 + 10) * 1_000_000_000),
+        "PERatio": f"{5 + seed % 60:.2f}",
+        "EPS": f"{(seed % 2000) / 100:.2f}"
+    }
+
+
+FIXTURE_START = datetime.date(2019, 1, 1)
+
+
+def fixture_series(symbol: str, end: str = "2024-11-15") -> list:
+    """Deterministic daily bars (date, open, high, low, close, volume) from 2019 up to `end`, weekdays only.
+
+    A seeded random walk, so a later `end` only adds days and never changes earlier ones.
+    """
+    import numpy as np
+    end_date = datetime.date.fromisoformat(end)
+    days = [FIXTURE_START + datetime.timedelta(days=i) for i in range((end_date - FIXTURE_START).days + 1)]
+    days = [day for day in days if day.weekday() < 5]
+    rng = np.random.default_rng(_seed(symbol))
+    # Draw for a fixed horizon so the walk does not depend on `end`
+    horizon = 3000
+    returns = rng.normal(0.0004, 0.012 + (_seed(symbol) % 10) / 1000, horizon)
+    closes = (20 + _seed(symbol) % 500) * np.exp(np.cumsum(returns))
+    spread = np.abs(rng.normal(0, 0.008, horizon))
+    opens = closes * np.exp(rng.normal(0, 0.004, horizon))
+    volumes = rng.integers(1_000_000, 10_000_000, horizon)
+    return [(day.isoformat(), opens[i], max(opens[i], closes[i]) * (1 + spread[i]),
+             min(opens[i], closes[i]) * (1 - spread[i]), closes[i], int(volumes[i]))
+            for i, day in enumerate(days[:horizon])]
+
+
+def daily_response(symbol: str, outputsize: str = "compact", end: str = "2024-11-15") -> dict:
+    bars = fixture_series(symbol, end)
+    bars = bars[-100:] if outputsize == "compact" else bars
+    return {
+        "Meta Data": {"2. Symbol": symbol, "3. Last Refreshed": bars[-1][0], "4. Output Size": outputsize.title()},
+        "Time Series (Daily)": {
+            date: {"1. open": f"{o:.4f}", "2. high": f"{h:.4f}", "3. low": f"{l:.4f}",
+                   "4. close": f"{c:.4f}", "5. volume": str(v)}
+            for date, o, h, l, c, v in reversed(bars)
+        }
+    }
+
+
+class StubAPIServer:
+    """Threaded HTTP server on localhost; use as a context manager"""
+
+    def __init__(self, latency: float = 0.3, port: int = 0):
+        self.latency = latency
+        self.requests = 0
+        # Requests received, counted on arrival rather than on response
+        self.started = 0
+        # Last trading day of the daily series; move it forward to simulate new days
+        self.history_end = "2024-11-15"
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload: dict):
+                server.started += 1
+                time.sleep(server.latency)
+                server.requests += 1
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                params = json.loads(self.rfile.read(length) or b"{}")
+                self._send(serper_response(params.get("q", ""), int(params.get("num", 10))))
+
+            def do_GET(self):
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                symbol = params.get("symbol", "IBM").upper()
+                if params.get("function") == "OVERVIEW":
+                    self._send(overview_response(symbol))
+                elif params.get("function") == "TIME_SERIES_DAILY":
+                    self._send(daily_response(symbol, params.get("outputsize", "compact"), server.history_end))
+                else:
+                    self._send(quote_response(symbol))
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+ARTICLE_PARAGRAPHS = [
+    "The Federal Reserve held its benchmark rate in a range of 4.50% to 4.75% on Wednesday, "
+    "as officials signalled they want more evidence that inflation is cooling before cutting again.",
+    "Treasury yields rose after the decision, with the 10-year note climbing to 4.43% while the "
+    "two-year yield, which tracks rate expectations, touched 4.30% in afternoon trading.",
+    "Equity markets gave back early gains: the S&P 500 closed 0.4% lower and the Nasdaq fell 0.6%, "
+    "led by declines in rate-sensitive technology and real estate shares.",
+    "Analysts expect the central bank to cut rates twice next year, though futures markets now price "
+    "a smaller chance of a cut at the March meeting than they did a week ago.",
+]
+
+
+def article_page(page_id: str) -> str:
+    """HTML with boilerplate (nav, scripts, footer) around the article text"""
+    paragraphs = "".join(f"<p>{text}</p>" for text in ARTICLE_PARAGRAPHS)
+    return (
+        "<html><head><title>Markets</title><script>var tracking = 'NAVIGATION SCRIPT';</script>"
+        "<style>body { font-family: serif; }</style></head><body>"
+        "<nav><a href='/'>Home</a> <a href='/markets'>Markets NAVIGATION LINK</a></nav>"
+        "<header><div>Subscribe now for full access to all market coverage and newsletters</div></header>"
+        f"<article><h1>Fed holds rates steady ({page_id})</h1>{paragraphs}</article>"
+        "<aside><p>Related: ten stocks to watch this week according to our FOOTER analysts</p></aside>"
+        "<footer><p>Copyright 2024 Example News. All rights reserved. FOOTER terms and privacy.</p></footer>"
+        "</body></html>"
+    )
+
+
+class FixturePageServer:
+    """HTML pages on localhost: GET /page/<id>?delay=<s>, /binary for a non-HTML response"""
+
+    def __init__(self, port: int = 0):
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                time.sleep(float(params.get("delay", 0)))
+                server.requests += 1
+                if url.path.startswith("/page/"):
+                    body, content_type = article_page(url.path.rsplit("/", 1)[-1]).encode(), "text/html; charset=utf-8"
+                elif url.path == "/binary":
+                    body, content_type = b"%PDF-1.4 binary", "application/pdf"
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The enricher gave up on a slow page and closed the connection
+                    pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,118 @@
+"""
+Symbol extraction: tools/symbol_index.py vs FinanceAgent's previous regex heuristic.
+
+Runs a labeled set of finance-style queries (plus bench/queries.txt) through
+both extractors and reports precision and recall against the labels, queries
+that found nothing (the finance agent errors out on those), Alpha Vantage calls
+each extractor would make (GLOBAL_QUOTE + OVERVIEW per symbol) and time per
+query, including the one-off index load.
+
+    python bench/symbol_bench.py
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from bench.e2e_bench import load_corpus, DEFAULT_CORPUS
+
+# (query, symbols a reader would expect the finance agent to look up)
+LABELED = [
+    ("What does the CEO of Apple think about USA GDP growth?", {"AAPL"}),
+    ("Is Nvidia overvalued after earnings?", {"NVDA"}),
+    ("How did the FED decision move JPMorgan and Goldman Sachs?", {"JPM", "GS"}),
+    ("Compare (NVDA) and (AMD) performance", {"NVDA", "AMD"}),
+    ("How is (AAPL) trading today and what is its P/E ratio?", {"AAPL"}),
+    ("Should I buy TSLA before the Q4 delivery numbers?", {"TSLA"}),
+    ("What is the EPS and PE of MSFT?", {"MSFT"}),
+    ("Bank of America vs Wells Fargo dividend yield", {"BAC", "WFC"}),
+    ("Is the IPO market recovering? Look at Reddit and Arm", {"RDDT"}),
+    ("How exposed is Exxon to oil prices and OPEC cuts?", {"XOM"}),
+    ("What does the latest CPI print mean for the S&P 500?", set()),
+    ("Explain the difference between an ETF and a mutual fund", set()),
+    ("How are Microsoft, Alphabet and Amazon spending on AI capex?", {"MSFT", "GOOGL", "AMZN"}),
+    ("Is $NOW a buy after the ServiceNow guidance cut?", {"NOW"}),
+    ("What happened to Boeing and Lockheed Martin stock this week?", {"BA", "LMT"}),
+    ("apple pie recipes are not investment advice", set()),
+    ("Why did the USD strengthen against the EUR and JPY?", set()),
+    ("Compare Coca-Cola and PepsiCo margins", {"KO", "PEP"}),
+    ("How does the NYSE differ from NASDAQ?", set()),
+    ("What is the outlook for Berkshire Hathaway (BRK-B)?", {"BRK-B"}),
+    ("Tell me about Eli Lilly and Novo Nordisk GLP-1 sales", {"LLY", "NVO"}),
+    ("Did the SEC approve new ETF rules for the FOMC?", set()),
+    ("Is AT&T or Verizon the better dividend stock?", {"T", "VZ"}),
+    ("What is Meta Platforms' ad revenue growth?", {"META"}),
+    ("How did Costco and Walmart report same store sales?", {"COST", "WMT"}),
+]
+
+
+def legacy_extract(query):
+    """FinanceAgent._extract_symbols before the symbol index (returns [] where it raised)"""
+    parens = set(re.findall(r'\(([A-Z]{1,4})\)', query))
+    if parens:
+        return list(parens)
+    symbols = set()
+    for match in set(re.findall(r'\b[A-Z]{1,4}\b', query)):
+        if len(match) == 1 or match.endswith('S') or all(c == match[0] for c in match):
+            continue
+        symbols.add(match)
+    return list(symbols)
+
+
+def score(extract, labeled):
+    true_pos = false_pos = false_neg = empty = 0
+    for query, expected in labeled:
+        found = set(extract(query))
+        true_pos += len(found & expected)
+        false_pos += len(found - expected)
+        false_neg += len(expected - found)
+        empty += bool(expected) and not found
+    return {
+        "precision": true_pos / (true_pos + false_pos) if true_pos + false_pos else 1.0,
+        "recall": true_pos / (true_pos + false_neg) if true_pos + false_neg else 1.0,
+        "wasted": false_pos,
+        "empty": empty,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from tools.symbol_index import get_symbol_index, CALLS_PER_SYMBOL
+    index = get_symbol_index()
+    load = time.perf_counter() - start
+
+    queries = [query for query, _ in LABELED] + load_corpus(args.corpus)
+    timings = {}
+    for name, extract in (("regex", legacy_extract), ("index", index.extract)):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for query in queries:
+                extract(query)
+        timings[name] = (time.perf_counter() - start) / (args.repeat * len(queries))
+
+    index.stats.__init__()
+    results = {"regex": score(legacy_extract, LABELED), "index": score(index.extract, LABELED)}
+    print(f"{len(LABELED)} labeled queries, {len(index.symbols)} listed symbols, "
+          f"{len(index.matcher.goto)} automaton states, index load {load * 1000:.1f} ms")
+    print(f"{'':<6} {'precision':>9} {'recall':>7} {'wasted lookups':>15} {'no symbol':>10} {'us/query':>9}")
+    for name, r in results.items():
+        print(f"{name:<6} {r['precision']:>9.0%} {r['recall']:>7.0%} {r['wasted']:>15} {r['empty']:>10} "
+              f"{timings[name] * 1e6:>9.1f}")
+    wasted_calls = (results["regex"]["wasted"] - results["index"]["wasted"]) * CALLS_PER_SYMBOL
+    print(f"Alpha Vantage calls saved on the labeled set: {wasted_calls} "
+          f"(index counters: {index.stats.rejected} rejected words, {index.stats.calls_avoided} calls avoided, "
+          f"{index.stats.by_name} symbols found by company name)")
+
+
+if __name__ == "__main__":
+    main()
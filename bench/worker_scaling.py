@@ -0,0 +1,176 @@
+"""
+Throughput of expert_chat/serve.py as the worker count grows.
+
+For every worker count the server is started with bench/scaling_app.py
+(ExpertSystem with fake LLMs, stub Serper/Alpha Vantage, the real FAISS index
+unless --stub-pdf). Each client is one chat session bound to its own
+127.0.0.x address, so the proxy's IP affinity spreads sessions over workers.
+Reports throughput, latency, whether every session stayed on one worker with
+its memory intact, and worker memory: RSS counts shared pages once per
+worker, PSS splits them between the processes sharing them.
+
+    python bench/worker_scaling.py --workers 1 2 4 --clients 8 --queries 64
+    python bench/worker_scaling.py --blocking   # fake LLMs stall the event loop like sync clients
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from bench.e2e_bench import load_corpus, percentile, DEFAULT_CORPUS
+from bench.stub_server import StubAPIServer
+
+
+def memory_kb(pid: int) -> dict:
+    """Rss and Pss of a process from /proc (Linux only)"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def start_server(args, workers: int, api_url: str):
+    env = dict(os.environ)
+    env.update({
+        "BENCH_SERPER_URL": f"{api_url}/search",
+        "BENCH_ALPHA_VANTAGE_URL": f"{api_url}/query",
+        "BENCH_TTFT": str(args.ttft),
+        "BENCH_TPS": str(args.tps),
+        "BENCH_TOKENS": str(args.tokens),
+        "BENCH_BLOCKING": "1" if args.blocking else "0",
+        "CACHE_DB": str(Path(args.cache_dir) / f"bench-{workers}.sqlite3"),
+        "PYTHONUNBUFFERED": "1",
+        "PYTHONPATH": project_root + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    command = [sys.executable, str(Path(project_root) / "expert_chat" / "serve.py"),
+               "--workers", str(workers), "--host", "0.0.0.0", "--port", str(args.port),
+               "--worker-port", str(args.port + 100), "--app", "bench.scaling_app:app"]
+    if args.stub_pdf:
+        command.append("--no-preload")
+        env["BENCH_STUB_PDF"] = "1"
+    proc = subprocess.Popen(command, cwd=project_root, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True)
+    for line in proc.stdout:
+        if line.startswith("Serving on"):
+            # Keep draining so worker output can never fill the pipe
+            threading.Thread(target=proc.stdout.read, daemon=True).start()
+            return proc
+    raise RuntimeError(f"server exited with {proc.wait()} before it was ready")
+
+
+def stop_server(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def client(port: int, index: int, queries: list) -> list:
+    """One chat session from its own loopback address; queries run sequentially"""
+    results = []
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300,
+                                      source_address=(f"127.0.0.{index + 2}", 0))
+    for query in queries:
+        body = json.dumps({"session": f"session-{index}", "query": query})
+        start = time.perf_counter()
+        conn.request("POST", "/query", body, {"Content-Type": "application/json"})
+        reply = json.loads(conn.getresponse().read())
+        results.append((time.perf_counter() - start, reply["pid"], reply["turns"]))
+    conn.close()
+    return results
+
+
+def run(args, workers: int, corpus: list, api_url: str) -> dict:
+    proc = start_server(args, workers, api_url)
+    try:
+        # One warm-up query per client so first-request costs (agent construction) are excluded
+        with ThreadPoolExecutor(args.clients) as pool:
+            list(pool.map(lambda i: client(args.port, i, corpus[:1]), range(args.clients)))
+
+        per_client = [[] for _ in range(args.clients)]
+        for i in range(args.queries):
+            per_client[i % args.clients].append(corpus[i % len(corpus)])
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.clients) as pool:
+            sessions = list(pool.map(lambda i: client(args.port, i, per_client[i]), range(args.clients)))
+        elapsed = time.perf_counter() - start
+
+        pids = {pid for results in sessions for _, pid, _ in results}
+        memory = [memory_kb(pid) for pid in pids]
+        parent = memory_kb(proc.pid)
+    finally:
+        stop_server(proc)
+
+    latencies = [latency for results in sessions for latency, _, _ in results]
+    # Affinity holds if a session only ever saw one worker and its turn count never reset
+    affinity = all(
+        len({pid for _, pid, _ in results}) == 1 and [t for _, _, t in results] == list(range(2, len(results) + 2))
+        for results in sessions if results
+    )
+    return {
+        "workers": workers,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "active_workers": len(pids),
+        "affinity": affinity,
+        "rss_mb": (sum(m.get("Rss", 0) for m in memory) + parent.get("Rss", 0)) / 1024,
+        "pss_mb": (sum(m.get("Pss", 0) for m in memory) + parent.get("Pss", 0)) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="concurrent chat sessions")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--tps", type=float, default=200.0)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--api-latency", type=float, default=0.3)
+    parser.add_argument("--blocking", action="store_true", help="fake LLM first-token wait blocks the event loop")
+    parser.add_argument("--stub-pdf", action="store_true", help="canned PDF context instead of the FAISS index")
+    parser.add_argument("--cache-dir", default="/tmp", help="where each run's shared SQLite cache goes")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"{args.queries} queries, {args.clients} sessions, ttft={args.ttft}s "
+          f"({'blocking' if args.blocking else 'async'}), api latency={args.api_latency}s, "
+          f"{os.cpu_count()} cpu(s)")
+    print(f"{'workers':>7} {'q/s':>7} {'speedup':>8} {'p50 s':>7} {'p95 s':>7} {'active':>7} "
+          f"{'affinity':>9} {'rss MB':>8} {'pss MB':>8}")
+    baseline = None
+    with StubAPIServer(latency=args.api_latency) as server:
+        for workers in args.workers:
+            # Every run starts with a cold tool cache
+            for suffix in ("", "-wal", "-shm"):
+                Path(args.cache_dir, f"bench-{workers}.sqlite3{suffix}").unlink(missing_ok=True)
+            result = run(args, workers, corpus, server.url)
+            baseline = baseline or result["throughput"]
+            print(f"{workers:>7} {result['throughput']:>7.2f} {result['throughput'] / baseline:>7.2f}x "
+                  f"{result['p50']:>7.2f} {result['p95']:>7.2f} {result['active_workers']:>7} "
+                  f"{'ok' if result['affinity'] else 'BROKEN':>9} {result['rss_mb']:>8.0f} {result['pss_mb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
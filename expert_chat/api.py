@@ -0,0 +1,257 @@
+"""
+Headless HTTP API for programmatic clients, alongside the Chainlit UI.
+
+POST /query {"query": ..., "session": optional id, "slo": optional seconds}
+answers over Server-Sent Events:
+
+    event: agent   {"agent": "web", "status": "started" | "finished"}
+    event: token   {"text": "..."}        answer text, coalesced like the UI stream
+    event: done    {"route": [...], "missing": {...}, "latency_s": ..., "first_token_s": ...}
+    event: error   {"message": "..."}
+
+At most SERVICE_MAX_CONCURRENT queries run at once and SERVICE_MAX_WAITING
+wait for a slot; past that, or after SERVICE_WAIT_TIMEOUT_SECONDS in line, a
+request gets 503 with Retry-After. Each client's stream is a bounded queue, so
+once its socket backs up a slow reader holds its own query back instead of
+the server buffering without limit, and a client that disconnects cancels its
+query. Requests with a session id share
+that session's persisted memory, like a Chainlit thread.
+
+    python expert_chat/api.py --port 8001
+    python expert_chat/serve.py --workers 4 --port 8001 --app expert_chat.api:app
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+# Add the parent directory to the path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from utils.callbacks import TokenBuffer
+from utils.cancellation import CancelToken
+from utils.config import Config
+from utils.deadline import QueryDeadline
+from utils.expert_system import ExpertSystem
+from utils.memory import AgentMemoryManager
+from utils.streaming import StreamDispatcher, StreamEvent
+from utils import session, tracing
+
+# Comment line sent while a query is quiet (agents still working) so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+
+
+class QueryRequest(BaseModel):
+    query: str
+    session: Optional[str] = None
+    slo: Optional[float] = None
+
+
+class ServiceBusy(Exception):
+    """No slot for another query within the waiting limits"""
+
+
+class SystemPool:
+    """Idle ExpertSystems; a query holds one for its whole run, so at most `size` run at once"""
+
+    def __init__(self, size: int, max_waiting: int, wait_timeout: float):
+        self.size = size
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.waiting = 0
+        self.idle: asyncio.Queue = asyncio.Queue()
+        # MetaAgent keeps per-query state; the models, index and tool caches behind the systems are process-wide
+        for _ in range(size):
+            self.idle.put_nowait(ExpertSystem())
+
+    async def acquire(self) -> ExpertSystem:
+        # Take a free system at once unless others are already in line for one
+        if not self.waiting and not self.idle.empty():
+            return self.idle.get_nowait()
+        if self.waiting >= self.max_waiting:
+            raise ServiceBusy(f"{self.size} queries running and {self.waiting} waiting")
+        self.waiting += 1
+        try:
+            return await asyncio.wait_for(self.idle.get(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            raise ServiceBusy(f"no free slot within {self.wait_timeout:g}s")
+        finally:
+            self.waiting -= 1
+
+    def release(self, system: ExpertSystem) -> None:
+        self.idle.put_nowait(system)
+
+    def status(self) -> dict:
+        return {"running": self.size - self.idle.qsize(), "waiting": self.waiting, "slots": self.size}
+
+
+class SSEDispatcher(StreamDispatcher):
+    """Turns one query's stream events into SSE events on a bounded queue the response reads from"""
+
+    def __init__(self, buffer: int):
+        self.events: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        self.started = time.perf_counter()
+        self.agents = []
+        self.answer_agent: Optional[str] = None
+        self.answer_buffer = TokenBuffer()
+        self.first_token: Optional[float] = None
+        self.closed = False
+
+    async def send(self, event: str, data: dict) -> None:
+        # Waits while the client is behind, which pauses the query streaming into it
+        if not self.closed:
+            await self.events.put((event, data))
+
+    def close(self) -> None:
+        """Client gone: drop what it never read and every later event, so no send waits on it"""
+        self.closed = True
+        while not self.events.empty():
+            self.events.get_nowait()
+
+    async def on_start(self, event: StreamEvent) -> None:
+        if event.agent == "meta" or event.metadata.get("direct"):
+            self.answer_agent = event.agent
+        if event.agent != "meta":
+            if event.agent not in self.agents:
+                self.agents.append(event.agent)
+            await self.send("agent", {"agent": event.agent, "status": "started"})
+
+    async def on_token(self, event: StreamEvent) -> None:
+        if event.role == "router" or event.agent != self.answer_agent:
+            return
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+        if self.answer_buffer.append(event.token):
+            await self.send("token", {"text": self.answer_buffer.drain()})
+
+    async def on_end(self, event: StreamEvent) -> None:
+        if event.agent == self.answer_agent:
+            await self.flush()
+        if event.agent != "meta":
+            await self.send("agent", {"agent": event.agent, "status": "finished"})
+
+    async def flush(self) -> None:
+        pending = self.answer_buffer.drain()
+        if pending:
+            await self.send("token", {"text": pending})
+
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = Config.service_config
+    Config.model_config.provider = settings.provider
+    app.state.pool = SystemPool(settings.max_concurrent, settings.max_waiting, settings.wait_timeout)
+    # Embedding model and FAISS index are shared by every system in the process; load them before taking traffic
+    pool = app.state.pool
+    system = await pool.acquire()
+    try:
+        await system.warm_up()
+    finally:
+        pool.release(system)
+    print(f"API ready: {settings.provider}, {settings.max_concurrent} concurrent queries, {settings.max_waiting} waiting")
+    yield
+    # Export the spans still buffered in the batch processor before the worker exits
+    tracing.shutdown_tracing()
+
+
+app = FastAPI(title="Expert Agent API", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return app.state.pool.status()
+
+
+@app.post("/query")
+async def query(request: QueryRequest):
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Error: query is empty")
+    pool: SystemPool = app.state.pool
+    try:
+        system = await pool.acquire()
+    except ServiceBusy as e:
+        raise HTTPException(status_code=503, detail=f"Error: service busy ({str(e)})", headers={"Retry-After": "5"})
+
+    dispatcher = SSEDispatcher(Config.service_config.stream_buffer)
+    token = CancelToken()
+
+    async def run():
+        memory_manager = AgentMemoryManager(session_id=request.session)
+        try:
+            system.dispatcher = dispatcher
+            with session.local_session(memory_manager=memory_manager):
+                response = await system.process_query(
+                    request.query, cancel_token=token, query_deadline=QueryDeadline(slo=request.slo)
+                )
+            if token.cancelled:
+                return
+            await dispatcher.flush()
+            if response:
+                await dispatcher.send("error", {"message": json.loads(response)["error"]["message"]})
+            else:
+                await dispatcher.send("done", {
+                    "route": dispatcher.agents,
+                    "missing": dict(system.meta_agent.workpad.missing),
+                    "latency_s": round(time.perf_counter() - dispatcher.started, 3),
+                    "first_token_s": round(dispatcher.first_token, 3) if dispatcher.first_token is not None else None,
+                })
+        except Exception as e:
+            print(f"Error in API query: {str(e)}")
+            await dispatcher.send("error", {"message": str(e)})
+        finally:
+            # Only now is the query done: process_query returns once its agents and LLM streams have unwound
+            memory_manager.unload()
+            pool.release(system)
+
+    task = asyncio.create_task(run())
+
+    async def stream():
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(dispatcher.events.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_sse(event, data)
+                if event in ("done", "error"):
+                    return
+        finally:
+            # Client gone (or stream over): stop the query's agents, tools and LLM streams. Cancelling through
+            # the token rather than the task lets run() wait for all of them before its system goes back to the pool
+            if not task.done():
+                dispatcher.close()
+                token.cancel("disconnected")
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expert Agent HTTP API with SSE streaming")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,127 @@
 import chainlit as cl
-from utils.callbacks import StreamingHandler
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from utils.callbacks import TokenBuffer
+from utils.streaming import StreamDispatcher, StreamEvent
 
-class ChainlitStreamHandler(StreamingHandler):
+AGENT_ICONS = {
+    "web": "🌐",
+    "finance": "📈",
+    "pdf": "📚"
+}
+
+@dataclass
+class RequestView:
+    """UI state for one query: a step per agent plus the answer message"""
+    steps: Dict[str, cl.Step] = field(default_factory=dict)
+    step_buffers: Dict[str, TokenBuffer] = field(default_factory=dict)
+    message: Optional[cl.Message] = None
+    message_buffer: TokenBuffer = field(default_factory=TokenBuffer)
+    answer_agent: Optional[str] = None
+
+class ChainlitDispatcher(StreamDispatcher):
+    """Per-session dispatcher: renders each agent channel into its own Chainlit step"""
+    def __init__(self):
+        self.reset_state()
+        
     def reset_state(self):
         """Reset all state variables between queries"""
-        self.current_message = None
-        self.is_synthesizing = False
-        self.text = ""
-        self.current_step = None
+        self.requests: Dict[str, RequestView] = {}
         self.workflow_step = None
         
-    async def on_llm_start(self, *args, **kwargs):
+    def _view(self, request_id: str) -> RequestView:
+        view = self.requests.get(request_id)
+        if view is None:
+            view = self.requests[request_id] = RequestView()
+        return view
+        
+    async def on_start(self, event: StreamEvent):
         try:
-            metadata = kwargs.get('metadata', {})
-            agent_name = metadata.get('agent_name')
+            view = self._view(event.request_id)
             
-            if agent_name:
-                if agent_name == "meta":
-                    # Close any existing steps before synthesis
-                    if self.current_step:
-                        await self.current_step.__aexit__(None, None, None)
-                        self.current_step = None
-                    if self.workflow_step:
-                        await self.workflow_step.__aexit__(None, None, None)
-                        self.workflow_step = None
-                        
-                    self.is_synthesizing = True
-                    await cl.Message(
-                        content="# 📊 Synthesizing Final Analysis...",
-                        author="system"
-                    ).send()
-                else:
-                    # Create new root-level step for each agent
-                    agent_icons = {
-                        "web": "🌐",
-                        "finance": "📈",
-                        "pdf": "📚"
-                    }
-                    agent_icon = agent_icons.get(agent_name, "🤖")
-                    
-                    self.current_step = await cl.Step(
-                        name=f"{agent_icon} {agent_name.title()} Agent Processing",
-                        show_input=False
-                    ).__aenter__()
+            if event.metadata.get('direct'):
+                # Single-agent answer: stream the agent's tokens as the final message
+                view.answer_agent = event.agent
+            elif event.agent == "meta":
+                # Close the analysis step before synthesis
+                if self.workflow_step:
+                    await self.workflow_step.__aexit__(None, None, None)
+                    self.workflow_step = None
                     
+                view.answer_agent = "meta"
+                await cl.Message(
+                    content="# 📊 Synthesizing Final Analysis...",
+                    author="system"
+                ).send()
+            else:
+                # Create new root-level step for each agent
+                agent_icon = AGENT_ICONS.get(event.agent, "🤖")
+                view.steps[event.agent] = await cl.Step(
+                    name=f"{agent_icon} {event.agent.title()} Agent Processing",
+                    show_input=False
+                ).__aenter__()
+                view.step_buffers[event.agent] = TokenBuffer()
+                
         except Exception as e:
-            print(f"Error in on_llm_start: {str(e)}")
-            await self.reset_state()
+            print(f"Error in on_start: {str(e)}")
     
-    async def on_llm_new_token(self, token: str, **kwargs):
+    async def on_token(self, event: StreamEvent):
+        if event.role == "router":
+            return
         try:
-            if self.is_synthesizing:
-                if self.current_message is None:
-                    self.current_message = await cl.Message(
+            view = self._view(event.request_id)
+            # Tokens are buffered and pushed to the UI in coalesced flushes
+            if event.agent in view.steps:
+                buffer = view.step_buffers[event.agent]
+                if buffer.append(event.token):
+                    await view.steps[event.agent].stream_token(buffer.drain())
+            elif event.agent == view.answer_agent:
+                if view.message is None:
+                    view.message = await cl.Message(
                         content="",
                         author="Assistant"
                     ).send()
-                await self.current_message.stream_token(token)
-            else:
-                self.text += token
-                if self.current_step:
-                    self.current_step.output = self.text
+                if view.message_buffer.append(event.token):
+                    await view.message.stream_token(view.message_buffer.drain())
         except Exception as e:
             print(f"Error streaming token: {str(e)}")
         
-    async def on_llm_end(self, *args, **kwargs):
+    async def on_end(self, event: StreamEvent):
         try:
-            if self.is_synthesizing:
-                if self.current_message:
-                    await self.current_message.update()
+            view = self._view(event.request_id)
+            
+            if event.agent in view.steps:
+                step = view.steps.pop(event.agent)
+                pending = view.step_buffers.pop(event.agent).drain()
+                if pending:
+                    await step.stream_token(pending)
+                await step.__aexit__(None, None, None)
+                
+            elif event.agent == view.answer_agent:
+                if view.message:
+                    pending = view.message_buffer.drain()
+                    if pending:
+                        await view.message.stream_token(pending)
+                    await view.message.update()
                 
                 await cl.Message(
                     content="# ✨ Analysis Complete!",
                     author="system",
                     language="markdown"
                 ).send()
-                self.is_synthesizing = False
-            
-            # Always close current step if it exists
-            if self.current_step:
-                await self.current_step.__aexit__(None, None, None)
-                self.current_step = None
-            
-            self.text = ""
+                self.requests.pop(event.request_id, None)
             
         except Exception as e:
-            print(f"Error in on_llm_end: {str(e)}")
-            await self.reset_state()
+            print(f"Error in on_end: {str(e)}")
+            
+    async def close_all(self):
+        """Close any steps left open by an interrupted query"""
+        for view in self.requests.values():
+            for step in view.steps.values():
+                await step.__aexit__(None, None, None)
+        if self.workflow_step:
+            await self.workflow_step.__aexit__(None, None, None)
+        self.reset_state()
 
 
 """
@@ -94,4 +129,4 @@ Tell me whether the sentiment in the market this week is bullish or bearish
 What are the current federal interest rates and their impact on markets?
 What is the current federal funds rate?
 Explain how the Federal Reserve's latest monetary policy decisions are affecting bond yields and stock market performance
-"""
\ No newline at end of file
+"""
@@ -11,9 +11,11 @@ if project_root not in sys.path:
 import chainlit as cl
 from utils.expert_system import ExpertSystem
 from utils.config import Config
-from expert_chat.handlers import ChainlitStreamHandler
+from expert_chat.handlers import ChainlitDispatcher
 from expert_chat.ui.components import UIComponents
 from utils.memory import AgentMemoryManager
+from utils.cancellation import CancelToken
+from utils.deadline import QueryDeadline
 
 
 # Add model display mapping
@@ -33,8 +35,8 @@ def init_system():
     Config.model_config.provider = provider
     Config.model_config.model_name = model_name
     
-    streaming_handler = ChainlitStreamHandler()
-    system = ExpertSystem(callbacks=[streaming_handler])
+    dispatcher = ChainlitDispatcher()
+    system = ExpertSystem(dispatcher=dispatcher)
     
     return system, provider
 
@@ -46,26 +48,37 @@ async def cleanup(signal_event=None):
         memory_manager = cl.user_session.get("memory_manager")
         
         if memory_manager:
-            memory_manager.clear_all()
+            # Persisted turns stay in the store for resume; only the in-RAM buffers go
+            memory_manager.unload()
             
-        if system and system.streaming_handler:
+        if system and isinstance(system.dispatcher, ChainlitDispatcher):
             # Close any open steps
-            if system.streaming_handler.current_step:
-                await system.streaming_handler.current_step.__aexit__(None, None, None)
-            if system.streaming_handler.workflow_step:
-                await system.streaming_handler.workflow_step.__aexit__(None, None, None)
-            system.streaming_handler.reset_state()
+            await system.dispatcher.close_all()
     except Exception as e:
         print(f"Error during cleanup: {str(e)}")
 
+def cancel_query(reason: str):
+    """Cancel the session's in-flight query, if any, so its agents, tools and LLM streams stop"""
+    token = cl.user_session.get("cancel_token")
+    if token:
+        token.cancel(reason)
+
+def init_session(thread_id: str):
+    """Create the per-session system and memory; memory for thread_id loads lazily from the store"""
+    system, provider = init_system()
+    # Load the embedding model and FAISS index while the welcome messages render
+    warm_up = asyncio.create_task(system.warm_up())
+    
+    cl.user_session.set("system", system)
+    cl.user_session.set("warm_up", warm_up)
+    cl.user_session.set("ui", UIComponents())
+    cl.user_session.set("memory_manager", AgentMemoryManager(session_id=thread_id))
+    return provider
+
 @cl.on_chat_start
 async def start():
     """Initialize chat session"""
-    system, provider = init_system()
-    ui = UIComponents()
-    
-    # Initialize memory manager
-    memory_manager = AgentMemoryManager()
+    provider = init_session(cl.context.session.thread_id)
     
     # Create welcome message with selected model
     await cl.Message(
@@ -115,30 +128,38 @@ to provide comprehensive financial insights and actionable recommendations.
         author="system"
     ).send()
     
-    # Store in session
-    cl.user_session.set("system", system)
-    cl.user_session.set("ui", ui)
-    cl.user_session.set("memory_manager", memory_manager)
+@cl.on_chat_resume
+async def resume(thread):
+    """Reattach a resumed thread to its persisted memory without replaying any agents"""
+    init_session(thread["id"])
 
 @cl.on_message
 async def main(message: cl.Message):
     """Process messages through expert system"""
     system = cl.user_session.get("system")
+    # One token per query; stop and disconnect cancel it
+    cancel_query("superseded")
+    token = CancelToken()
+    cl.user_session.set("cancel_token", token)
+    # The latency budget (QUERY_SLO_SECONDS) starts now and covers routing, agents and synthesis
+    query_deadline = QueryDeadline()
     
     try:
-        # Reset handler state for new query
-        if isinstance(system.streaming_handler, ChainlitStreamHandler):
-            system.streaming_handler.reset_state()
+        # Reset dispatcher state for new query
+        if isinstance(system.dispatcher, ChainlitDispatcher):
+            system.dispatcher.reset_state()
             
         # Create Query Analysis step (for initial plan)
         async with cl.Step(name="🔍 Query Analysis", show_input=True) as step:
             step.input = message.content
             # Process query to get initial plan
-            workflow = await system.analyze_workflow(message.content)
+            workflow = await system.analyze_workflow(message.content, cancel_token=token, query_deadline=query_deadline)
             step.output = workflow
+        if token.cancelled:
+            return
             
         # Process through expert system (agents will create their own steps at root level)
-        await system.process_query(message.content)
+        await system.process_query(message.content, cancel_token=token, query_deadline=query_deadline)
                 
     except Exception as e:
         await cl.Message(
@@ -149,6 +170,13 @@ async def main(message: cl.Message):
 @cl.on_stop
 async def on_stop():
     """Handle graceful shutdown"""
+    cancel_query("stopped")
+    await cleanup()
+
+@cl.on_chat_end
+async def on_chat_end():
+    """Stop a query still running for a closed session and release its memory buffers"""
+    cancel_query("disconnected")
     await cleanup()
 
 # Register signal handlers
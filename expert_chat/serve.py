@@ -0,0 +1,243 @@
+"""
+Multi-worker serving for the Chainlit app.
+
+The parent process loads the retrieval stack (embedding model weights and the
+FAISS index) once, freezes the heap, then forks N workers that inherit it
+copy-on-write. Each worker runs its own Chainlit server on a private port;
+the parent listens on the public port and forwards every connection to a
+worker chosen by client IP, so a user's socket.io session, user_session and
+AgentMemoryManager always live in the same process. Tool caches move to a
+SQLite file shared by all workers (Config.cache_config).
+
+    python expert_chat/serve.py --workers 4 --port 8000
+    python expert_chat/serve.py --workers 2 --app bench.scaling_app:app   # any ASGI app
+"""
+import argparse
+import asyncio
+import gc
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import List
+
+# Add the parent directory to the path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+
+DEFAULT_TARGET = str(Path(__file__).parent / "main.py")
+
+
+def preload_shared_state():
+    """Load read-only state in the parent so every forked worker shares the pages"""
+    # Tokenizer and torch thread pools do not survive fork; keep the parent single-threaded
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    from tools.pdf_tools import PDFTool
+    start = time.perf_counter()
+    try:
+        PDFTool().warm_up()
+        print(f"Retrieval stack loaded in {time.perf_counter() - start:.2f}s, shared with workers")
+    except Exception as e:
+        # Workers fall back to loading it lazily themselves
+        print(f"Error preloading retrieval stack: {str(e)}")
+
+    # Objects allocated so far are never collected, so the GC does not write to (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+
+
+def _run_worker(target: str, host: str, port: int, threads: int, inherited: List[int]):
+    """Worker process entry point: one server on a private port"""
+    for fd in inherited:
+        os.close(fd)
+    # Drop the parent's asyncio signal wiring; the worker's server installs its own
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+    if ":" in target and not target.endswith(".py"):
+        import uvicorn
+        uvicorn.run(target, host=host, port=port, log_level="warning")
+    else:
+        os.environ["CHAINLIT_HOST"] = host
+        os.environ["CHAINLIT_PORT"] = str(port)
+        from chainlit.cli import run_chainlit
+        run_chainlit(target)
+
+
+class WorkerPool:
+    """Forked workers on consecutive private ports, respawned if they exit"""
+
+    def __init__(self, target: str, workers: int, host: str = "127.0.0.1", base_port: int = 8100):
+        self.target = target
+        self.host = host
+        self.ports = [base_port + i for i in range(workers)]
+        self.threads = max(1, (os.cpu_count() or 1) // workers)
+        self.processes: List[multiprocessing.Process] = [None] * workers
+        self.inherited: List[int] = []  # parent listening fds workers must not hold open
+        self._context = multiprocessing.get_context("fork")
+        self._stopping = False
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self.target, self.host, self.ports[index], self.threads, self.inherited),
+            name=f"expert-worker-{index}",
+            daemon=False
+        )
+        process.start()
+        self.processes[index] = process
+        print(f"Worker {index} (pid {process.pid}) on {self.host}:{self.ports[index]}")
+
+    def start(self):
+        for index in range(len(self.ports)):
+            self._spawn(index)
+
+    def wait_ready(self, timeout: float = 120.0) -> bool:
+        """Block until every worker accepts connections"""
+        deadline = time.time() + timeout
+        pending = set(self.ports)
+        while pending and time.time() < deadline:
+            for port in list(pending):
+                try:
+                    socket.create_connection((self.host, port), timeout=0.5).close()
+                    pending.discard(port)
+                except OSError:
+                    pass
+            time.sleep(0.2)
+        return not pending
+
+    async def supervise(self, interval: float = 1.0):
+        """Respawn workers that died (each new fork still shares the parent's preloaded state)"""
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            for index, process in enumerate(self.processes):
+                if not self._stopping and not process.is_alive():
+                    print(f"Worker {index} exited with {process.exitcode}, respawning")
+                    self._spawn(index)
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping = True
+        for process in self.processes:
+            if process and process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            if process:
+                process.join(timeout)
+                if process.is_alive():
+                    process.kill()
+
+
+class AffinityProxy:
+    """TCP proxy on the public port; a client IP always maps to the same worker"""
+
+    def __init__(self, pool: WorkerPool, host: str, port: int):
+        self.pool = pool
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def _order(self, client_ip: str) -> List[int]:
+        """Preferred worker for this IP first, then the others as failover"""
+        first = zlib.crc32(client_ip.encode()) % len(self.pool.ports)
+        return [(first + i) % len(self.pool.ports) for i in range(len(self.pool.ports))]
+
+    async def _connect(self, client_ip: str):
+        for index in self._order(client_ip):
+            try:
+                return await asyncio.open_connection(self.pool.host, self.pool.ports[index])
+            except OSError:
+                continue
+        return None
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        client_ip = client_writer.get_extra_info("peername")[0]
+        upstream = await self._connect(client_ip)
+        if upstream is None:
+            print(f"Error: no worker available for {client_ip}")
+            client_writer.close()
+            return
+        worker_reader, worker_writer = upstream
+        await asyncio.gather(
+            self._pipe(client_reader, worker_writer),
+            self._pipe(worker_reader, client_writer)
+        )
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, reuse_address=True)
+        self.pool.inherited.extend(sock.fileno() for sock in self.server.sockets)
+        print(f"Serving on http://{self.host}:{self.port} with {len(self.pool.ports)} workers")
+
+
+async def _serve(pool: WorkerPool, proxy: AffinityProxy):
+    await proxy.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    supervisor = asyncio.create_task(pool.supervise())
+    await stop.wait()
+    print("Shutting down workers...")
+    pool.stop()
+    supervisor.cancel()
+    proxy.server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-port", type=int, default=8100, help="first private worker port")
+    parser.add_argument("--app", default=DEFAULT_TARGET, help="Chainlit script, or module:attr for an ASGI app")
+    parser.add_argument("--no-preload", action="store_true", help="let each worker load the retrieval stack itself")
+    args = parser.parse_args()
+
+    # Workers share tool caches through one SQLite file instead of a dict each
+    Config.cache_config.backend = os.getenv("CACHE_BACKEND", "sqlite")
+
+    if not args.no_preload:
+        preload_shared_state()
+
+    pool = WorkerPool(args.app, args.workers, base_port=args.worker_port)
+    proxy = AffinityProxy(pool, args.host, args.port)
+    pool.start()
+    if not pool.wait_ready():
+        print("Error: workers did not start listening in time")
+    asyncio.run(_serve(pool, proxy))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,118 +1,215 @@
-from agents.meta_agent import MetaAgent
-from agents.pdf_agent import PDFAgent
-from agents.finance_agent import FinanceAgent
-from agents.web_agent import WebAgent
+import argparse
+import asyncio
 import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
 from utils.config import Config
-from utils.callbacks import StreamingHandler
-
-class ExpertSystem:
-    def __init__(self):
-        print("Loading Expert System...")
-        # Initialize streaming handler
-        self.streaming_handler = StreamingHandler()
-        
-        # Initialize meta agent with streaming
-        self.meta_agent = MetaAgent(callbacks=[self.streaming_handler])
-        
-        # Initialize and register available agents
-        self._initialize_agents()
-        
-    def _initialize_agents(self):
-        """Initialize and register all available agents"""
-        print("Initializing PDF agent...")
-        pdf_agent = PDFAgent(callbacks=[self.streaming_handler])
-        print("Initializing Finance agent...")
-        finance_agent = FinanceAgent(callbacks=[self.streaming_handler])
-        print("Initializing Web agent...")
-        web_agent = WebAgent(callbacks=[self.streaming_handler])
-        
-        # Register all agents
-        self.meta_agent.registry.register("pdf", pdf_agent)
-        self.meta_agent.registry.register("finance", finance_agent)
-        self.meta_agent.registry.register("web", web_agent)
-        
-    def process_query(self, query: str) -> str:
-        """Process a query through the meta agent"""
-        try:
-            print("\nProcessing query...\n")
-            # Get the response but don't print it - streaming handler will handle that
-            response = self.meta_agent.process(query)
-            print("\n")  # Add spacing after response
-            return ""
-        except Exception as e:
-            return self._format_error(str(e))
-            
-    def _format_response(self, response: str) -> str:
-        """Format the final response"""
-        try:
-            # Ensure response is valid JSON
-            json_response = json.loads(response)
-            return json.dumps(json_response, indent=2)
-        except json.JSONDecodeError:
-            return response  # Return as is if not JSON
-            
-    def _format_error(self, error_msg: str) -> str:
-        """Format error messages"""
-        return json.dumps({
-            "error": {
-                "message": error_msg,
-                "type": "system_error"
-            }
-        }, indent=2)
+from utils.deadline import QueryDeadline
+from utils.expert_system import ExpertSystem
+from utils.memory import AgentMemoryManager
+from utils.streaming import CollectingDispatcher
+from utils import session, tracing
+
+PROVIDERS = ("ollama", "groq", "anthropic")
+
+def set_provider(provider: str) -> Optional[str]:
+    """Point every role at a provider; returns an error message if it cannot be used"""
+    if not Config.model_config.has_credentials(provider):
+        return f"Error: {provider.upper()}_API_KEY not found in environment variables"
+    Config.model_config.provider = provider
+    if provider == "ollama":
+        Config.model_config.model_name = Config.model_config.ollama_model_name
+    elif provider == "groq":
+        Config.model_config.model_name = Config.model_config.groq_model_name
+    else:
+        Config.model_config.model_name = Config.model_config.anthropic_model_name
+    return None
 
 def select_model():
     """Allow user to select model provider"""
     print("\nSelect Model Provider:")
-    print("1. Local (Ollama LLaMA 3.2)")
-    print("2. Groq (LLaMA 3.2 90B)")
-    
+    print(f"1. {Config.model_config.local_display_name}")
+    print(f"2. {Config.model_config.groq_display_name}")
+    print(f"3. {Config.model_config.anthropic_display_name}")
+
     while True:
-        choice = input("\nEnter choice (1 or 2): ").strip()
-        if choice == "1":
-            Config.model_config.provider = "ollama"
-            Config.model_config.model_name = "llama3.2"
-            break
-        elif choice == "2":
-            Config.model_config.provider = "groq"
-            Config.model_config.model_name = Config.model_config.groq_model_name
-            if not Config.model_config.groq_api_key:
-                print("Error: GROQ_API_KEY not found in environment variables")
-                continue
+        choice = input("\nEnter choice (1, 2 or 3): ").strip()
+        if choice not in ("1", "2", "3"):
+            print("Invalid choice. Please enter 1, 2 or 3.")
+            continue
+        error = set_provider(PROVIDERS[int(choice) - 1])
+        if not error:
             break
-        else:
-            print("Invalid choice. Please enter 1 or 2.")
+        print(error)
 
-def main():
-    print("Initializing Expert System...")
-    
-    # Add model selection before system initialization
+async def interactive():
+    """Read questions from the terminal and stream answers to stdout"""
     select_model()
-    
     system = ExpertSystem()
-    
+    # Load the embedding model and FAISS index while the user types; a PDF query waits for the load
+    warm_up = asyncio.create_task(system.warm_up())
+
     print("System Ready!")
     print("Available Agents:", system.meta_agent.registry.list_agents())
     print("\nEnter your questions (type 'exit' to quit)")
-    
-    # Main interaction loop
-    while True:
-        try:
-            query = input("\nQuery: ")
+
+    # One conversation: memory carries over between questions
+    with session.local_session(memory_manager=AgentMemoryManager()):
+        while True:
+            query = (await asyncio.to_thread(input, "\nQuery: ")).strip()
             if query.lower() == 'exit':
                 print("Shutting down Expert Agent System...")
                 break
-                
-            response = system.process_query(query)
+            if not query:
+                continue
+
+            response = await system.process_query(query)
             if response:  # Only print if there's an error
                 print("\nResponse:")
                 print(response)
-            
-        except KeyboardInterrupt:
-            print("\nShutting down Expert Agent System...")
-            break
-        except Exception as e:
-            print(f"\nError: {str(e)}")
+
+def read_queries(path: str) -> List[Tuple[str, str]]:
+    """(id, query) pairs from a JSONL file or stdin ("-"); lines are {"id", "query"} objects, JSON strings or plain text, # comments are skipped"""
+    handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    queries = []
+    with handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                item = line
+            if isinstance(item, dict):
+                query_id, query = str(item.get("id", line_number)), item.get("query", "")
+            else:
+                # Without an id the line number is used, so reruns on the same input resume correctly
+                query_id, query = str(line_number), str(item)
+            if query.strip():
+                queries.append((query_id, query.strip()))
+    return queries
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already answered in an earlier run's output; queries that errored are run again"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short when the previous run was killed
+                continue
+            if record.get("error"):
+                done.discard(record.get("id"))
+            else:
+                done.add(record.get("id"))
+    return done
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+async def answer(system: ExpertSystem, query_id: str, query: str, slo: Optional[float]) -> dict:
+    """Run one query on a system no other task is using and describe the result"""
+    collector = CollectingDispatcher()
+    system.dispatcher = collector
+    # Each query stands alone: no memory from other queries in the batch
+    with session.local_session(memory_manager=AgentMemoryManager()):
+        response = await system.process_query(query, query_deadline=QueryDeadline(slo=slo))
+    record = {
+        "id": query_id,
+        "query": query,
+        "answer": collector.text,
+        "route": collector.agents,
+        "missing": dict(system.meta_agent.workpad.missing),
+        "latency_s": round(time.perf_counter() - collector.started, 3),
+        "first_token_s": round(collector.first_token, 3) if collector.first_token is not None else None,
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    if response:
+        record["error"] = json.loads(response)["error"]["message"]
+    elif not collector.text:
+        record["error"] = "no answer"
+    return record
+
+async def run_batch(args):
+    """Answer every query in the input that the output does not have yet, writing each result as it finishes"""
+    queries = read_queries(args.batch)
+    done = set() if args.restart else completed_ids(args.output)
+    pending = [(query_id, query) for query_id, query in queries if query_id not in done]
+    print(f"Batch: {len(queries)} queries, {len(queries) - len(pending)} already answered, {len(pending)} to run", file=sys.stderr)
+    if not pending:
+        return
+
+    work = asyncio.Queue()
+    for item in pending:
+        work.put_nowait(item)
+    # MetaAgent keeps per-query state, so each worker owns a system; models and the index are shared process-wide
+    systems = [ExpertSystem() for _ in range(min(args.concurrency, len(pending)))]
+    await systems[0].warm_up()
+
+    latencies = []
+    errors = 0
+    with open(args.output, "w" if args.restart else "a", encoding="utf-8") as output:
+        if output.tell() and not _ends_with_newline(args.output):
+            # Close off a line cut short when the previous run was killed
+            output.write("\n")
+
+        async def worker(system: ExpertSystem):
+            nonlocal errors
+            while not work.empty():
+                query_id, query = work.get_nowait()
+                record = await answer(system, query_id, query, args.slo)
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                latencies.append(record["latency_s"])
+                errors += bool(record.get("error"))
+                status = record.get("error") or ",".join(record["route"])
+                print(f"[{len(latencies)}/{len(pending)}] {query_id} {record['latency_s']:.1f}s {status}", file=sys.stderr)
+
+        await asyncio.gather(*(worker(system) for system in systems))
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+    print(f"Batch done: {len(latencies)} queries, {errors} errors, "
+          f"p50 {latencies[len(latencies) // 2]:.1f}s, p95 {p95:.1f}s, output {args.output}", file=sys.stderr)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Expert Agent System CLI: interactive by default, or answer a batch of queries")
+    parser.add_argument("--batch", metavar="INPUT", help="JSONL file of queries ({\"id\", \"query\"} per line), or - for stdin")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL results file; a rerun skips queries already in it")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries answered at once")
+    parser.add_argument("--provider", choices=PROVIDERS, help="model provider for batch mode (default: configured provider)")
+    parser.add_argument("--slo", type=float, help="per-query deadline in seconds (default: QUERY_SLO_SECONDS)")
+    parser.add_argument("--restart", action="store_true", help="overwrite the output instead of resuming")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print("Initializing Expert System...", file=sys.stderr if args.batch else sys.stdout)
+
+    try:
+        if args.batch:
+            if args.provider:
+                error = set_provider(args.provider)
+                if error:
+                    sys.exit(error)
+            asyncio.run(run_batch(args))
+        else:
+            asyncio.run(interactive())
+    except (KeyboardInterrupt, EOFError):
+        # Finished batch results are already on disk; a rerun picks up the rest
+        print("\nShutting down Expert Agent System...")
+    finally:
+        # Export the spans still buffered in the batch processor before the process exits
+        tracing.shutdown_tracing()
 
 if __name__ == "__main__":
     main()
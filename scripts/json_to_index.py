@@ -1,28 +1,42 @@
 import os
+import sys
+import time
+from pathlib import Path
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import json
 
+# Add the parent directory to the path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+from utils.dedup import dedup_report, find_near_duplicates
+
 # Function to read all text files and prepare them for vector embedding
-def load_and_split_texts(text_folder):
+# (chunk sizes are parameters so bench/rag_bench.py can compare alternatives)
+def load_and_split_texts(text_folder, dense_chunk_size=800, dense_chunk_overlap=400,
+                         regular_chunk_size=1000, regular_chunk_overlap=200):
     # Use different splitters based on content type
     dense_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=400,
+        chunk_size=dense_chunk_size,
+        chunk_overlap=dense_chunk_overlap,
         separators=["\n\n", "\n", ".", "!", "?", ";", ":", " ", ""]
     )
     
     regular_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
+        chunk_size=regular_chunk_size,
+        chunk_overlap=regular_chunk_overlap,
         separators=["\n\n", "\n", ".", "!", "?", ";", ":", " ", ""]
     )
     
     texts = []
     metadatas = []
     
-    for file_name in os.listdir(text_folder):
+    # Sorted so reruns chunk (and deduplicate) in the same order
+    for file_name in sorted(os.listdir(text_folder)):
         if file_name.endswith('.json'):
             with open(os.path.join(text_folder, file_name), "r") as file:
                 data = json.load(file)
@@ -50,15 +64,53 @@ def load_and_split_texts(text_folder):
     
     return texts, metadatas
 
+# Drop chunks that near-duplicate an earlier one (overlapping or re-issued documents)
+def remove_near_duplicates(texts, metadatas, threshold=None, shingle_words=None):
+    settings = Config.rag_config
+    threshold = threshold if threshold is not None else settings.dedup_threshold
+    shingle_words = shingle_words or settings.dedup_shingle_words
+    
+    start = time.perf_counter()
+    sources = [metadata.get("source_file", "unknown") for metadata in metadatas]
+    result = find_near_duplicates(texts, threshold=threshold, shingle_size=shingle_words, documents=sources)
+    report = dedup_report(texts, sources, result)
+    report.update(threshold=threshold, shingle_words=shingle_words, seconds=round(time.perf_counter() - start, 3))
+    
+    # Provenance: the chunk that stays lists every chunk folded into it
+    for dropped, (kept, coverage) in sorted(result.duplicates.items()):
+        metadatas[kept].setdefault("duplicates", []).append({
+            "source_file": metadatas[dropped].get("source_file"),
+            "chunk_id": metadatas[dropped].get("chunk_id"),
+            "coverage": round(coverage, 3)
+        })
+    
+    texts = [texts[i] for i in result.keep]
+    metadatas = [metadatas[i] for i in result.keep]
+    print(f"Dedup: removed {report['chunks_removed']} of {report['chunks_before']} chunks "
+          f"({report['share_removed']:.1%} of text) in {report['seconds']:.2f}s")
+    for pair, count in report["duplicate_of"].items():
+        print(f"  {count:>4}  {pair}")
+    return texts, metadatas, report
+
 # Create FAISS index from text files
-def create_faiss_index(text_folder, index_path, embedding_model='sentence-transformers/all-MiniLM-L6-v2'):
-    texts, metadatas = load_and_split_texts(text_folder)
-    embeddings = HuggingFaceEmbeddings(model_name=embedding_model)
+def create_faiss_index(text_folder, index_path, embedding_model='sentence-transformers/all-MiniLM-L6-v2',
+                       embeddings=None, dedup=None, **chunking):
+    texts, metadatas = load_and_split_texts(text_folder, **chunking)
+    if dedup is None:
+        dedup = Config.rag_config.dedup
+    report = None
+    if dedup:
+        texts, metadatas, report = remove_near_duplicates(texts, metadatas)
+    embeddings = embeddings or HuggingFaceEmbeddings(model_name=embedding_model)
     vector_store = FAISS.from_texts(texts, embeddings, metadatas=metadatas)
 
     # Save the FAISS index to disk
     vector_store.save_local(index_path)
-    print(f"FAISS index saved to {index_path}")
+    if report:
+        with open(os.path.join(index_path, "dedup_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"FAISS index saved to {index_path} ({len(texts)} chunks)")
+    return vector_store
 
 if __name__ == "__main__":
     # The folder where text files are saved
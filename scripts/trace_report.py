@@ -0,0 +1,77 @@
+"""
+Summarize a JSON trace file written with TRACE_EXPORTER=json: where each
+query's seconds go, per span name.
+
+    python scripts/trace_report.py traces.jsonl
+"""
+import argparse
+import json
+import statistics
+from collections import defaultdict
+
+
+def load_spans(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(spans):
+    """Per span name: count, total/mean/p95 duration and share of query time"""
+    by_name = defaultdict(list)
+    for span in spans:
+        by_name[span["name"]].append(span["duration_ms"])
+
+    query_total = sum(by_name.get("query", [])) or None
+    rows = []
+    for name, durations in by_name.items():
+        durations.sort()
+        total = sum(durations)
+        rows.append({
+            "name": name,
+            "count": len(durations),
+            "total_ms": total,
+            "mean_ms": statistics.mean(durations),
+            "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            "share": total / query_total if query_total else None
+        })
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def llm_breakdown(spans):
+    """Per LLM role: mean time to first token and tokens/sec"""
+    by_role = defaultdict(list)
+    for span in spans:
+        if span["name"] == "llm.invoke":
+            by_role[span["attributes"].get("role", "?")].append(span["attributes"])
+    rows = []
+    for role, calls in sorted(by_role.items()):
+        ttfts = [c["ttft_s"] for c in calls if "ttft_s" in c]
+        rates = [c["tokens_per_second"] for c in calls if "tokens_per_second" in c]
+        rows.append((role, len(calls), statistics.mean(ttfts) if ttfts else 0.0, statistics.mean(rates) if rates else 0.0))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace_file", nargs="?", default="./traces.jsonl")
+    args = parser.parse_args()
+
+    spans = load_spans(args.trace_file)
+    traces = {span["trace_id"] for span in spans}
+    print(f"{len(spans)} spans in {len(traces)} traces\n")
+
+    print(f"{'span':<34} {'count':>6} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'% query':>8}")
+    for row in summarize(spans):
+        share = f"{row['share'] * 100:7.1f}%" if row["share"] is not None else f"{'-':>8}"
+        print(f"{row['name']:<34} {row['count']:>6} {row['total_ms'] / 1000:>9.2f} "
+              f"{row['mean_ms']:>9.1f} {row['p95_ms']:>9.1f} {share}")
+
+    rows = llm_breakdown(spans)
+    if rows:
+        print(f"\n{'llm role':<18} {'calls':>6} {'ttft s':>8} {'tok/s':>8}")
+        for role, calls, ttft, rate in rows:
+            print(f"{role:<18} {calls:>6} {ttft:>8.2f} {rate:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Refresh the symbol listings used by FinanceAgent (tools/symbol_index.py)
+from Alpha Vantage LISTING_STATUS, keeping the aliases of the current file.
+
+    python scripts/update_listings.py                      # writes Config.path_config.listings_file
+    python scripts/update_listings.py --stocks-only --out data/listings/symbols.csv
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+from pathlib import Path
+
+import requests
+
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.config import Config
+
+COLUMNS = ["symbol", "name", "exchange", "assetType", "aliases"]
+
+
+def load_aliases(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["symbol"]: row.get("aliases") or "" for row in csv.DictReader(f)}
+
+
+def fetch_listings():
+    response = requests.get(
+        Config.api_config.alpha_vantage_base_url,
+        params={"function": "LISTING_STATUS", "apikey": Config.api_config.alpha_vantage_key},
+        timeout=60
+    )
+    response.raise_for_status()
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=Config.path_config.listings_file)
+    parser.add_argument("--stocks-only", action="store_true", help="leave out ETFs")
+    args = parser.parse_args()
+
+    aliases = load_aliases(args.out)
+    rows = [row for row in fetch_listings()
+            if row.get("status", "Active") == "Active" and (not args.stocks_only or row["assetType"] == "Stock")]
+    if not rows:
+        raise SystemExit("Error: LISTING_STATUS returned no rows (check ALPHA_VANTAGE_API_KEY)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "aliases": aliases.get(row["symbol"], "")})
+    kept = sum(1 for row in rows if aliases.get(row["symbol"]))
+    print(f"Wrote {len(rows)} listings to {args.out} ({kept} with aliases)")
+
+
+if __name__ == "__main__":
+    main()
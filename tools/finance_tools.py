@@ -1,5 +1,7 @@
 from utils.config import Config
-from datetime import datetime, timedelta
+from utils import cancellation, deadline, tracing
+from utils.cache_store import get_cache
+from datetime import timedelta
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -11,32 +13,28 @@ class VantageFinanceTool:
         if not self.api_key:
             raise ValueError("ALPHA_VANTAGE_API_KEY not found in environment variables")
         
-        self.base_url = "https://www.alphavantage.co/query"
+        self.base_url = Config.api_config.alpha_vantage_base_url
         self.session = requests.Session()
         retries = Retry(total=3, backoff_factor=0.5)
         self.session.mount('https://', HTTPAdapter(max_retries=retries))
-        self._cache = {}
-        self._cache_expiry = {}
+        self.cache = get_cache("alpha_vantage")
         self.cache_duration = timedelta(minutes=15)  # Cache data for 15 minutes
 
     def _get_cached_data(self, symbol: str):
         """Get cached data if available and not expired"""
-        now = datetime.now()
-        if symbol in self._cache and symbol in self._cache_expiry:
-            if now < self._cache_expiry[symbol]:
-                return self._cache[symbol]
-        return None
+        return self.cache.get(symbol)
 
     def _set_cached_data(self, symbol: str, data: dict):
         """Cache data with expiration"""
-        self._cache[symbol] = data
-        self._cache_expiry[symbol] = datetime.now() + self.cache_duration
+        self.cache.set(symbol, data, self.cache_duration.total_seconds())
 
+    @tracing.traced("tool.alpha_vantage.get_stock_data")
     def get_stock_data(self, symbol: str):
         """Get stock data with caching"""
         try:
             # Check cache first
             cached_data = self._get_cached_data(symbol)
+            tracing.annotate(symbol=symbol, cache_hit=bool(cached_data))
             if cached_data:
                 return cached_data
 
@@ -46,10 +44,11 @@ class VantageFinanceTool:
                 "symbol": symbol,
                 "apikey": self.api_key
             }
+            cancellation.checkpoint()
             quote_response = self.session.get(
                 self.base_url,
                 params=quote_params,
-                timeout=10
+                timeout=deadline.cap(Config.api_config.timeout)
             )
             quote_data = quote_response.json()
             
@@ -65,10 +64,11 @@ class VantageFinanceTool:
                 "symbol": symbol,
                 "apikey": self.api_key
             }
+            cancellation.checkpoint()
             overview_response = self.session.get(
                 self.base_url,
                 params=overview_params,
-                timeout=10
+                timeout=deadline.cap(Config.api_config.timeout)
             )
             overview_data = overview_response.json()
             
@@ -1,77 +1,104 @@
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.callbacks.base import BaseCallbackHandler
-from typing import List, Any
-import sys
+from typing import List, Any, Optional
+import threading
 from utils.config import Config
-
-class StreamingHandler(BaseCallbackHandler):
-    def __init__(self):
-        self.text = ""
-        
-    def on_llm_new_token(self, token: str, **kwargs) -> None:
-        sys.stdout.write(token)
-        sys.stdout.flush()
-        self.text += token
+from utils import cancellation, tracing
+from utils.embeddings import get_embeddings
 
 class RAGSystem:
     def __init__(self, 
                  index_path: str = "./data/indexes",
                  embedding_model: str = 'sentence-transformers/all-MiniLM-L6-v2',
-                 device: str = 'mps'):
+                 device: str = 'mps',
+                 embeddings=None):
         # Disable logging for the transformers and FAISS
         import logging
         logging.getLogger('sentence_transformers').setLevel(logging.WARNING)
         logging.getLogger('faiss').setLevel(logging.WARNING)
+        # torch/transformers/FAISS are only imported once an index is actually loaded
+        from langchain_community.vectorstores import FAISS
         
         self.index_path = index_path
         self.embedding_model = embedding_model
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=self.embedding_model,
-            model_kwargs={'device': device}
-        )
+        self.embeddings = embeddings or get_embeddings(self.embedding_model, device)
         self.vector_store = FAISS.load_local(
             self.index_path, 
             self.embeddings,
             allow_dangerous_deserialization=True
         )
         
-    def get_context(self, query: str, k: int = 5) -> str:
+    @tracing.traced("tool.rag.get_context")
+    def get_context(self, query: str, k: Optional[int] = None) -> str:
         """Retrieve relevant context for a query"""
         try:
-            retriever = self.vector_store.as_retriever(
-                search_type="mmr",
-                search_kwargs={
-                    "k": k,
-                    "fetch_k": 15,
-                    "lambda_mult": 0.7
-                }
-            )
-            docs = retriever.invoke(query)
-            return self._format_context(docs)
+            return self._format_context(self.retrieve(query, k=k))
         except Exception as e:
             raise Exception(f"Error retrieving context: {str(e)}")
 
+    def retrieve(self, query: str, k: Optional[int] = None, search_type: Optional[str] = None,
+                 fetch_k: Optional[int] = None, lambda_mult: Optional[float] = None) -> List[Any]:
+        """Ranked documents for a query; unset parameters come from Config.rag_config"""
+        settings = Config.rag_config
+        search_type = search_type or settings.search_type
+        search_kwargs = {"k": k or settings.k}
+        if search_type == "mmr":
+            search_kwargs["fetch_k"] = fetch_k or settings.fetch_k
+            search_kwargs["lambda_mult"] = lambda_mult if lambda_mult is not None else settings.lambda_mult
+        tracing.annotate(search_type=search_type, **search_kwargs)
+        
+        retriever = self.vector_store.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
+        return retriever.invoke(query)
+
     def _format_context(self, docs: List[Any]) -> str:
         """Format retrieved documents into a string"""
         context_parts = []
         for i, doc in enumerate(docs, 1):
             metadata = doc.metadata
-            context_parts.append(
-                f"Document {i}:\n"
-                f"Source: {metadata.get('source', 'Unknown')}\n"
-                f"Content: {doc.page_content}\n"
-            )
+            source = metadata.get('source') or metadata.get('source_file', 'Unknown')
+            part = f"Document {i}:\nSource: {source}\n"
+            # Near-duplicate chunks were dropped at index time; the kept one names the other documents with the text
+            also_in = sorted({d["source_file"] for d in metadata.get("duplicates", [])} - {source})
+            if also_in:
+                part += f"Also in: {', '.join(also_in)}\n"
+            context_parts.append(part + f"Content: {doc.page_content}\n")
         return "\n".join(context_parts)
 
+_rag_systems = {}
+_rag_lock = threading.Lock()
+
+def get_rag_system(index_path: str, embedding_model: str, device: str) -> RAGSystem:
+    """Process-wide RAGSystem per index and model, loaded once and shared by every session"""
+    key = (index_path, embedding_model, device)
+    with _rag_lock:
+        if key not in _rag_systems:
+            _rag_systems[key] = RAGSystem(
+                index_path=index_path,
+                embedding_model=embedding_model,
+                device=device
+            )
+        return _rag_systems[key]
+
 class PDFTool:
     """Main interface for PDF processing and RAG capabilities"""
     def __init__(self):
         self.config = Config.path_config
-        self.rag_system = RAGSystem(
-            index_path=self.config.index_dir
-        )
+        self._rag_system = None
+        
+    @property
+    def rag_system(self) -> RAGSystem:
+        """Embedding model and FAISS index load on first use (or warm_up), not at startup"""
+        if self._rag_system is None:
+            self._rag_system = get_rag_system(
+                self.config.index_dir,
+                Config.rag_config.embedding_model,
+                Config.rag_config.embedding_device
+            )
+        return self._rag_system
+        
+    def warm_up(self):
+        """Load the embedding model and index ahead of the first PDF query"""
+        return self.rag_system
         
     def query_documents(self, query: str) -> str:
         """Query the processed documents"""
+        cancellation.checkpoint()
         return self.rag_system.get_context(query)
\ No newline at end of file
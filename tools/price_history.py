@@ -0,0 +1,250 @@
+from typing import Dict, List, Optional
+import datetime
+import json
+import os
+import threading
+import time
+import numpy as np
+import requests
+from utils.config import Config
+from utils import cancellation, deadline, tracing
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within the process
+    fcntl = None
+
+EPOCH = datetime.date(1970, 1, 1)
+TRADING_DAYS = 252
+
+
+class PriceHistoryStore:
+    """Daily bars per symbol, one raw column file each (date as days since 1970, prices, volume), read as memmaps"""
+
+    COLUMNS = {"date": "<i4", "open": "<f8", "high": "<f8", "low": "<f8", "close": "<f8", "volume": "<f8"}
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _dir(self, symbol: str) -> str:
+        return os.path.join(self.root, symbol.upper())
+
+    def load(self, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        """Read-only memmapped columns, oldest day first, or None if the symbol was never stored"""
+        directory = self._dir(symbol)
+        sizes = {}
+        for column, dtype in self.COLUMNS.items():
+            path = os.path.join(directory, column)
+            if not os.path.exists(path):
+                return None
+            sizes[column] = os.path.getsize(path) // np.dtype(dtype).itemsize
+        # A crash between column appends leaves some columns longer; only whole rows count
+        rows = min(sizes.values())
+        if rows == 0:
+            return None
+        return {
+            column: np.memmap(os.path.join(directory, column), dtype=dtype, mode="r", shape=(rows,))
+            for column, dtype in self.COLUMNS.items()
+        }
+
+    def append(self, symbol: str, bars: Dict[str, np.ndarray], replace: bool = False) -> int:
+        """Append the bars newer than the last stored day (or rewrite the series) and return rows written"""
+        directory = self._dir(symbol)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, open(os.path.join(directory, ".lock"), "w") as lock:
+            if fcntl:
+                # Worker processes share the directory
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            stored = None if replace else self.load(symbol)
+            order = np.argsort(bars["date"], kind="stable")
+            new = order if stored is None else order[bars["date"][order] > stored["date"][-1]]
+            rows = stored["date"].shape[0] if stored is not None else 0
+            mode = "wb" if stored is None else "r+b"
+            for column, dtype in self.COLUMNS.items():
+                with open(os.path.join(directory, column), mode) as f:
+                    # Drop any partial row a crash left behind, then append
+                    f.truncate(rows * np.dtype(dtype).itemsize)
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.asarray(bars[column][new], dtype=dtype).tobytes())
+            return len(new)
+
+    def fetched_at(self, symbol: str) -> float:
+        try:
+            with open(os.path.join(self._dir(symbol), "meta.json")) as f:
+                return json.load(f).get("fetched_at", 0.0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def mark_fetched(self, symbol: str) -> None:
+        with open(os.path.join(self._dir(symbol), "meta.json"), "w") as f:
+            json.dump({"fetched_at": time.time()}, f)
+
+
+class PriceHistoryTool:
+    """Keeps each symbol's daily bars current in a PriceHistoryStore and summarizes them as indicators"""
+
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.api_key = Config.api_config.alpha_vantage_key
+        if not self.api_key:
+            raise ValueError("ALPHA_VANTAGE_API_KEY not found in environment variables")
+        self.base_url = Config.api_config.alpha_vantage_base_url
+        self.session = session or requests.Session()
+        self.settings = Config.price_history_config
+        self.store = PriceHistoryStore(self.settings.path)
+
+    @tracing.traced("tool.alpha_vantage.price_history")
+    def get_history(self, symbol: str) -> Dict[str, np.ndarray]:
+        """Stored bars for a symbol, fetching only the days added since the last refresh"""
+        stored = self.store.load(symbol)
+        stale = time.time() - self.store.fetched_at(symbol) > self.settings.refresh_hours * 3600
+        tracing.annotate(symbol=symbol, stored_days=0 if stored is None else len(stored["date"]), refreshed=stale)
+        if stored is not None and not stale:
+            return stored
+        cancellation.checkpoint()
+        try:
+            bars = self._fetch(symbol)
+        except Exception as e:
+            if stored is not None:
+                # Serve what we have rather than nothing when the API is unavailable or rate limited
+                print(f"Error refreshing price history for {symbol}: {str(e)}")
+                return stored
+            raise Exception(f"Error fetching price history for {symbol}: {str(e)}")
+        # If the stored series ends before the fetched window starts, appending would leave a gap
+        gap = stored is not None and bars["date"].min() > stored["date"][-1] + 1
+        added = self.store.append(symbol, bars, replace=gap)
+        self.store.mark_fetched(symbol)
+        tracing.annotate(added_days=added, replaced=gap)
+        return self.store.load(symbol)
+
+    def _fetch(self, symbol: str) -> Dict[str, np.ndarray]:
+        response = self.session.get(
+            self.base_url,
+            params={"function": "TIME_SERIES_DAILY", "symbol": symbol,
+                    "outputsize": self.settings.outputsize, "apikey": self.api_key},
+            timeout=deadline.cap(Config.api_config.timeout)
+        )
+        data = response.json()
+        if "Information" in data or "Note" in data:
+            raise Exception(data.get("Information") or data.get("Note"))
+        series = data.get("Time Series (Daily)")
+        if not series:
+            raise Exception(f"Invalid daily series response for {symbol}: {data}")
+        return parse_daily_series(series)
+
+    def technicals(self, symbols: List[str]) -> Dict:
+        """Indicator summary per symbol plus return correlations between them"""
+        histories = {}
+        for symbol in symbols:
+            try:
+                histories[symbol] = self.get_history(symbol)
+            except Exception as e:
+                print(str(e))
+        summary = {symbol: summarize(bars) for symbol, bars in histories.items()}
+        if len(histories) > 1:
+            summary["correlation"] = correlations(histories, self.settings.correlation_window)
+        return summary
+
+
+def parse_daily_series(series: Dict[str, Dict[str, str]]) -> Dict[str, np.ndarray]:
+    """Alpha Vantage "Time Series (Daily)" mapping to column arrays, oldest first"""
+    dates = sorted(series)
+    values = np.array([[float(series[d][key]) for key in ("1. open", "2. high", "3. low", "4. close", "5. volume")]
+                       for d in dates], dtype=np.float64).reshape(-1, 5)
+    return {
+        "date": np.array([(datetime.date.fromisoformat(d) - EPOCH).days for d in dates], dtype=np.int32),
+        "open": values[:, 0], "high": values[:, 1], "low": values[:, 2],
+        "close": values[:, 3], "volume": values[:, 4],
+    }
+
+
+def sma(close: np.ndarray, window: int) -> Optional[float]:
+    if len(close) < window:
+        return None
+    return float(close[-window:].mean())
+
+
+def rsi(close: np.ndarray, window: int = 14) -> Optional[float]:
+    """Wilder's RSI of the last day, with the recursive smoothing written as one weighted sum"""
+    changes = np.diff(close)
+    if len(changes) < window:
+        return None
+    gains, losses = np.clip(changes, 0, None), np.clip(-changes, 0, None)
+    alpha = 1.0 / window
+    tail = len(changes) - window
+    # avg_t = (1 - alpha) * avg_{t-1} + alpha * x_t, seeded with the mean of the first `window` changes
+    weights = alpha * (1 - alpha) ** np.arange(tail - 1, -1, -1)
+    decay = (1 - alpha) ** tail
+    avg_gain = decay * gains[:window].mean() + weights @ gains[window:]
+    avg_loss = decay * losses[:window].mean() + weights @ losses[window:]
+    if avg_loss == 0:
+        return 100.0
+    return float(100 - 100 / (1 + avg_gain / avg_loss))
+
+
+def volatility(close: np.ndarray, window: int) -> Optional[float]:
+    """Annualized standard deviation of daily log returns, in percent"""
+    if len(close) <= window:
+        return None
+    returns = np.diff(np.log(close[-window - 1:]))
+    return float(returns.std(ddof=1) * np.sqrt(TRADING_DAYS) * 100)
+
+
+def drawdowns(close: np.ndarray) -> Dict[str, float]:
+    """Current and maximum decline from the running peak, in percent"""
+    falls = close / np.maximum.accumulate(close) - 1
+    return {"current": float(falls[-1] * 100), "max": float(falls.min() * 100)}
+
+
+def summarize(bars: Dict[str, np.ndarray]) -> Dict:
+    """Compact indicator summary of one symbol's last year of bars"""
+    close = np.asarray(bars["close"][-TRADING_DAYS - 1:])
+    high = np.asarray(bars["high"][-TRADING_DAYS:])
+    low = np.asarray(bars["low"][-TRADING_DAYS:])
+    falls = drawdowns(close)
+    changes = {label: float((close[-1] / close[-days - 1] - 1) * 100)
+               for label, days in (("1w", 5), ("1m", 21), ("3m", 63), ("1y", 252)) if len(close) > days}
+    summary = {
+        "as_of": (EPOCH + datetime.timedelta(days=int(bars["date"][-1]))).isoformat(),
+        "days": len(bars["date"]),
+        "close": close[-1],
+        "change_pct": changes,
+        "sma": {str(window): sma(close, window) for window in (20, 50, 200) if len(close) >= window},
+        "rsi_14": rsi(close),
+        "volatility_pct": {f"{window}d": volatility(close, window) for window in (20, 60) if len(close) > window},
+        "drawdown_pct": falls["current"],
+        "max_drawdown_pct": falls["max"],
+        "range_1y": [float(low.min()), float(high.max())],
+        "avg_volume_20d": float(np.asarray(bars["volume"][-20:]).mean()),
+    }
+    return _rounded(summary)
+
+
+def correlations(histories: Dict[str, Dict[str, np.ndarray]], window: int) -> Dict[str, float]:
+    """Pairwise correlation of daily log returns over the last `window` days all symbols traded"""
+    symbols = list(histories)
+    common = histories[symbols[0]]["date"]
+    for symbol in symbols[1:]:
+        common = np.intersect1d(common, histories[symbol]["date"], assume_unique=True)
+    common = common[-window - 1:]
+    if len(common) < 3:
+        return {}
+    returns = np.vstack([
+        np.diff(np.log(np.asarray(histories[s]["close"])[np.searchsorted(histories[s]["date"], common)]))
+        for s in symbols
+    ])
+    matrix = np.corrcoef(returns)
+    return {
+        f"{symbols[i]}/{symbols[j]}": round(float(matrix[i, j]), 2)
+        for i in range(len(symbols)) for j in range(i + 1, len(symbols))
+    }
+
+
+def _rounded(value):
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rounded(item) for item in value]
+    if isinstance(value, (float, np.floating)):
+        return round(float(value), 2)
+    return value
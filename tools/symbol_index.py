@@ -0,0 +1,200 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import csv
+import re
+import threading
+from utils.config import Config
+
+# "The Walt Disney Company" is also matched without its article
+_NAME_PREFIX = re.compile(r"^the\s+", re.IGNORECASE)
+
+# Listed tickers that are also words or common abbreviations; only taken in explicit form, (NOW) or $NOW
+AMBIGUOUS_TICKERS = {
+    "ALL", "ARE", "ARM", "CAT", "COST", "DIS", "EL", "GD", "HD", "HOOD", "ICE", "IT", "KEY", "LOW",
+    "MA", "MO", "MS", "NET", "NOW", "ON", "PM", "SNAP", "SO", "DE", "CL", "BP", "GS", "TM", "AI", "OR",
+}
+
+# Aliases that are everyday words in lower case; they only match when capitalized (Apple, not apple)
+COMMON_WORD_NAMES = {
+    "apple", "amazon", "meta", "oracle", "visa", "delta", "ford", "shell", "zoom", "snapchat", "intel",
+    "micron", "lucid", "coke", "dell", "target", "block", "square", "sony", "lilly", "vertex", "linde",
+    "citi", "goldman", "abbott", "altria", "merck", "nike",
+}
+
+_EXPLICIT = re.compile(r"\(([A-Z]{1,5}(?:[.-][A-Z])?)\)|\$([A-Z]{1,5}(?:[.-][A-Z])?)\b")
+_CANDIDATE = re.compile(r"\b[A-Z]{2,5}\b")
+
+# Upstream requests a symbol costs the finance agent (GLOBAL_QUOTE and OVERVIEW)
+CALLS_PER_SYMBOL = 2
+
+
+@dataclass
+class SymbolStats:
+    queries: int = 0
+    by_ticker: int = 0
+    by_name: int = 0
+    # Uppercase words the previous regex heuristic would have looked up (CEO, USA, GDP, FED, ...)
+    rejected: int = 0
+
+    @property
+    def calls_avoided(self) -> int:
+        return self.rejected * CALLS_PER_SYMBOL
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: every occurrence of every pattern in one pass over the text"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+        self.patterns: List[str] = []
+
+    def add(self, pattern: str) -> int:
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.patterns.append(pattern)
+        self.output[state].append(len(self.patterns) - 1)
+        return len(self.patterns) - 1
+
+    def build(self) -> None:
+        """Breadth-first failure links; each state's output includes its suffix states' outputs"""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """(start, end, pattern id) of every match"""
+        matches = []
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern_id in self.output[state]:
+                matches.append((i + 1 - len(self.patterns[pattern_id]), i + 1, pattern_id))
+        return matches
+
+
+class SymbolIndex:
+    """Tickers, company names and aliases from a listings CSV, matched against queries in one pass"""
+
+    def __init__(self, listings_path: str):
+        self.symbols: Dict[str, str] = {}  # symbol -> company name
+        self.matcher = AhoCorasick()
+        self._targets: List[Tuple[str, bool]] = []  # per pattern: (symbol, is_ticker)
+        self.stats = SymbolStats()
+        self._lock = threading.Lock()
+        with open(listings_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("status", "Active") != "Active":
+                    continue
+                self._add_listing(row["symbol"].strip().upper(), row["name"].strip(), row.get("aliases") or "")
+        self.matcher.build()
+
+    def _add_listing(self, symbol: str, name: str, aliases: str) -> None:
+        if not symbol or symbol in self.symbols:
+            return
+        self.symbols[symbol] = name
+        tickers = {symbol, symbol.replace("-", ".")}
+        names = {_NAME_PREFIX.sub("", name), name} | {alias.strip() for alias in aliases.split("|") if alias.strip()}
+        for ticker in tickers:
+            self.matcher.add(ticker.lower())
+            self._targets.append((symbol, True))
+        for alias in names:
+            self.matcher.add(alias.lower())
+            self._targets.append((symbol, False))
+
+    def extract(self, query: str) -> List[str]:
+        """Listed symbols in a query, from explicit (AAPL)/$AAPL, bare tickers and company names, in order"""
+        explicit = {m.start(): (m.group(1) or m.group(2)) for m in _EXPLICIT.finditer(query)}
+        # A shouted query has little case signal left, so only longer bare tickers count there
+        min_bare = 4 if query.isupper() else 2
+        candidates = [
+            (start, end, pattern_id) for start, end, pattern_id in self.matcher.find(query.lower())
+            if _bounded(query, start, end) and self._accept(query[start:end], pattern_id, start - 1 in explicit, min_bare)
+        ]
+        found: Dict[str, None] = {}
+        by_ticker = by_name = 0
+        matched_spans = []
+        for start, end, pattern_id in _leftmost_longest(candidates):
+            symbol, is_ticker = self._targets[pattern_id]
+            by_ticker += is_ticker
+            by_name += not is_ticker
+            found.setdefault(symbol)
+            matched_spans.append((start, end))
+
+        # Explicitly marked tickers are taken even if the bundled listing does not have them
+        for ticker in explicit.values():
+            symbol = ticker.replace(".", "-")
+            if symbol not in found:
+                found.setdefault(symbol)
+                by_ticker += 1
+        rejected = sum(
+            1 for m in _CANDIDATE.finditer(query)
+            if not any(s <= m.start() and m.end() <= e for s, e in matched_spans)
+            and m.group() not in explicit.values() and _legacy_candidate(m.group())
+        )
+        with self._lock:
+            self.stats.queries += 1
+            self.stats.by_ticker += by_ticker
+            self.stats.by_name += by_name
+            self.stats.rejected += rejected
+        return list(found)
+
+    def _accept(self, text: str, pattern_id: int, is_explicit: bool, min_bare: int) -> bool:
+        symbol, is_ticker = self._targets[pattern_id]
+        if is_ticker:
+            # Tickers are upper case in the query; bare ones must be unambiguous
+            return text.isupper() and (is_explicit or (len(symbol) >= min_bare and symbol not in AMBIGUOUS_TICKERS))
+        return text[0].isupper() or text.lower() not in COMMON_WORD_NAMES
+
+
+def _leftmost_longest(matches: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """Non-overlapping matches, preferring the earliest and then the longest"""
+    selected = []
+    last_end = -1
+    for start, end, pattern_id in sorted(matches, key=lambda match: (match[0], -match[1])):
+        if start >= last_end:
+            selected.append((start, end, pattern_id))
+            last_end = end
+    return selected
+
+
+def _bounded(text: str, start: int, end: int) -> bool:
+    """Match is a whole word (or phrase), not part of a longer one"""
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not (before.isalnum() or after.isalnum() or before in "&-" or after in "&-")
+
+
+def _legacy_candidate(token: str) -> bool:
+    """Whether FinanceAgent's earlier regex heuristic treated an uppercase word as a symbol"""
+    return 2 <= len(token) <= 4 and not token.endswith("S") and len(set(token)) > 1
+
+
+_index: Optional[SymbolIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_symbol_index() -> SymbolIndex:
+    """Process-wide index, loaded from Config.path_config.listings_file on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SymbolIndex(Config.path_config.listings_file)
+        return _index
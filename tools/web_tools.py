@@ -1,31 +1,66 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+import asyncio
+import re
+import weakref
 import requests
 from utils.config import Config
+from utils import cancellation, deadline, tracing
+from utils.cache_store import get_cache
 from datetime import datetime, timedelta
 
+# Words that do not change what a web search returns
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "at", "to", "is", "are", "was", "were", "be", "been",
+    "what", "whats", "which", "how", "do", "does", "did", "about", "and", "or", "with", "by", "from",
+    "me", "my", "i", "you", "your", "please", "tell", "show", "give", "can", "could", "would"
+}
+# Words in any script, decimals and ampersand names (s&p, at&t) whose parts would otherwise look like
+# stopwords; a trailing + or # (c++, c#) and a leading - (the search exclusion operator) stay on the token
+_QUERY_TOKEN = re.compile(r"(?:(?<![\w-])-)?(?:\w+(?:&\w+)+|\w+(?:\.\d+)?)[+#]*")
+_POSSESSIVE = re.compile(r"['\u2019]s\b")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a search: lowercase, punctuation and stopwords dropped, whitespace collapsed"""
+    tokens = _QUERY_TOKEN.findall(_POSSESSIVE.sub("", query.lower()))
+    kept = [token for token in tokens if token not in STOPWORDS]
+    # A query made only of stopwords keeps them, and one with no tokens at all keeps its raw text,
+    # rather than collapsing to an empty key every such query would share
+    return " ".join(kept or tokens) or " ".join(query.lower().split())
+
+
 class SerperTool:
+    # Serper's largest page size
+    MAX_RESULTS = 100
+
     def __init__(self):
         self.api_key = Config.api_config.serper_api_key
         if not self.api_key:
             raise ValueError("SERPER_API_KEY not found in environment variables")
             
-        self.base_url = "https://google.serper.dev/search"
-        self._cache = {}
-        self._cache_expiry = {}
+        self.base_url = Config.api_config.serper_base_url
+        self.cache = get_cache("serper")
         self.cache_duration = timedelta(minutes=30)
         
+    @tracing.traced("tool.serper.search")
     def search(self, query: str, num_results: int = 5) -> List[Dict]:
         """Perform unrestricted search for maximum information retrieval"""
-        cache_key = f"{query}_{num_results}"
+        # One entry per normalized query holds every result fetched, any smaller num_results is a slice of it
+        cache_key = normalize_query(query)
         
-        if self._is_cache_valid(cache_key):
-            return self._cache[cache_key]
+        cached = self.cache.get(cache_key, valid=lambda entry: isinstance(entry, dict) and entry["num"] >= num_results)
+        tracing.annotate(num_results=num_results, cache_hit=cached is not None)
+        if cached is not None:
+            return cached["results"][:num_results]
             
+        fetch_num = min(num_results * 3, self.MAX_RESULTS)  # Increased for more diversity
         try:
+            cancellation.checkpoint()
             response = requests.post(
                 self.base_url,
                 headers={'X-API-KEY': self.api_key, 'Content-Type': 'application/json'},
-                json={'q': query, 'num': num_results * 3}  # Increased for more diversity
+                json={'q': query, 'num': fetch_num},
+                timeout=deadline.cap(Config.api_config.timeout)
             )
             response.raise_for_status()
             results = response.json().get('organic', [])
@@ -36,21 +71,15 @@ class SerperTool:
                 'snippet': result['snippet'],
                 'link': result['link'],
                 'date': self._extract_date(result)
-            } for result in results[:num_results]]
+            } for result in results]
             
-            self._cache[cache_key] = processed_results
-            self._cache_expiry[cache_key] = datetime.now() + self.cache_duration
-            return processed_results
+            self.cache.set(cache_key, {"num": fetch_num, "results": processed_results},
+                           self.cache_duration.total_seconds())
+            return processed_results[:num_results]
             
         except Exception as e:
             raise Exception(f"Error fetching search results: {str(e)}")
             
-    def _is_cache_valid(self, key: str) -> bool:
-        """Check if cached data is still valid"""
-        if key in self._cache and key in self._cache_expiry:
-            return datetime.now() < self._cache_expiry[key]
-        return False
-        
     def _extract_date(self, result: Dict) -> str:
         """Extract and format date from result"""
         # Try to get date from result metadata
@@ -58,4 +87,140 @@ class SerperTool:
             return result['date']
             
         # Default to current date if not found
-        return datetime.now().strftime("%Y-%m-%d") 
\ No newline at end of file
+        return datetime.now().strftime("%Y-%m-%d") 
+
+class PageEnricher:
+    """Fetches the top result pages concurrently and attaches their main text, within a time budget"""
+
+    # Elements that never hold article text
+    BOILERPLATE = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg"]
+    # Pages that failed or were not HTML are skipped for this long instead of refetched every query
+    FAILED_TTL = 300
+
+    def __init__(self):
+        self.settings = Config.web_enrich_config
+        self.cache = get_cache("pages")
+
+    @tracing.traced("tool.web.enrich")
+    async def enrich(self, query: str, results: List[Dict]) -> List[Dict]:
+        """Copy of results where the top pages carry a 'content' passage; slow or failed pages keep only the snippet"""
+        cancellation.checkpoint()
+        results = [dict(result) for result in results]
+        targets = [result for result in results[:self.settings.pages] if result.get("link")]
+        fetches = {}
+        cache_hits = 0
+        for result in targets:
+            cached = self.cache.get(result["link"])
+            if cached is not None:
+                cache_hits += 1
+                if cached:
+                    result["content"] = select_passages(cached, query, self.settings.max_chars)
+            else:
+                fetches[asyncio.create_task(self._fetch_text(result["link"]))] = result
+
+        timed_out = 0
+        if fetches:
+            try:
+                done, pending = await asyncio.wait(fetches, timeout=deadline.cap(self.settings.total_timeout))
+            finally:
+                # Also when the query is stopped or its agent stage cut off, so no fetch outlives it
+                for task in fetches:
+                    if not task.done():
+                        task.cancel()
+            timed_out = len(pending)
+            for task in done:
+                text = task.result() if not task.exception() else None
+                if text:
+                    fetches[task]["content"] = select_passages(text, query, self.settings.max_chars)
+        tracing.annotate(pages=len(targets), cache_hits=cache_hits, fetched=len(fetches), timed_out=timed_out)
+        return results
+
+    async def _fetch_text(self, url: str) -> Optional[str]:
+        """Download one page within the per-page budget and extract its main text"""
+        import aiohttp
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.settings.page_timeout)
+            async with _http_session().get(url, timeout=timeout, allow_redirects=True) as response:
+                if response.status != 200 or "html" not in response.headers.get("Content-Type", ""):
+                    self.cache.set(url, "", self.FAILED_TTL)
+                    return None
+                body = await response.content.read(self.settings.max_bytes)
+                charset = response.charset or "utf-8"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error fetching {url}: {str(e) or type(e).__name__}")
+            self.cache.set(url, "", self.FAILED_TTL)
+            return None
+        try:
+            html = body.decode(charset, errors="replace")
+        except LookupError:
+            html = body.decode("utf-8", errors="replace")
+        # Parsing is CPU bound, keep it off the event loop
+        text = await asyncio.to_thread(extract_main_text, html)
+        self.cache.set(url, text, self.settings.cache_ttl if text else self.FAILED_TTL)
+        return text
+
+    def enrich_sync(self, query: str, results: List[Dict]) -> List[Dict]:
+        """enrich() for callers without an event loop"""
+        async def run():
+            try:
+                return await self.enrich(query, results)
+            finally:
+                await close_http_session()
+        return asyncio.run(run())
+
+
+# One pooled client per event loop, shared by every chat session's enricher
+_http_sessions = weakref.WeakKeyDictionary()
+
+
+def _http_session():
+    import aiohttp
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, limit_per_host=4, ttl_dns_cache=300),
+            headers={"User-Agent": "Mozilla/5.0 (compatible; ExpertAgent/1.0)"}
+        )
+        _http_sessions[loop] = session
+    return session
+
+
+async def close_http_session():
+    session = _http_sessions.pop(asyncio.get_running_loop(), None)
+    if session and not session.closed:
+        await session.close()
+
+
+def extract_main_text(html: str, min_chars: int = 40) -> str:
+    """Paragraph text of the page's article/main element (or body), boilerplate removed"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(PageEnricher.BOILERPLATE):
+        tag.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    blocks = []
+    for element in root.find_all(["h1", "h2", "h3", "p", "li", "td"]):
+        text = " ".join(element.get_text(" ", strip=True).split())
+        # Short fragments are menus, bylines and buttons
+        if len(text) >= min_chars or (element.name in ("h1", "h2", "h3") and text):
+            blocks.append(text)
+    return "\n".join(dict.fromkeys(blocks))
+
+
+def select_passages(text: str, query: str, max_chars: int) -> str:
+    """Paragraphs sharing the most words with the query, kept in page order, up to max_chars"""
+    terms = {word for word in re.findall(r"[a-z0-9]+", query.lower()) if len(word) > 2}
+    paragraphs = [p for p in text.split("\n") if p]
+    ranked = sorted(
+        range(len(paragraphs)),
+        key=lambda i: (-len(terms & set(re.findall(r"[a-z0-9]+", paragraphs[i].lower()))), i)
+    )
+    chosen, used = [], 0
+    for i in ranked:
+        if used >= max_chars:
+            break
+        passage = paragraphs[i][:max_chars - used]
+        chosen.append((i, passage))
+        used += len(passage) + 1
+    return "\n".join(passage for _, passage in sorted(chosen))
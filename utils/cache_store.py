@@ -0,0 +1,168 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils.config import Config
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class MemoryCache:
+    """In-process TTL cache with LRU eviction past max_entries (one copy per worker)"""
+
+    def __init__(self, namespace: str, max_entries: int = 1000):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """Cached value, or None if missing, expired or rejected by `valid`"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] <= time.time():
+                del self._data[key]
+                entry = None
+            if entry is None or (valid and not valid(entry[1])):
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    """TTL cache in a local SQLite file shared by every worker process on the host, LRU-trimmed"""
+
+    # Expired rows are purged and the namespace trimmed to max_entries every PURGE_EVERY writes,
+    # or more often for small caches so they overshoot max_entries by at most ~10%
+    PURGE_EVERY = 200
+
+    def __init__(self, namespace: str, path: str, max_entries: int = 1000):
+        self.namespace = namespace
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._writes = 0
+        self._purge_every = max(1, min(self.PURGE_EVERY, max_entries // 10))
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT, key TEXT, value TEXT, expires_at REAL, used_at REAL DEFAULT 0, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+            if "used_at" not in columns:
+                # Cache files written before LRU trimming
+                conn.execute("ALTER TABLE cache ADD COLUMN used_at REAL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared across threads, tools call us from to_thread workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """Cached value, or None if missing, expired or rejected by `valid`"""
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, now)
+        ).fetchone()
+        value = json.loads(row[0]) if row else None
+        if value is None or (valid and not valid(value)):
+            self.stats.misses += 1
+            return None
+        with conn:
+            conn.execute("UPDATE cache SET used_at = ? WHERE namespace = ? AND key = ?", (now, self.namespace, key))
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now + ttl, now)
+            )
+            self._writes += 1
+            if self._writes % self._purge_every == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+                evicted = conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key NOT IN ("
+                    "SELECT key FROM cache WHERE namespace = ? ORDER BY used_at DESC LIMIT ?)",
+                    (self.namespace, self.namespace, self.max_entries)
+                ).rowcount
+                self.stats.evictions += evicted
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str):
+    """Process-wide cache for a tool, backed by memory or the shared SQLite file per Config.cache_config"""
+    settings = Config.cache_config
+    if settings.backend not in ("sqlite", "memory"):
+        raise ValueError(f"Unknown cache backend: {settings.backend}")
+    key = (settings.backend, settings.path, namespace)
+    with _caches_lock:
+        if key not in _caches:
+            if settings.backend == "sqlite":
+                _caches[key] = SQLiteCache(namespace, settings.path, settings.max_entries)
+            else:
+                _caches[key] = MemoryCache(namespace, settings.max_entries)
+        return _caches[key]
+
+
+def cache_stats() -> Dict[str, CacheStats]:
+    """Hit/miss/eviction counters of this process's caches by namespace"""
+    with _caches_lock:
+        return {cache.namespace: cache.stats for cache in _caches.values()}
+
+
+def format_cache_stats() -> str:
+    lines = [f"{'cache':<14} {'hits':>6} {'misses':>6} {'hit rate':>8} {'evicted':>7}"]
+    for namespace, stats in sorted(cache_stats().items()):
+        lines.append(f"{namespace:<14} {stats.hits:>6} {stats.misses:>6} {stats.hit_rate:>8.0%} {stats.evictions:>7}")
+    return "\n".join(lines)
@@ -1,12 +1,38 @@
-from langchain.callbacks.base import BaseCallbackHandler
-import sys
+from typing import List
+import time
+from utils.config import Config
 
-class StreamingHandler(BaseCallbackHandler):
-    def __init__(self):
-        self.text = ""
-        
-    def on_llm_new_token(self, token: str, **kwargs) -> None:
-        """Stream tokens to stdout as they're generated"""
-        sys.stdout.write(token)
-        sys.stdout.flush()
-        self.text += token 
\ No newline at end of file
+class TokenBuffer:
+    """Accumulates streamed tokens in O(n) and batches them into flushes"""
+    def __init__(self, flush_interval: float = None, flush_tokens: int = None):
+        self.flush_interval = flush_interval if flush_interval is not None else Config.stream_config.flush_interval
+        self.flush_tokens = flush_tokens if flush_tokens is not None else Config.stream_config.flush_tokens
+        self._chunks: List[str] = []
+        self._pending: List[str] = []
+        self._last_flush = time.monotonic()
+        
+    def append(self, token: str) -> bool:
+        """Add a token; returns True when the pending tokens should be flushed"""
+        self._chunks.append(token)
+        self._pending.append(token)
+        return (
+            len(self._pending) >= self.flush_tokens
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+        
+    def drain(self) -> str:
+        """Take the tokens accumulated since the last flush"""
+        pending = "".join(self._pending)
+        self._pending = []
+        self._last_flush = time.monotonic()
+        return pending
+        
+    @property
+    def text(self) -> str:
+        """Everything streamed so far"""
+        return "".join(self._chunks)
+        
+    def clear(self):
+        self._chunks = []
+        self._pending = []
+        self._last_flush = time.monotonic()
@@ -0,0 +1,121 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+import asyncio
+import threading
+import time
+from utils.metrics import cancel_metrics
+
+T = TypeVar("T")
+
+# Token of the query the current task or worker thread is working on (asyncio.to_thread copies it)
+_current_token: ContextVar[Optional["CancelToken"]] = ContextVar("cancel_token", default=None)
+
+
+class QueryCancelled(asyncio.CancelledError):
+    """Raised at a checkpoint once the query was cancelled; a CancelledError so `except Exception` lets it through"""
+
+
+class CancelToken:
+    """Cancellation flag for one query, shared by its coroutines and the worker threads they start"""
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self.cancelled_at: Optional[float] = None
+        # Work cut short after cancel(), by kind (llm, tool, agent)
+        self.interrupted: Dict[str, int] = {}
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel once; returns False if already cancelled. Safe to call from any thread"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self.cancelled_at = time.perf_counter()
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in cancel callback: {str(e)}")
+        return True
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run callback on cancel (now if already cancelled); returns a function that unregisters it"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def note(self, kind: str) -> None:
+        with self._lock:
+            self.interrupted[kind] = self.interrupted.get(kind, 0) + 1
+
+    def raise_if_cancelled(self, kind: str = "tool") -> None:
+        if self._event.is_set():
+            self.note(kind)
+            raise QueryCancelled(self.reason)
+
+    async def guard(self, awaitable: Awaitable[T]) -> T:
+        """Await in a child task that is cancelled the moment this token is"""
+        task = asyncio.ensure_future(awaitable)
+        loop = asyncio.get_running_loop()
+        remove = self.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # Our own task being cancelled (Chainlit stop) is re-raised as is
+            if self.cancelled and not asyncio.current_task().cancelling():
+                raise QueryCancelled(self.reason)
+            raise
+        finally:
+            remove()
+
+
+def current() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+def checkpoint(kind: str = "tool") -> None:
+    """Raise QueryCancelled if the current query was cancelled; call before starting costly work"""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled(kind)
+
+
+def note(kind: str) -> None:
+    """Count a unit of work cut short by the current query's cancellation"""
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        token.note(kind)
+
+
+@contextmanager
+def scope(token: CancelToken):
+    """Make token the current one for this block and the tasks and threads it starts"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def record(token: CancelToken) -> None:
+    """Add a finished, cancelled query to cancel_metrics"""
+    release = time.perf_counter() - token.cancelled_at if token.cancelled_at else 0.0
+    cancel_metrics.record(token.reason or "cancelled", release, token.interrupted)
@@ -1,10 +1,36 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+MODEL_ROLES = ("router", "pdf", "web", "finance", "synthesizer", "light_synthesizer")
+
+@dataclass
+class RoleModelConfig:
+    """Model override for one role; unset fields fall back to ModelConfig"""
+    provider: Optional[str] = None
+    model_name: Optional[str] = None
+    max_tokens: Optional[int] = None
+
+# Routing plans are compact JSON, cap them so they stay fast to generate
+ROLE_DEFAULT_MAX_TOKENS = {"router": 256}
+
+def _roles_from_env() -> Dict[str, RoleModelConfig]:
+    """Read per-role overrides such as ROUTER_PROVIDER=ollama ROUTER_MODEL=llama3.2"""
+    roles = {}
+    for role in MODEL_ROLES:
+        prefix = role.upper()
+        max_tokens = os.getenv(f"{prefix}_MAX_TOKENS")
+        roles[role] = RoleModelConfig(
+            provider=os.getenv(f"{prefix}_PROVIDER"),
+            model_name=os.getenv(f"{prefix}_MODEL"),
+            max_tokens=int(max_tokens) if max_tokens else ROLE_DEFAULT_MAX_TOKENS.get(role)
+        )
+    return roles
+
 @dataclass
 class ModelConfig:
     model_name: str = "llama3.2"
@@ -18,22 +44,213 @@ class ModelConfig:
     anthropic_api_key: str = os.getenv("ANTHROPIC_API_KEY")
     anthropic_model_name: str = "claude-3-5-sonnet-20241022"
 
+    ollama_model_name: str = "llama3.2"
+
+    # Per-role overrides: router, pdf, web, finance, synthesizer
+    roles: Dict[str, RoleModelConfig] = field(default_factory=_roles_from_env)
+
     local_display_name: str = "Local (Ollama LLaMA 3.2)"
     groq_display_name: str = "Groq (Mixtral 8x7B)"
     anthropic_display_name: str = "Anthropic (Claude 3.5 Sonnet)"
 
+    def for_role(self, role: str) -> RoleModelConfig:
+        """Resolve provider, model and token cap for a role"""
+        override = self.roles.get(role) or RoleModelConfig()
+        provider = override.provider or self.provider
+        return RoleModelConfig(
+            provider=provider,
+            model_name=override.model_name or self._default_model(provider),
+            max_tokens=override.max_tokens
+        )
+
+    def for_provider(self, role: str, provider: str) -> RoleModelConfig:
+        """Role settings on a failover provider; the role's model override only applies to its own provider"""
+        settings = self.for_role(role)
+        if provider == settings.provider:
+            return settings
+        return RoleModelConfig(provider=provider, model_name=self._default_model(provider), max_tokens=settings.max_tokens)
+
+    def has_credentials(self, provider: str) -> bool:
+        if provider == "anthropic":
+            return bool(self.anthropic_api_key)
+        if provider == "groq":
+            return bool(self.groq_api_key)
+        return provider == "ollama"
+
+    def _default_model(self, provider: str) -> str:
+        if provider == "anthropic":
+            return self.anthropic_model_name
+        if provider == "groq":
+            return self.groq_model_name
+        # model_name tracks the globally selected model, only trust it for ollama
+        return self.model_name if self.provider == "ollama" else self.ollama_model_name
+
+def _provider_list(value: str):
+    return [provider.strip().lower() for provider in value.split(",") if provider.strip()]
+
+@dataclass
+class FailoverConfig:
+    # Providers tried after a role's own one fails or has its circuit open, e.g. anthropic,groq,ollama
+    providers: List[str] = field(default_factory=lambda: _provider_list(os.getenv("LLM_FAILOVER", "")))
+    # Consecutive failures that open a provider's circuit, and seconds before it is tried again
+    breaker_failures: int = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+    breaker_cooldown: float = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+    # Start the next provider when the first has not streamed a token within its p95 time to first token
+    hedge: bool = os.getenv("LLM_HEDGE", "false").lower() == "true"
+    # Hedge delay until a provider has hedge_min_samples TTFTs on record, and the floor after that
+    hedge_delay: float = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "2.0"))
+    hedge_min_delay: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.3"))
+    hedge_min_samples: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+@dataclass
+class SynthesisConfig:
+    # When routing picks one agent:
+    #   synthesize - always run the full SYNTHESIS_PROMPT pass (default, the answer every deployment had before)
+    #   direct     - stream the agent's answer as the final answer
+    #   auto       - direct, or a short LIGHT_SYNTHESIS_PROMPT pass for follow-ups
+    single_agent_mode: str = os.getenv("SINGLE_AGENT_MODE", "synthesize")
+    # Run agents concurrently and start synthesizing once the first result is in
+    incremental: bool = os.getenv("INCREMENTAL_SYNTHESIS", "false").lower() == "true"
+
+@dataclass
+class DeadlineConfig:
+    # End-to-end latency target per query in seconds; 0 turns deadlines off
+    slo: float = float(os.getenv("QUERY_SLO_SECONDS", "0"))
+    # Share of the SLO for routing, and the share held back for synthesis while agents run
+    routing_share: float = float(os.getenv("DEADLINE_ROUTING_SHARE", "0.15"))
+    synthesis_share: float = float(os.getenv("DEADLINE_SYNTHESIS_SHARE", "0.35"))
+    # Floor for any stage budget, so a late stage still gets a chance to answer
+    min_stage: float = float(os.getenv("DEADLINE_MIN_STAGE_SECONDS", "1.0"))
+    # Provider request timeout and cap on any streamed LLM call, with or without a deadline
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+@dataclass
+class StreamConfig:
+    # Streamed tokens are pushed to the UI/console at most every flush_interval
+    # seconds or every flush_tokens tokens, whichever comes first
+    flush_interval: float = float(os.getenv("STREAM_FLUSH_MS", "50")) / 1000
+    flush_tokens: int = int(os.getenv("STREAM_FLUSH_TOKENS", "32"))
+
+@dataclass
+class ServiceConfig:
+    # Headless HTTP API (expert_chat/api.py); the Chainlit app defaults to Anthropic as well
+    provider: str = os.getenv("SERVICE_PROVIDER", "anthropic")
+    # Queries answered at once, and queries allowed to wait for a slot before new ones get a 503
+    max_concurrent: int = int(os.getenv("SERVICE_MAX_CONCURRENT", "4"))
+    max_waiting: int = int(os.getenv("SERVICE_MAX_WAITING", "16"))
+    wait_timeout: float = float(os.getenv("SERVICE_WAIT_TIMEOUT_SECONDS", "30"))
+    # Stream events buffered per client; a client reading slower than its query produces holds the query back
+    stream_buffer: int = int(os.getenv("SERVICE_STREAM_BUFFER", "256"))
+
+@dataclass
+class PromptConfig:
+    # Mark the static instruction prefix for Anthropic prompt caching
+    cache_static: bool = os.getenv("PROMPT_CACHE", "true").lower() == "true"
+    # Per-item caps when rendering search snippets and history messages into prompts
+    snippet_chars: int = int(os.getenv("PROMPT_SNIPPET_CHARS", "300"))
+    history_chars: int = int(os.getenv("PROMPT_HISTORY_CHARS", "1000"))
+
+@dataclass
+class TracingConfig:
+    # none, otlp (local collector), json (span per line in trace_file) or console
+    exporter: str = os.getenv("TRACE_EXPORTER", "none").lower()
+    trace_file: str = os.getenv("TRACE_FILE", "./traces.jsonl")
+    otlp_endpoint: str = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", "http://localhost:4318/v1/traces")
+    service_name: str = os.getenv("OTEL_SERVICE_NAME", "expert-agent")
+
 @dataclass
 class APIConfig:
     serper_api_key: str = os.getenv("SERPER_API_KEY")
     alpha_vantage_key: str = os.getenv("ALPHA_VANTAGE_API_KEY")
+    # Overridable so benchmarks can point the tools at a local stub server
+    serper_base_url: str = os.getenv("SERPER_BASE_URL", "https://google.serper.dev/search")
+    alpha_vantage_base_url: str = os.getenv("ALPHA_VANTAGE_BASE_URL", "https://www.alphavantage.co/query")
+    # HTTP timeout for Serper and Alpha Vantage requests, shortened to what is left of a query's deadline
+    timeout: float = float(os.getenv("API_TIMEOUT_SECONDS", "10"))
+
+@dataclass
+class WebEnrichConfig:
+    # Fetch the top result pages and pass extracted passages to the web agent along with the snippets
+    enabled: bool = os.getenv("WEB_ENRICH", "false").lower() == "true"
+    pages: int = int(os.getenv("WEB_ENRICH_PAGES", "3"))
+    page_timeout: float = float(os.getenv("WEB_ENRICH_PAGE_TIMEOUT", "2.0"))
+    total_timeout: float = float(os.getenv("WEB_ENRICH_TOTAL_TIMEOUT", "3.0"))
+    max_chars: int = int(os.getenv("WEB_ENRICH_CHARS", "1200"))
+    max_bytes: int = int(os.getenv("WEB_ENRICH_MAX_BYTES", "1000000"))
+    cache_ttl: int = int(os.getenv("WEB_ENRICH_CACHE_TTL", "3600"))
+
+@dataclass
+class RAGConfig:
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # mps on Apple silicon, cpu or cuda elsewhere
+    embedding_device: str = os.getenv("EMBEDDING_DEVICE", "mps")
+    # Retrieval: "mmr" (diverse) or "similarity"; tune with bench/rag_bench.py
+    search_type: str = os.getenv("RAG_SEARCH_TYPE", "mmr")
+    k: int = int(os.getenv("RAG_K", "5"))
+    fetch_k: int = int(os.getenv("RAG_FETCH_K", "15"))
+    lambda_mult: float = float(os.getenv("RAG_LAMBDA_MULT", "0.7"))
+    # Index build: drop chunks with at least dedup_threshold of their word shingles already in similar kept chunks
+    dedup: bool = os.getenv("INDEX_DEDUP", "true").lower() == "true"
+    dedup_threshold: float = float(os.getenv("INDEX_DEDUP_THRESHOLD", "0.8"))
+    dedup_shingle_words: int = int(os.getenv("INDEX_DEDUP_SHINGLE_WORDS", "5"))
+
+@dataclass
+class CacheConfig:
+    # memory (per process) or sqlite (one file shared by all workers on the host)
+    backend: str = os.getenv("CACHE_BACKEND", "memory")
+    path: str = os.getenv("CACHE_DB", "./data/cache/tools.sqlite3")
+    # Entries per cache namespace; least recently used ones are evicted past this
+    max_entries: int = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+
+@dataclass
+class PriceHistoryConfig:
+    # Daily bars (TIME_SERIES_DAILY) stored per symbol and summarized as indicators for the finance agent
+    enabled: bool = os.getenv("PRICE_HISTORY", "true").lower() == "true"
+    path: str = os.getenv("PRICE_HISTORY_DIR", "./data/prices")
+    # A symbol's bars are refreshed at most this often; each refresh appends only new days
+    refresh_hours: float = float(os.getenv("PRICE_HISTORY_REFRESH_HOURS", "12"))
+    # compact: last 100 days (free tier), full: entire history (premium)
+    outputsize: str = os.getenv("PRICE_HISTORY_OUTPUTSIZE", "compact")
+    # Trading days of returns used for correlations between the requested symbols
+    correlation_window: int = int(os.getenv("PRICE_HISTORY_CORRELATION_DAYS", "60"))
+
+@dataclass
+class MemoryConfig:
+    # sqlite: chat sessions with an id (Chainlit threads) persist turns and reload them on resume
+    backend: str = os.getenv("MEMORY_BACKEND", "sqlite")
+    path: str = os.getenv("MEMORY_DB", "./data/memory/sessions.sqlite3")
+    # Turns kept verbatim in RAM and prompts; older ones are folded into a rolling summary
+    recent_turns: int = int(os.getenv("MEMORY_RECENT_TURNS", "6"))
+    # Storage bounds per session and agent
+    max_turns: int = int(os.getenv("MEMORY_MAX_TURNS", "100"))
+    max_chars: int = int(os.getenv("MEMORY_TURN_CHARS", "2000"))
+    summary_chars: int = int(os.getenv("MEMORY_SUMMARY_CHARS", "2000"))
+    # Inject only the past turns most relevant to the query (MiniLM embeddings) plus the latest ones
+    retrieval: bool = os.getenv("MEMORY_RETRIEVAL", "false").lower() == "true"
+    retrieval_k: int = int(os.getenv("MEMORY_RETRIEVAL_K", "3"))
+    retrieval_recent: int = int(os.getenv("MEMORY_RETRIEVAL_RECENT", "2"))
 
 @dataclass
 class PathConfig:
     documents_dir: str = "./data/documents"
     processed_dir: str = "./data/processed"
     index_dir: str = "./data/indexes"
+    # Tickers, company names and aliases for FinanceAgent symbol extraction (Alpha Vantage LISTING_STATUS columns)
+    listings_file: str = os.getenv("SYMBOL_LISTINGS", "./data/listings/symbols.csv")
 
 class Config:
     model_config = ModelConfig()
+    failover_config = FailoverConfig()
+    synthesis_config = SynthesisConfig()
+    deadline_config = DeadlineConfig()
+    stream_config = StreamConfig()
+    service_config = ServiceConfig()
+    prompt_config = PromptConfig()
+    tracing_config = TracingConfig()
     api_config = APIConfig()
+    web_enrich_config = WebEnrichConfig()
+    rag_config = RAGConfig()
+    cache_config = CacheConfig()
+    price_history_config = PriceHistoryConfig()
+    memory_config = MemoryConfig()
     path_config = PathConfig() 
\ No newline at end of file
@@ -0,0 +1,148 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Awaitable, List, Optional, TypeVar
+import asyncio
+import time
+from utils.config import Config
+from utils.metrics import deadline_metrics
+from utils import tracing
+
+T = TypeVar("T")
+
+# Time an overrunning stage gets to hand back partial LLM output before it is cancelled
+STAGE_GRACE = 0.25
+
+
+class StageTimeout(Exception):
+    """A stage ran past its budget and was cut off"""
+
+    def __init__(self, stage: str, budget: float):
+        super().__init__(f"{stage} did not finish within its {budget:.1f}s budget")
+        self.stage = stage
+        self.budget = budget
+
+
+@dataclass
+class StageUsage:
+    stage: str
+    budget: float
+    started: float
+    used: float = 0.0
+    overrun: bool = False
+    # An LLM call in the stage returned partial output at the budget
+    truncated: bool = False
+
+    @property
+    def end(self) -> float:
+        return self.started + self.budget
+
+
+class QueryDeadline:
+    """Latency SLO for one query, split into routing, agent and synthesis budgets as it runs"""
+
+    def __init__(self, slo: Optional[float] = None):
+        self.settings = Config.deadline_config
+        self.slo = self.settings.slo if slo is None else slo
+        self.started = time.perf_counter()
+        self.stages: List[StageUsage] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.slo > 0
+
+    def remaining(self) -> float:
+        if not self.enabled:
+            return float("inf")
+        return self.slo - (time.perf_counter() - self.started)
+
+    def budget(self, stage: str, sharing: int = 1) -> Optional[float]:
+        """Seconds for the next stage (routing, agents, synthesis or direct), split between sharing sequential runs"""
+        if not self.enabled:
+            return None
+        remaining = self.remaining()
+        reserve = self.slo * self.settings.synthesis_share
+        if stage == "routing":
+            budget = min(self.slo * self.settings.routing_share, remaining - reserve)
+        elif stage == "agents":
+            budget = remaining - reserve
+        else:
+            # Synthesis (or a direct answer) uses whatever is left, but always gets a minimum to answer in
+            budget = remaining
+        return max(budget / sharing, self.settings.min_stage)
+
+    async def run(self, stage: str, awaitable: Awaitable[T], budget: Optional[float]) -> T:
+        """Await a stage, cutting it off (StageTimeout) once it overruns its budget"""
+        if budget is None:
+            return await awaitable
+        usage = StageUsage(stage, budget, time.perf_counter())
+        self.stages.append(usage)
+        # Tasks and threads started by the stage inherit it, so LLM and HTTP timeouts can be capped to it
+        reset = _current_stage.set(usage)
+        try:
+            return await asyncio.wait_for(awaitable, budget + STAGE_GRACE)
+        except asyncio.TimeoutError:
+            usage.overrun = True
+            print(f"Deadline: {stage} cut off after {budget:.1f}s")
+            raise StageTimeout(stage, budget)
+        finally:
+            usage.used = time.perf_counter() - usage.started
+            _current_stage.reset(reset)
+            tracing.annotate(**{f"budget.{stage}_s": round(budget, 3), f"used.{stage}_s": round(usage.used, 3)})
+
+    def summary(self) -> dict:
+        return {
+            "slo_s": self.slo,
+            "elapsed_s": time.perf_counter() - self.started,
+            "stages": [
+                {"stage": s.stage, "budget_s": s.budget, "used_s": s.used, "overrun": s.overrun, "truncated": s.truncated}
+                for s in self.stages
+            ],
+        }
+
+
+_current_deadline: ContextVar[Optional[QueryDeadline]] = ContextVar("query_deadline", default=None)
+_current_stage: ContextVar[Optional[StageUsage]] = ContextVar("deadline_stage", default=None)
+
+# Stand-in when a query runs without one; every budget is None, so nothing is cut off
+_NO_DEADLINE = QueryDeadline(slo=0)
+
+
+def current() -> QueryDeadline:
+    return _current_deadline.get() or _NO_DEADLINE
+
+
+def cap(seconds: Optional[float]) -> Optional[float]:
+    """Timeout for a call starting now: seconds, shortened to what is left of the current stage"""
+    stage = _current_stage.get()
+    if stage is None:
+        return seconds
+    left = max(stage.end - time.perf_counter(), 0.05)
+    return left if seconds is None else min(seconds, left)
+
+
+def truncated() -> None:
+    """Note that an LLM call in the current stage was cut short at the budget"""
+    stage = _current_stage.get()
+    if stage is not None:
+        stage.truncated = True
+
+
+@contextmanager
+def scope(deadline: QueryDeadline):
+    """Make deadline the current one for this block and the tasks and threads it starts"""
+    reset = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(reset)
+
+
+def record(deadline: QueryDeadline) -> None:
+    """Add a finished query's stage budgets and usage to deadline_metrics"""
+    if deadline.enabled:
+        deadline_metrics.record(
+            time.perf_counter() - deadline.started,
+            deadline.slo,
+            [(s.stage, s.budget, s.used, s.overrun or s.truncated) for s in deadline.stages],
+        )
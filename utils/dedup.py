@@ -0,0 +1,108 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import re
+import zlib
+import numpy as np
+
+# MinHash permutations h(x) = (a * x + b) mod p; p is a Mersenne prime so a * x fits in uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text: str, size: int) -> frozenset:
+    """Hashed word n-grams of normalized text (case and punctuation ignored)"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return frozenset([zlib.crc32(" ".join(words).encode())]) if words else frozenset()
+    return frozenset(zlib.crc32(" ".join(words[i:i + size]).encode()) for i in range(len(words) - size + 1))
+
+
+def lsh_bands(num_perm: int, similarity: float) -> Tuple[int, int]:
+    """(bands, rows) with the highest LSH candidate threshold (1/bands)^(1/rows) at or under similarity"""
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= similarity] or options[:1]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1]))
+
+
+class MinHasher:
+    """MinHash signatures over hashed shingles; similar sets agree on a share of positions close to their Jaccard"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+
+    def signature(self, hashed: frozenset) -> np.ndarray:
+        values = np.fromiter(hashed, dtype=np.uint64, count=len(hashed)) % _PRIME
+        return ((self.a[:, None] * values[None, :] + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+@dataclass
+class DedupResult:
+    keep: List[int]
+    # Dropped chunk -> (kept chunk sharing the most of its text, share of its shingles already kept)
+    duplicates: Dict[int, Tuple[int, float]] = field(default_factory=dict)
+
+
+def find_near_duplicates(texts: List[str], threshold: float = 0.8, shingle_size: int = 5,
+                         num_perm: int = 128, documents: Optional[List[str]] = None) -> DedupResult:
+    """Drop chunks whose shingles are at least `threshold` covered by earlier kept chunks that resemble them
+
+    Coverage rather than pairwise Jaccard, because a re-extracted copy of a document chunks at different
+    offsets: each of its chunks is split across two overlapping chunks of the original. LSH (tuned to find
+    pairs sharing about half their shingles) picks the candidates, exact shingle sets decide. With
+    `documents` (each chunk's document, chunks in order), the splitter's overlap with the previous chunk of
+    the same document does not count.
+    """
+    bands, rows = lsh_bands(num_perm, threshold / 2)
+    hasher = MinHasher(num_perm)
+    buckets = defaultdict(list)  # (band, band signature) -> kept chunks
+    kept_shingles: Dict[int, frozenset] = {}
+    result = DedupResult(keep=[])
+
+    for i, text in enumerate(texts):
+        chunk_shingles = shingles(text, shingle_size)
+        if not chunk_shingles:
+            result.keep.append(i)
+            continue
+        signature = hasher.signature(chunk_shingles)
+        keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+
+        # Compared only with kept chunks, so a chain of small edits never drifts far from what stays
+        covered = set()
+        best: Optional[Tuple[int, int]] = None
+        candidates = {j for key in keys for j in buckets.get(key, ())}
+        if documents and i > 0 and documents[i - 1] == documents[i]:
+            candidates.discard(i - 1)
+        for j in candidates:
+            shared = chunk_shingles & kept_shingles[j]
+            covered |= shared
+            if shared and (best is None or len(shared) > best[1] or (len(shared) == best[1] and j < best[0])):
+                best = (j, len(shared))
+        coverage = len(covered) / len(chunk_shingles)
+        if best and coverage >= threshold:
+            result.duplicates[i] = (best[0], coverage)
+            continue
+
+        result.keep.append(i)
+        kept_shingles[i] = chunk_shingles
+        for key in keys:
+            buckets[key].append(i)
+    return result
+
+
+def dedup_report(texts: List[str], sources: List[str], result: DedupResult) -> dict:
+    """How much deduplication removed, per source and per pair of sources"""
+    removed_chars = sum(len(texts[i]) for i in result.duplicates)
+    total_chars = sum(len(text) for text in texts)
+    pairs = Counter(f"{sources[i]} -> {sources[j]}" for i, (j, _) in result.duplicates.items())
+    return {
+        "chunks_before": len(texts),
+        "chunks_after": len(result.keep),
+        "chunks_removed": len(result.duplicates),
+        "chars_removed": removed_chars,
+        "share_removed": round(removed_chars / total_chars, 4) if total_chars else 0.0,
+        "removed_by_source": dict(Counter(sources[i] for i in result.duplicates).most_common()),
+        "duplicate_of": dict(pairs.most_common()),
+    }
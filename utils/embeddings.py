@@ -0,0 +1,18 @@
+import threading
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(model_name: str, device: str):
+    """Process-wide HuggingFaceEmbeddings per model and device, shared by RAG and memory retrieval"""
+    key = (model_name, device)
+    with _embeddings_lock:
+        if key not in _embeddings:
+            # torch/transformers are only imported once embeddings are actually needed
+            from langchain_huggingface import HuggingFaceEmbeddings
+            _embeddings[key] = HuggingFaceEmbeddings(
+                model_name=model_name,
+                model_kwargs={'device': device}
+            )
+        return _embeddings[key]
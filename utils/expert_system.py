@@ -2,18 +2,24 @@ from agents.meta_agent import MetaAgent
 from agents.pdf_agent import PDFAgent
 from agents.finance_agent import FinanceAgent
 from agents.web_agent import WebAgent
+import asyncio
 import json
-from utils.callbacks import StreamingHandler
-import chainlit as cl
+from typing import Optional
+from utils.streaming import ConsoleDispatcher, StreamDispatcher, StreamMultiplexer
+from utils.cancellation import CancelToken, QueryCancelled
+from utils.deadline import QueryDeadline
+from utils import cancellation, deadline, session, tracing
 
 class ExpertSystem:
-    def __init__(self, callbacks=None):
+    def __init__(self, dispatcher: Optional[StreamDispatcher] = None):
         print("Loading Expert System...")
-        # Initialize streaming handler if not provided
-        self.streaming_handler = callbacks[0] if callbacks else StreamingHandler()
+        tracing.configure_tracing()
+        # Session dispatcher renders the tagged stream of every agent invocation
+        self.dispatcher = dispatcher or ConsoleDispatcher()
+        self.stream = StreamMultiplexer()
         
         # Initialize meta agent with streaming
-        self.meta_agent = MetaAgent(callbacks=[self.streaming_handler])
+        self.meta_agent = MetaAgent(stream=self.stream)
         
         # Initialize and register available agents
         self._initialize_agents()
@@ -21,33 +27,63 @@ class ExpertSystem:
     def _initialize_agents(self):
         """Initialize and register all available agents"""
         print("Initializing PDF agent...")
-        pdf_agent = PDFAgent(callbacks=[self.streaming_handler])
+        pdf_agent = PDFAgent(stream=self.stream)
         print("Initializing Finance agent...")
-        finance_agent = FinanceAgent(callbacks=[self.streaming_handler])
+        finance_agent = FinanceAgent(stream=self.stream)
         print("Initializing Web agent...")
-        web_agent = WebAgent(callbacks=[self.streaming_handler])
+        web_agent = WebAgent(stream=self.stream)
         
         # Register all agents
         self.meta_agent.registry.register("pdf", pdf_agent)
         self.meta_agent.registry.register("finance", finance_agent)
         self.meta_agent.registry.register("web", web_agent)
         
-    async def process_query(self, query: str) -> str:
-        """Process a query through the meta agent"""
+    async def warm_up(self):
+        """Load heavy resources (embedding model, FAISS index) off the startup path"""
+        try:
+            pdf_agent = self.meta_agent.registry.get_agent("pdf")
+            if pdf_agent:
+                await asyncio.to_thread(pdf_agent.pdf_tool.warm_up)
+        except Exception as e:
+            print(f"Error during warm-up: {str(e)}")
+        
+    async def process_query(self, query: str, cancel_token: Optional[CancelToken] = None,
+                            query_deadline: Optional[QueryDeadline] = None) -> str:
+        """Process a query through the meta agent; cancelling cancel_token stops all of its work"""
+        token = cancel_token or CancelToken()
+        # Started here unless the caller started it before analyze_workflow, so routing counts too
+        query_deadline = query_deadline or QueryDeadline()
         try:
             # Get memory manager from session within Chainlit context
-            memory_manager = cl.user_session.get("memory_manager")
+            memory_manager = session.get("memory_manager")
             if not memory_manager:
                 print("Warning: No memory manager found in session")
             
-            # Process query but let streaming handle output
-            await self.meta_agent.process(query)
+            # Process query but let streaming handle output; each query's events go to its own dispatcher
+            with cancellation.scope(token), deadline.scope(query_deadline):
+                async with self.stream.request(self.dispatcher) as request_id:
+                    with tracing.span("query", query=query[:200], request_id=request_id):
+                        try:
+                            await token.guard(self.meta_agent.process(query))
+                        except asyncio.CancelledError:
+                            # Stopped by the token or by cancelling this task; threads see the token at checkpoints
+                            token.cancel("task cancelled")
+                            tracing.annotate(cancelled=True, cancel_reason=token.reason)
+                            raise
             return ""  # Return empty string to let streaming handle display
             
+        except QueryCancelled:
+            print(f"Query cancelled ({token.reason})")
+            return ""
         except Exception as e:
             error_msg = str(e)
             print(f"Error in process_query: {error_msg}")
             return self._format_error(error_msg)
+        finally:
+            if token.cancelled:
+                cancellation.record(token)
+            else:
+                deadline.record(query_deadline)
             
     def _format_error(self, error_msg: str) -> str:
         """Format error messages"""
@@ -58,30 +94,39 @@ class ExpertSystem:
             }
         }, indent=2) 
         
-    async def analyze_workflow(self, query: str) -> str:
+    async def analyze_workflow(self, query: str, cancel_token: Optional[CancelToken] = None,
+                               query_deadline: Optional[QueryDeadline] = None) -> str:
         """Analyze query and return formatted workflow plan"""
         try:
             # Get memory manager from session within Chainlit context
-            memory_manager = cl.user_session.get("memory_manager")
+            memory_manager = session.get("memory_manager")
             if not memory_manager:
                 print("Warning: No memory manager found in session")
             
-            # Get workflow from meta agent
-            workflow = self.meta_agent._analyze_workflow(query)
+            # Get validated routing plan from meta agent (reused by process_query)
+            token = cancel_token or CancelToken()
+            with cancellation.scope(token), deadline.scope(query_deadline or QueryDeadline()), \
+                    tracing.span("query.analyze", query=query[:200]):
+                plan = await token.guard(self.meta_agent._aplan_workflow(query))
             
             # Format for display
-            workflow_str = """Type: ANALYSIS
-Complexity: ADVANCED
+            workflow_str = f"""Type: {plan['query_type']}
+Complexity: {plan['complexity']}
 
 Planned Steps:"""
             
-            for step in workflow:
+            for step in plan["workflow"]:
                 workflow_str += f"\n• {step['agent'].title()} Agent → {step['reason']}"
             
-            workflow_str += "\n\nStrategy:\nThis query requires comprehensive analysis using specialized agents."
+            if plan.get("fallback"):
+                workflow_str += f"\n\n⚠️ {plan['reason']}"
+            else:
+                workflow_str += f"\n\nStrategy:\n{plan['reason']}"
             
             return workflow_str
             
+        except QueryCancelled:
+            return "Query cancelled"
         except Exception as e:
             print(f"Error in analyze_workflow: {str(e)}")
             return f"Error analyzing workflow: {str(e)}" 
\ No newline at end of file
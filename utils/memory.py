@@ -1,42 +1,75 @@
 from langchain.memory import ConversationBufferMemory
-from typing import Dict, Any
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from typing import Dict, Any, List, Optional
+from utils import tracing
+from utils.config import Config
+from utils.embeddings import get_embeddings
+from utils.memory_index import TurnIndex, embed_query
+from utils.memory_store import get_memory_store
+
+# Prompt variable each agent's history is exposed under
+HISTORY_KEYS = {
+    "meta": "chat_history",
+    "web": "web_history",
+    "finance": "finance_history",
+    "pdf": "pdf_history"
+}
 
 class AgentMemoryManager:
-    def __init__(self):
-        self.memories = {
-            "meta": ConversationBufferMemory(
-                return_messages=True,
-                memory_key="chat_history",
-                output_key="output"
-            ),
-            "web": ConversationBufferMemory(
-                return_messages=True,
-                memory_key="web_history",
-                output_key="output"
-            ),
-            "finance": ConversationBufferMemory(
-                return_messages=True,
-                memory_key="finance_history",
-                output_key="output"
-            ),
-            "pdf": ConversationBufferMemory(
+    def __init__(self, session_id: Optional[str] = None):
+        """Sessions with an id persist turns (Config.memory_config) and load them lazily per agent"""
+        self.session_id = session_id
+        settings = Config.memory_config
+        self.store = None
+        if session_id and settings.backend == "sqlite":
+            self.store = get_memory_store(
+                settings.path,
+                max_turns=settings.max_turns,
+                max_chars=settings.max_chars,
+                summary_chars=settings.summary_chars
+            )
+        self.recent_turns = settings.recent_turns
+        self.memories: Dict[str, ConversationBufferMemory] = {}
+        self.summaries: Dict[str, str] = {}
+        self.indexes: Dict[str, TurnIndex] = {}
+        self._query_vector = (None, None)  # every agent in a query embeds the same text once
+        
+    def _memory(self, agent_name: str) -> Optional[ConversationBufferMemory]:
+        """Buffer for an agent, created (and filled from the store) on first use"""
+        if agent_name not in HISTORY_KEYS:
+            return None
+        memory = self.memories.get(agent_name)
+        if memory is None:
+            memory = ConversationBufferMemory(
                 return_messages=True,
-                memory_key="pdf_history",
+                memory_key=HISTORY_KEYS[agent_name],
                 output_key="output"
             )
-        }
+            if self.store:
+                self.summaries[agent_name] = self.store.summary(self.session_id, agent_name)[0]
+                for turn in self.store.recent_turns(self.session_id, agent_name, self.recent_turns):
+                    memory.chat_memory.add_user_message(turn.query)
+                    memory.chat_memory.add_ai_message(turn.response)
+            self.memories[agent_name] = memory
+        return memory
         
     def get_memory(self, agent_name: str) -> Dict[str, Any]:
         """Get memory for specific agent"""
-        memory = self.memories.get(agent_name)
+        memory = self._memory(agent_name)
         if memory:
-            return memory.load_memory_variables({})
+            variables = memory.load_memory_variables({})
+            summary = self.summaries.get(agent_name)
+            if summary:
+                key = memory.memory_key
+                variables[key] = [SystemMessage(content=f"Summary of earlier conversation:\n{summary}")] + variables[key]
+            return variables
         return {}
         
+    @tracing.traced("memory.save_context")
     def save_context(self, agent_name: str, query: str, response: str):
         """Save context for specific agent"""
         try:
-            memory = self.memories.get(agent_name)
+            memory = self._memory(agent_name)
             if memory:
                 print(f"DEBUG: Saving memory for {agent_name}")
                 print(f"DEBUG: Input: {query[:50]}...")
@@ -45,12 +78,80 @@ class AgentMemoryManager:
                     {"input": query},
                     {"output": response}
                 )
+                if agent_name in self.indexes:
+                    self.indexes[agent_name].add(query, response)
+                if self.store:
+                    self._persist(agent_name, memory, query, response)
             else:
                 print(f"Warning: No memory found for agent {agent_name}")
         except Exception as e:
             print(f"Error saving memory for {agent_name}: {str(e)}")
             
+    def _persist(self, agent_name: str, memory: ConversationBufferMemory, query: str, response: str):
+        """Append the turn; turns leaving the recent window move from RAM into the rolling summary"""
+        seq = self.store.append_turn(self.session_id, agent_name, query, response)
+        if seq > self.recent_turns:
+            self.summaries[agent_name] = self.store.advance_summary(
+                self.session_id, agent_name, seq - self.recent_turns
+            )
+        messages = memory.chat_memory.messages
+        if len(messages) > 2 * self.recent_turns:
+            del messages[:len(messages) - 2 * self.recent_turns]
+            
+    def relevant_history(self, agent_name: str, query: str, k: int, recent: int) -> List[BaseMessage]:
+        """The k past turns closest to the query plus the last `recent` turns, oldest first"""
+        index = self._index(agent_name)
+        if index is None:
+            return []
+        turns = index.search(self._embed_query(index.embeddings, query), k, exclude_last=recent)
+        if recent > 0:
+            turns += index.turns[-recent:]
+        messages = []
+        for past_query, past_response in turns:
+            messages.append(HumanMessage(content=past_query))
+            messages.append(AIMessage(content=past_response))
+        return messages
+        
+    def _index(self, agent_name: str) -> Optional[TurnIndex]:
+        """Turn index for an agent, built on first use from the store (or the in-RAM buffer)"""
+        index = self.indexes.get(agent_name)
+        if index is None:
+            memory = self._memory(agent_name)
+            if memory is None:
+                return None
+            settings = Config.memory_config
+            index = TurnIndex(
+                get_embeddings(Config.rag_config.embedding_model, Config.rag_config.embedding_device),
+                max_turns=settings.max_turns
+            )
+            if self.store:
+                for turn in self.store.turns(self.session_id, agent_name):
+                    index.add(turn.query, turn.response)
+            else:
+                messages = memory.chat_memory.messages
+                for past_query, past_response in zip(messages[::2], messages[1::2]):
+                    index.add(past_query.content, past_response.content)
+            self.indexes[agent_name] = index
+        return index
+        
+    def _embed_query(self, embeddings, query: str):
+        cached_query, vector = self._query_vector
+        if cached_query != query:
+            vector = embed_query(embeddings, query)
+            self._query_vector = (query, vector)
+        return vector
+            
+    def unload(self):
+        """Drop in-RAM buffers for an idle session; persisted turns reload on next use"""
+        self.memories.clear()
+        self.summaries.clear()
+        self.indexes.clear()
+            
     def clear_all(self):
         """Clear all agent memories"""
         for memory in self.memories.values():
-            memory.clear() 
\ No newline at end of file
+            memory.clear()
+        self.summaries.clear()
+        self.indexes.clear()
+        if self.store:
+            self.store.delete_session(self.session_id)
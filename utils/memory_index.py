@@ -0,0 +1,53 @@
+from typing import List, Tuple
+import numpy as np
+
+
+class TurnIndex:
+    """Past turns of one agent with normalized embeddings, searched by brute-force dot product"""
+
+    def __init__(self, embeddings, max_turns: int = 100, embed_chars: int = 500):
+        self.embeddings = embeddings
+        self.max_turns = max_turns
+        self.embed_chars = embed_chars
+        self.turns: List[Tuple[str, str]] = []
+        self.vectors = None  # (embedded turns, dim) float32, rows line up with self.turns
+
+    def add(self, query: str, response: str) -> None:
+        """Queue a turn; it is embedded in a batch on the next search"""
+        self.turns.append((query, response))
+        if len(self.turns) > self.max_turns:
+            drop = len(self.turns) - self.max_turns
+            del self.turns[:drop]
+            if self.vectors is not None:
+                self.vectors = self.vectors[drop:]
+
+    def _embed_pending(self) -> None:
+        done = 0 if self.vectors is None else len(self.vectors)
+        pending = self.turns[done:]
+        if not pending:
+            return
+        texts = [f"{query}\n{response[:self.embed_chars]}" for query, response in pending]
+        vectors = _normalize(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+
+    def search(self, query_vector: np.ndarray, k: int, exclude_last: int = 0) -> List[Tuple[str, str]]:
+        """Top-k turns by cosine similarity, in conversation order, skipping the last exclude_last turns"""
+        candidates = len(self.turns) - exclude_last
+        if k <= 0 or candidates <= 0:
+            return []
+        self._embed_pending()
+        scores = self.vectors[:candidates] @ query_vector
+        if candidates > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(candidates)
+        return [self.turns[i] for i in sorted(top)]
+
+
+def embed_query(embeddings, query: str) -> np.ndarray:
+    return _normalize(np.asarray(embeddings.embed_query(query), dtype=np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,140 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+@dataclass
+class StoredTurn:
+    seq: int
+    query: str
+    response: str
+
+
+class SessionMemoryStore:
+    """Append-only per-turn conversation storage in SQLite with a rolling summary per agent"""
+
+    def __init__(self, path: str, max_turns: int = 100, max_chars: int = 2000, summary_chars: int = 2000):
+        self.path = path
+        self.max_turns = max_turns
+        self.max_chars = max_chars
+        self.summary_chars = summary_chars
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS turns ("
+                "session_id TEXT, agent TEXT, seq INTEGER, query TEXT, response TEXT, created_at REAL, "
+                "PRIMARY KEY (session_id, agent, seq));"
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "session_id TEXT, agent TEXT, summary TEXT, covered_seq INTEGER, "
+                "PRIMARY KEY (session_id, agent));"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; agents save memory from asyncio.to_thread workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def compact(self, text: str) -> str:
+        """Collapse whitespace and cap length so stored turns stay small"""
+        text = re.sub(r"\s+", " ", text or "").strip()
+        return text if len(text) <= self.max_chars else text[:self.max_chars] + "…"
+
+    def append_turn(self, session_id: str, agent: str, query: str, response: str) -> int:
+        """Store one turn and return its sequence number; the oldest turns past max_turns are dropped"""
+        conn = self._connect()
+        with conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM turns WHERE session_id = ? AND agent = ?",
+                (session_id, agent)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO turns (session_id, agent, seq, query, response, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, agent, seq, self.compact(query), self.compact(response), time.time())
+            )
+            conn.execute(
+                "DELETE FROM turns WHERE session_id = ? AND agent = ? AND seq <= ?",
+                (session_id, agent, seq - self.max_turns)
+            )
+        return seq
+
+    def recent_turns(self, session_id: str, agent: str, limit: int) -> List[StoredTurn]:
+        """Last `limit` turns, oldest first"""
+        rows = self._connect().execute(
+            "SELECT seq, query, response FROM turns WHERE session_id = ? AND agent = ? "
+            "ORDER BY seq DESC LIMIT ?",
+            (session_id, agent, limit)
+        ).fetchall()
+        return [StoredTurn(*row) for row in reversed(rows)]
+
+    def turns(self, session_id: str, agent: str) -> List[StoredTurn]:
+        """Every stored turn, oldest first"""
+        rows = self._connect().execute(
+            "SELECT seq, query, response FROM turns WHERE session_id = ? AND agent = ? ORDER BY seq",
+            (session_id, agent)
+        ).fetchall()
+        return [StoredTurn(*row) for row in rows]
+
+    def summary(self, session_id: str, agent: str) -> Tuple[str, int]:
+        """(rolling summary, last sequence number it covers)"""
+        row = self._connect().execute(
+            "SELECT summary, covered_seq FROM summaries WHERE session_id = ? AND agent = ?",
+            (session_id, agent)
+        ).fetchone()
+        return row if row else ("", 0)
+
+    def advance_summary(self, session_id: str, agent: str, upto_seq: int) -> str:
+        """Fold every turn up to upto_seq that the rolling summary does not cover yet"""
+        summary, covered = self.summary(session_id, agent)
+        if upto_seq <= covered:
+            return summary
+        rows = self._connect().execute(
+            "SELECT query, response FROM turns WHERE session_id = ? AND agent = ? AND seq > ? AND seq <= ? ORDER BY seq",
+            (session_id, agent, covered, upto_seq)
+        ).fetchall()
+        for query, response in rows:
+            summary = roll_summary(summary, query, response, self.summary_chars)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (session_id, agent, summary, covered_seq) VALUES (?, ?, ?, ?)",
+                (session_id, agent, summary, upto_seq)
+            )
+        return summary
+
+    def delete_session(self, session_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+
+
+def roll_summary(summary: str, query: str, response: str, max_chars: int) -> str:
+    """Extractive summary: one line per turn (question and the answer's first sentence), oldest dropped first"""
+    first_sentence = re.split(r"(?<=[.!?])\s", response.strip(), maxsplit=1)[0][:200]
+    lines = [line for line in summary.splitlines() if line]
+    lines.append(f"- {query.strip()[:150]} -> {first_sentence}")
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_memory_store(path: str, **limits) -> SessionMemoryStore:
+    """Process-wide store per database file"""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SessionMemoryStore(path, **limits)
+        return _stores[path]
@@ -0,0 +1,282 @@
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Deque, Dict, List, Optional
+
+# Latency samples kept per series; the collectors live as long as the process, so percentiles
+# cover the most recent calls while counts and totals cover all of them
+SAMPLE_WINDOW = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) when the provider reports no usage"""
+    return max(1, len(text) // 4) if text else 0
+
+
+@dataclass
+class RoleStats:
+    calls: int = 0
+    errors: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    # Estimated prompt tokens per section (instructions, history, search results, ...)
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    total_latency: float = 0.0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=SAMPLE_WINDOW))
+    first_token_latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=SAMPLE_WINDOW))
+
+
+class LLMMetrics:
+    """Per-role latency and token counters for tuning the model mix"""
+
+    def __init__(self):
+        self._stats: Dict[str, RoleStats] = {}
+        self._lock = Lock()
+
+    def record(
+        self,
+        role: str,
+        latency: float,
+        input_tokens: int,
+        output_tokens: int,
+        first_token_latency: Optional[float] = None,
+        error: bool = False,
+        cached_tokens: int = 0,
+        sections: Optional[Dict[str, int]] = None
+    ) -> None:
+        """Record one LLM call for a role"""
+        with self._lock:
+            stats = self._stats.setdefault(role, RoleStats())
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.input_tokens += input_tokens
+            stats.cached_tokens += cached_tokens
+            for section, tokens in (sections or {}).items():
+                stats.section_tokens[section] = stats.section_tokens.get(section, 0) + tokens
+            stats.output_tokens += output_tokens
+            stats.total_latency += latency
+            stats.latencies.append(latency)
+            if first_token_latency is not None:
+                stats.first_token_latencies.append(first_token_latency)
+
+    def summary(self) -> Dict[str, dict]:
+        """Aggregate stats per role"""
+        with self._lock:
+            return {role: self._summarize(stats) for role, stats in self._stats.items()}
+
+    def format_summary(self) -> str:
+        """Render the summary as a small text table"""
+        lines = [f"{'role':<18} {'calls':>5} {'p50 s':>7} {'p95 s':>7} {'ttft s':>7} {'in tok':>8} {'out tok':>8} {'tok/s':>7}"]
+        for role, s in sorted(self.summary().items()):
+            lines.append(
+                f"{role:<18} {s['calls']:>5} {s['p50_latency']:>7.2f} {s['p95_latency']:>7.2f} "
+                f"{s['mean_ttft']:>7.2f} {s['input_tokens']:>8} {s['output_tokens']:>8} {s['tokens_per_second']:>7.1f}"
+            )
+        return "\n".join(lines)
+
+    def format_prompt_sections(self) -> str:
+        """Estimated prompt tokens per section for each role, largest first"""
+        lines = []
+        for role, s in sorted(self.summary().items()):
+            total = sum(s["section_tokens"].values())
+            if not total:
+                continue
+            parts = sorted(s["section_tokens"].items(), key=lambda item: item[1], reverse=True)
+            lines.append(f"{role:<18} " + ", ".join(
+                f"{section} {tokens} ({tokens / total:.0%})" for section, tokens in parts
+            ))
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    @staticmethod
+    def _summarize(stats: RoleStats) -> dict:
+        latencies = sorted(stats.latencies)
+        return {
+            "calls": stats.calls,
+            "errors": stats.errors,
+            "input_tokens": stats.input_tokens,
+            "cached_tokens": stats.cached_tokens,
+            "section_tokens": dict(stats.section_tokens),
+            "output_tokens": stats.output_tokens,
+            "p50_latency": _percentile(latencies, 0.50),
+            "p95_latency": _percentile(latencies, 0.95),
+            "mean_ttft": (sum(stats.first_token_latencies) / len(stats.first_token_latencies)
+                          if stats.first_token_latencies else 0.0),
+            "tokens_per_second": stats.output_tokens / stats.total_latency if stats.total_latency else 0.0
+        }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class CancelMetrics:
+    """Cancelled queries: why, how fast their work was released and what was cut short"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def record(self, reason: str, release_seconds: float, interrupted: Dict[str, int]) -> None:
+        with self._lock:
+            self.cancelled += 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            self.release_latencies.append(release_seconds)
+            for kind, count in interrupted.items():
+                self.interrupted[kind] = self.interrupted.get(kind, 0) + count
+
+    def summary(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.release_latencies)
+            return {
+                "cancelled": self.cancelled,
+                "reasons": dict(self.reasons),
+                "interrupted": dict(self.interrupted),
+                "p50_release_ms": _percentile(latencies, 0.50) * 1000,
+                "p95_release_ms": _percentile(latencies, 0.95) * 1000,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.cancelled = 0
+            self.reasons: Dict[str, int] = {}
+            self.interrupted: Dict[str, int] = {}
+            self.release_latencies: Deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+
+class DeadlineMetrics:
+    """Per-stage budget usage of queries run with a deadline, for tuning the SLO and its split"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def record(self, elapsed: float, slo: float, stages: List[tuple]) -> None:
+        """stages: (stage, budget, used, cut_off) in the order they ran"""
+        with self._lock:
+            self.queries += 1
+            self.slo_misses += int(elapsed > slo)
+            self.latencies.append(elapsed)
+            for stage, budget, used, cut_off in stages:
+                entry = self.stages.setdefault(stage, {"runs": 0, "cut_off": 0, "samples": deque(maxlen=SAMPLE_WINDOW)})
+                entry["runs"] += 1
+                entry["cut_off"] += int(cut_off)
+                # (budget, used) pairs, so utilization pairs each run's usage with its own budget
+                entry["samples"].append((budget, used))
+
+    def summary(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                "queries": self.queries,
+                "slo_misses": self.slo_misses,
+                "p50_latency": _percentile(latencies, 0.50),
+                "p95_latency": _percentile(latencies, 0.95),
+                "stages": {
+                    stage: {
+                        "runs": entry["runs"],
+                        "cut_off": entry["cut_off"],
+                        "p50_budget": _percentile(sorted(b for b, _ in entry["samples"]), 0.50),
+                        "p50_used": _percentile(sorted(u for _, u in entry["samples"]), 0.50),
+                        "p95_used": _percentile(sorted(u for _, u in entry["samples"]), 0.95),
+                        "p95_utilization": _percentile(sorted(u / b for b, u in entry["samples"] if b), 0.95),
+                    }
+                    for stage, entry in self.stages.items()
+                },
+            }
+
+    def format_summary(self) -> str:
+        """Render the summary as a small text table"""
+        s = self.summary()
+        lines = [
+            f"{s['queries']} queries with a deadline, {s['slo_misses']} over the SLO, "
+            f"p50={s['p50_latency']:.2f}s p95={s['p95_latency']:.2f}s",
+            f"{'stage':<18} {'runs':>5} {'cut off':>7} {'budget s':>9} {'p50 s':>7} {'p95 s':>7} {'p95 use':>8}",
+        ]
+        for stage, st in sorted(s["stages"].items()):
+            lines.append(
+                f"{stage:<18} {st['runs']:>5} {st['cut_off']:>7} {st['p50_budget']:>9.2f} {st['p50_used']:>7.2f} "
+                f"{st['p95_used']:>7.2f} {st['p95_utilization']:>8.0%}"
+            )
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.queries = 0
+            self.slo_misses = 0
+            self.latencies: Deque[float] = deque(maxlen=SAMPLE_WINDOW)
+            self.stages: Dict[str, dict] = {}
+
+
+class FailoverMetrics:
+    """Provider failures, open circuits, failovers and hedged requests"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def failure(self, provider: str) -> None:
+        with self._lock:
+            self.failures[provider] = self.failures.get(provider, 0) + 1
+
+    def opened(self, provider: str) -> None:
+        with self._lock:
+            self.circuits_opened[provider] = self.circuits_opened.get(provider, 0) + 1
+
+    def skipped(self, provider: str) -> None:
+        """A call did not try provider because its circuit was open"""
+        with self._lock:
+            self.skips[provider] = self.skips.get(provider, 0) + 1
+
+    def failover(self, role: str, primary: str, provider: str) -> None:
+        """A role's call was answered by a provider other than its own"""
+        with self._lock:
+            key = f"{role}:{primary}->{provider}"
+            self.failovers[key] = self.failovers.get(key, 0) + 1
+
+    def hedge(self, provider: str, won: bool) -> None:
+        """A hedged request to provider was started; won if it answered first"""
+        with self._lock:
+            self.hedges += 1
+            self.hedges_won += int(won)
+            self.hedge_providers[provider] = self.hedge_providers.get(provider, 0) + 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "failures": dict(self.failures),
+                "circuits_opened": dict(self.circuits_opened),
+                "skipped_open": dict(self.skips),
+                "failovers": dict(self.failovers),
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+                "hedge_providers": dict(self.hedge_providers),
+            }
+
+    def format_summary(self) -> str:
+        s = self.summary()
+        return "\n".join(f"{name:<16} {value}" for name, value in s.items())
+
+    def reset(self) -> None:
+        with self._lock:
+            self.failures: Dict[str, int] = {}
+            self.circuits_opened: Dict[str, int] = {}
+            self.skips: Dict[str, int] = {}
+            self.failovers: Dict[str, int] = {}
+            self.hedges = 0
+            self.hedges_won = 0
+            self.hedge_providers: Dict[str, int] = {}
+
+
+# Process-wide collectors shared by all agents
+llm_metrics = LLMMetrics()
+cancel_metrics = CancelMetrics()
+deadline_metrics = DeadlineMetrics()
+failover_metrics = FailoverMetrics()
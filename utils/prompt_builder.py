@@ -0,0 +1,114 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import re
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from utils.config import Config
+from utils.metrics import estimate_tokens
+
+_TRAILING_SPACE = re.compile(r"[ \t]+\n")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+class RenderedPrompt(str):
+    """Full prompt text that also keeps its static prefix, dynamic part and per-section token counts"""
+
+    static: str
+    dynamic: str
+    sections: Dict[str, int]
+
+    def __new__(cls, static: str, dynamic: str, sections: Dict[str, int]):
+        prompt = super().__new__(cls, f"{static}\n\n{dynamic}" if dynamic else static)
+        prompt.static = static
+        prompt.dynamic = dynamic
+        prompt.sections = sections
+        return prompt
+
+    def messages(self, cache: bool = False) -> List[BaseMessage]:
+        """Chat messages: the static prefix as the system message (cacheable), the rest as the user turn"""
+        system = self.static
+        if cache:
+            system = [{"type": "text", "text": self.static, "cache_control": {"type": "ephemeral"}}]
+        return [SystemMessage(content=system), HumanMessage(content=self.dynamic)]
+
+
+class CompiledPrompt:
+    """Prompt with its instructions rendered once and compact, ordered dynamic sections after them"""
+
+    def __init__(self, name: str, instructions: str, sections: List[Tuple[str, str]]):
+        self.name = name
+        # Static prefix is identical across calls, so providers can cache it
+        self.static = instructions.strip()
+        self.static_tokens = estimate_tokens(self.static)
+        self.sections = sections
+        self.input_variables = [variable for variable, _ in sections]
+
+    def format(self, **values: Any) -> RenderedPrompt:
+        parts = []
+        counts = {"instructions": self.static_tokens}
+        for variable, header in self.sections:
+            text = render_value(values.get(variable))
+            if not text:
+                # Empty history or context sections are left out instead of rendering a bare header
+                continue
+            inline = "\n" not in text and len(text) <= 200
+            parts.append(f"{header} {text}" if inline else f"{header}\n{text}")
+            counts[variable] = estimate_tokens(text)
+        return RenderedPrompt(self.static, "\n\n".join(parts), counts)
+
+
+def render_value(value: Any) -> str:
+    """Compact text for a prompt input: history, search results, JSON data or plain text"""
+    if value is None or (isinstance(value, (dict, list)) and not value):
+        return ""
+    if isinstance(value, str):
+        return compact_text(value)
+    if isinstance(value, list) and value and all(isinstance(item, BaseMessage) for item in value):
+        return format_history(value)
+    if isinstance(value, list) and value and all(isinstance(item, dict) and "snippet" in item for item in value):
+        return format_search_results(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return ", ".join(value)
+    if isinstance(value, (dict, list)):
+        return compact_json(value)
+    return compact_text(str(value))
+
+
+def compact_text(text: str) -> str:
+    """Strip trailing spaces and collapse runs of blank lines"""
+    text = _TRAILING_SPACE.sub("\n", text.strip())
+    return _BLANK_LINES.sub("\n\n", text)
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def format_history(messages: List[BaseMessage], max_chars: Optional[int] = None) -> str:
+    """One line per message instead of the message objects' repr"""
+    max_chars = max_chars or Config.prompt_config.history_chars
+    speakers = {"human": "User", "ai": "Assistant", "system": "Summary"}
+    lines = []
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        # Cut before collapsing whitespace so long answers are not scanned in full
+        content = " ".join(content[:max_chars * 2].split())
+        if len(content) > max_chars:
+            content = content[:max_chars] + "…"
+        lines.append(f"{speakers.get(message.type, message.type)}: {content}")
+    return "\n".join(lines)
+
+
+def format_search_results(results: List[Dict[str, Any]], max_chars: Optional[int] = None) -> str:
+    """Numbered results with trimmed snippets instead of a list-of-dicts repr"""
+    max_chars = max_chars or Config.prompt_config.snippet_chars
+    lines = []
+    for i, result in enumerate(results, 1):
+        snippet = " ".join(result.get("snippet", "")[:max_chars * 2].split())
+        if len(snippet) > max_chars:
+            snippet = snippet[:max_chars].rsplit(" ", 1)[0] + "…"
+        date = f" ({result['date']})" if result.get("date") else ""
+        lines.append(f"{i}. {result.get('title', '')}{date} [source: {result.get('link', '')}]\n{snippet}")
+        if result.get("content"):
+            # Passages from the fetched page (PageEnricher), already trimmed
+            lines.append(f"Page excerpt:\n{result['content']}")
+    return "\n".join(lines)
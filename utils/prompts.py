@@ -1,20 +1,14 @@
-from langchain.prompts import PromptTemplate
+from utils.prompt_builder import CompiledPrompt
 
+# Instructions come first and never change between calls (cached by providers that support it);
+# per-call inputs follow as compact sections in the order listed
 
-META_AGENT_PROMPT = PromptTemplate(
-    input_variables=["query", "available_agents", "meta_history"],
-    template="""Analyze this query and determine the minimal necessary agents needed:
-
-Previous Analysis History:
-{meta_history}
-
-Available Agents:
-{available_agents}
-
-Query: {query}
+META_AGENT_PROMPT = CompiledPrompt(
+    "meta_agent",
+    instructions="""Analyze this query and determine the minimal necessary agents needed:
 
 First, classify the query type and complexity:
-1. PRICE_CHECK: Simple price or market data request (ONLY for specific stock symbols)
+1. PRICE_CHECK: Simple price or market data request (ONLY for specific stocks)
 2. EDUCATIONAL: Detailed learning or how-to request
 3. ANALYSIS: Complex market analysis request
 4. INFORMATIONAL: Basic information request
@@ -27,12 +21,13 @@ Complexity Level:
 Then, select ONLY the necessary agents:
 - pdf -> For educational/background knowledge
 - web -> For current context/news
-- finance -> ONLY for specific stock symbols like (AAPL) or TSLA
+- finance -> ONLY for specific stocks like (AAPL), TSLA or Nvidia
 
 CRITICAL RULES FOR AGENT SELECTION:
-1. ONLY use finance agent when query contains explicit stock symbols:
+1. ONLY use finance agent when query names specific listed companies:
    - Parentheses format: (AAPL), (MSFT), (GOOGL)
    - Direct tickers: TSLA, NVDA, AMD
+   - Company names: Apple, Nvidia, Bank of America
 2. General financial topics (rates, markets, trends) -> use web agent
 3. Market education/analysis without specific stocks -> use web + pdf
 
@@ -57,27 +52,19 @@ Examples:
 -> Complexity: INTERMEDIATE
 -> Agents: finance only
 
-Respond with:
-QUERY_TYPE: <type>
-COMPLEXITY: <level>
-WORKFLOW:
-agent_name -> specific reason for using this agent
-(only include necessary agents)
-
-REASON: Brief explanation of workflow strategy and required depth"""
+Respond with ONLY a compact JSON object, no prose or code fences:
+{"query_type": "<type>", "complexity": "<level>", "workflow": [{"agent": "<agent_name>", "reason": "<short reason>"}], "reason": "<one sentence strategy>"}
+(only include necessary agents in workflow)""",
+    sections=[
+        ("meta_history", "Previous Analysis History:"),
+        ("available_agents", "Available Agents:"),
+        ("query", "Query:"),
+    ]
 )
 
-WEB_AGENT_PROMPT = PromptTemplate(
-    input_variables=["search_results", "query", "web_history"],
-    template="""You are an expert web information analyst specializing in real-time financial and market data extraction and synthesis.
-
-Previous Interactions:
-{web_history}
-
-Search Results:
-{search_results}
-
-Query: {query}
+WEB_AGENT_PROMPT = CompiledPrompt(
+    "web_agent",
+    instructions="""You are an expert web information analyst specializing in real-time financial and market data extraction and synthesis.
 
 Provide a comprehensive analysis following this structure:
 
@@ -100,17 +87,17 @@ CRITICAL RULES:
 3. Format ALL dates as 'Month DD, YYYY' (Example: November 28, 2024)
 4. Do not summarize without citing sources
 
-Keep the response clear and well-structured, but natural - no JSON or complex formatting.""")
-
-SYNTHESIS_PROMPT = PromptTemplate(
-    input_variables=["query", "agent_responses", "chat_history"],
-    template="""Create a comprehensive response using the provided agent information.
-
-Previous Conversation Context:
-{chat_history}
+Keep the response clear and well-structured, but natural - no JSON or complex formatting.""",
+    sections=[
+        ("web_history", "Previous Interactions:"),
+        ("search_results", "Search Results:"),
+        ("query", "Query:"),
+    ]
+)
 
-Current Query: {query}
-Agent Information: {agent_responses}
+SYNTHESIS_PROMPT = CompiledPrompt(
+    "synthesis",
+    instructions="""Create a comprehensive response using the provided agent information.
 
 CORE RULES:
 1. NEVER mention sources or analysis methods
@@ -124,6 +111,7 @@ CORE RULES:
 9. Each section must provide unique value
 10. When source material is limited, expand with relevant expertise
 11. Balance theoretical knowledge with practical examples
+12. If a section is marked (unavailable: ...), answer from the rest and say in one sentence which kind of information (document background, web news or live market data) could not be included
 
 For EDUCATIONAL QUERIES:
 1. Start with a clear, concise definition
@@ -187,19 +175,79 @@ Remember to:
 - Progress logically from basics to advanced
 - Avoid repeating information between sections
 
-Create a focused response that thoroughly answers all aspects of the query while maintaining a clear narrative flow.""")
+Create a focused response that thoroughly answers all aspects of the query while maintaining a clear narrative flow.""",
+    sections=[
+        ("chat_history", "Previous Conversation Context:"),
+        ("query", "Current Query:"),
+        ("agent_responses", "Agent Information:"),
+    ]
+)
 
-PDF_AGENT_PROMPT = PromptTemplate(
-    input_variables=["context", "query", "pdf_history"],
-    template="""You are an expert document analyst and subject matter expert. Your goal is to provide comprehensive answers by combining document evidence with your deep expertise. You have access to both relevant documents and extensive knowledge in the field.
+INCREMENTAL_SYNTHESIS_PROMPT = CompiledPrompt(
+    "incremental_synthesis",
+    instructions="""Begin a comprehensive response using the agent information gathered so far.
 
-Previous Document Analysis:
-{pdf_history}
+More information (listed under Still Being Gathered) is still being gathered and will be added in a second part.
 
-Context Documents:
-{context}
+Write ONLY the opening part:
+1. Opening Definition/Overview
+2. Core Concepts (with specific examples)
 
-Query: {query}
+RULES:
+1. NEVER mention sources, agents, analysis methods or that more information is coming
+2. Format ALL dates as 'Month DD, YYYY' (Example: November 28, 2024)
+3. Do not write conclusions, risk management or action items yet
+4. Preserve technical accuracy while maintaining readability""",
+    sections=[
+        ("chat_history", "Previous Conversation Context:"),
+        ("query", "Current Query:"),
+        ("agent_responses", "Agent Information:"),
+        ("pending_agents", "Still Being Gathered:"),
+    ]
+)
+
+CONTINUATION_SYNTHESIS_PROMPT = CompiledPrompt(
+    "continuation_synthesis",
+    instructions="""Continue the response below using the newly gathered agent information.
+
+RULES:
+1. Continue directly after the response so far; do not repeat or restate it
+2. Integrate current data, news and market figures from the new information
+3. If the new information contradicts the response so far, state the corrected facts explicitly
+4. Finish with Practical Implementation, Risk Management and Action Items where relevant
+5. NEVER mention sources, agents or analysis methods
+6. Format ALL dates as 'Month DD, YYYY' (Example: November 28, 2024)
+7. If a section is marked (unavailable: ...), say in one sentence which kind of information (document background, web news or live market data) could not be included""",
+    sections=[
+        ("chat_history", "Previous Conversation Context:"),
+        ("query", "Current Query:"),
+        ("draft", "Response So Far:"),
+        ("agent_responses", "New Agent Information:"),
+    ]
+)
+
+LIGHT_SYNTHESIS_PROMPT = CompiledPrompt(
+    "light_synthesis",
+    instructions="""Adapt the specialist answer below into the reply to the user's latest question.
+
+RULES:
+1. Keep every fact, number and date from the specialist answer
+2. Resolve references to earlier turns ("it", "that stock") using the conversation context
+3. NEVER mention sources, agents or analysis methods
+4. Format ALL dates as 'Month DD, YYYY'
+5. Do not add new sections or repeat the conversation back
+
+Reply directly with the adapted answer.""",
+    sections=[
+        ("chat_history", "Previous Conversation Context:"),
+        ("query", "Current Query:"),
+        ("agent_response", "Specialist Answer:"),
+    ]
+)
+
+PDF_AGENT_PROMPT = CompiledPrompt(
+    "pdf_agent",
+    instructions="""You are an expert document analyst and subject matter expert. Your goal is to provide comprehensive answers by combining document evidence with your deep expertise. You have access to both relevant documents and extensive knowledge in the field.
 
 Internal Analysis Process (do not include in response):
 1. Extract key information from documents
@@ -220,19 +268,17 @@ Remember:
 - Use a natural, flowing style
 - Include both theoretical knowledge and practical applications
 
-Keep your response clear, comprehensive, and focused on providing value to the user.""")
-
-FINANCE_AGENT_PROMPT = PromptTemplate(
-    input_variables=["market_data", "query", "finance_history"],
-    template="""You are an expert financial analyst.
-
-Previous Market Analysis:
-{finance_history}
-
-Current Market Data:
-{market_data}
+Keep your response clear, comprehensive, and focused on providing value to the user.""",
+    sections=[
+        ("pdf_history", "Previous Document Analysis:"),
+        ("context", "Context Documents:"),
+        ("query", "Query:"),
+    ]
+)
 
-Query: {query}
+FINANCE_AGENT_PROMPT = CompiledPrompt(
+    "finance_agent",
+    instructions="""You are an expert financial analyst.
 
 CRITICAL RULES:
 1. Reference previous analysis when relevant
@@ -251,6 +297,7 @@ TECHNICAL ASSESSMENT:
 - Price Levels: Support/resistance if relevant
 - Volume Analysis: Trading activity insights
 - Pattern Recognition: Notable chart patterns
+- Indicators: Use the precomputed technical indicators when provided (moving averages, RSI, volatility, drawdown, correlations); never invent values that are not given
 
 FUNDAMENTAL REVIEW:
 - Financial Health: Key ratios and metrics
@@ -260,5 +307,11 @@ FUNDAMENTAL REVIEW:
 RESPONSE:
 Provide a clear, natural language summary that directly answers the query while incorporating your analysis.
 
-Keep your response clear and well-structured, but natural - avoid any special formatting.""")
-
+Keep your response clear and well-structured, but natural - avoid any special formatting.""",
+    sections=[
+        ("finance_history", "Previous Market Analysis:"),
+        ("market_data", "Current Market Data:"),
+        ("technicals", "Technical Indicators:"),
+        ("query", "Query:"),
+    ]
+)
@@ -0,0 +1,122 @@
+from collections import deque
+from typing import Dict, List, Optional
+import threading
+import time
+from utils.config import Config
+from utils.metrics import failover_metrics
+
+# Chat providers that take message lists and support tool calling
+CHAT_PROVIDERS = ("groq", "anthropic")
+
+
+class ProviderUnavailable(Exception):
+    """Every provider for a role failed or has its circuit open"""
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `cooldown` seconds calls are let through again on trial"""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self) -> bool:
+        """Count a failure; True if it opened the circuit (or a failed trial re-opened it)"""
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class ProviderHealth:
+    """Circuit breaker and recent time-to-first-token of one provider, shared by every role and session"""
+
+    def __init__(self, name: str, settings):
+        self.name = name
+        self.settings = settings
+        self.breaker = CircuitBreaker(settings.breaker_failures, settings.breaker_cooldown)
+        self.ttfts = deque(maxlen=200)
+
+    def record_ttft(self, seconds: float) -> None:
+        self.ttfts.append(seconds)
+
+    def hedge_delay(self) -> float:
+        """How long to wait for a first token before hedging: this provider's p95 TTFT once there is enough history"""
+        if len(self.ttfts) < self.settings.hedge_min_samples:
+            return self.settings.hedge_delay
+        ttfts = sorted(self.ttfts)
+        p95 = ttfts[min(len(ttfts) - 1, int(round(0.95 * (len(ttfts) - 1))))]
+        return max(p95, self.settings.hedge_min_delay)
+
+
+class ProviderPool:
+    """Providers to try for a role: its configured one first, then the LLM_FAILOVER order, skipping open circuits"""
+
+    def __init__(self):
+        self._health: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def health(self, provider: str) -> ProviderHealth:
+        with self._lock:
+            if provider not in self._health:
+                self._health[provider] = ProviderHealth(provider, Config.failover_config)
+            return self._health[provider]
+
+    def chain(self, role: str) -> List[str]:
+        """Every provider for a role in failover order, healthy or not"""
+        primary = Config.model_config.for_role(role).provider
+        chain = [primary]
+        for provider in Config.failover_config.providers:
+            if provider not in chain and Config.model_config.has_credentials(provider):
+                chain.append(provider)
+        return chain
+
+    def candidates(self, role: str) -> List[str]:
+        """Providers that may be called now; empty when every circuit is open, so callers fail fast"""
+        chain = self.chain(role)
+        if len(chain) == 1:
+            # Nothing to fail over to: an open circuit would only turn intermittent errors into certain ones
+            return chain
+        allowed = []
+        for provider in chain:
+            if self.health(provider).breaker.allow():
+                allowed.append(provider)
+            else:
+                failover_metrics.skipped(provider)
+        return allowed
+
+    def success(self, provider: str) -> None:
+        self.health(provider).breaker.success()
+
+    def failure(self, provider: str, error: Exception) -> None:
+        failover_metrics.failure(provider)
+        if self.health(provider).breaker.failure():
+            failover_metrics.opened(provider)
+            print(f"Circuit open for {provider} after: {str(error)[:200]}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._health.clear()
+
+
+# Process-wide: a provider that is down is down for every session
+provider_pool = ProviderPool()
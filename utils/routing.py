@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Union
+import json
+
+QUERY_TYPES = ["PRICE_CHECK", "EDUCATIONAL", "ANALYSIS", "INFORMATIONAL"]
+COMPLEXITY_LEVELS = ["BASIC", "INTERMEDIATE", "ADVANCED"]
+
+ROUTING_RETRY_SUFFIX = """
+
+Your previous answer was rejected: {error}
+Respond with ONLY the JSON object."""
+
+
+class RoutingError(Exception):
+    """Raised when a routing response is not a valid plan"""
+
+
+def routing_schema(agents: List[str]) -> Dict[str, Any]:
+    """JSON schema for the routing plan, used for provider tool-calling"""
+    return {
+        "title": "route_query",
+        "description": "Select the minimal set of agents needed to answer the query",
+        "type": "object",
+        "properties": {
+            "query_type": {"type": "string", "enum": QUERY_TYPES},
+            "complexity": {"type": "string", "enum": COMPLEXITY_LEVELS},
+            "workflow": {
+                "type": "array",
+                "minItems": 1,
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "agent": {"type": "string", "enum": agents},
+                        "reason": {"type": "string"}
+                    },
+                    "required": ["agent", "reason"]
+                }
+            },
+            "reason": {"type": "string"}
+        },
+        "required": ["query_type", "complexity", "workflow", "reason"]
+    }
+
+
+def parse_routing_plan(response: Union[str, dict], agents: List[str]) -> dict:
+    """Parse and validate a routing plan against the registered agents"""
+    plan = response if isinstance(response, dict) else _load_json(response)
+
+    workflow = plan.get("workflow")
+    if not isinstance(workflow, list) or not workflow:
+        raise RoutingError("'workflow' must be a non-empty list")
+
+    steps = []
+    for step in workflow:
+        if not isinstance(step, dict):
+            raise RoutingError(f"Workflow step must be an object, got {step!r}")
+        agent = str(step.get("agent", "")).strip().lower()
+        if agent not in agents:
+            raise RoutingError(f"Unknown agent {agent!r}, expected one of {agents}")
+        if agent not in [s["agent"] for s in steps]:
+            steps.append({"agent": agent, "reason": str(step.get("reason", "")).strip()})
+
+    return {
+        "query_type": str(plan.get("query_type", "ANALYSIS")).upper(),
+        "complexity": str(plan.get("complexity", "INTERMEDIATE")).upper(),
+        "workflow": steps,
+        "reason": str(plan.get("reason", "")).strip()
+    }
+
+
+def _load_json(text: str) -> dict:
+    """Extract the JSON object from a text response, tolerating code fences"""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise RoutingError("Response contains no JSON object")
+    try:
+        plan = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise RoutingError(f"Invalid JSON: {e.msg}")
+    if not isinstance(plan, dict):
+        raise RoutingError("Routing plan must be a JSON object")
+    return plan
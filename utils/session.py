@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+# Session values for code running outside a Chainlit websocket (CLI, benchmarks)
+_local_session: ContextVar[Optional[Dict[str, Any]]] = ContextVar("local_session", default=None)
+
+
+def get(key: str, default: Any = None) -> Any:
+    """Get a value from the current session (local or Chainlit)"""
+    local = _local_session.get()
+    if local is not None:
+        return local.get(key, default)
+
+    import chainlit as cl
+    return cl.user_session.get(key, default)
+
+
+def set(key: str, value: Any) -> None:
+    """Set a value on the current session (local or Chainlit)"""
+    local = _local_session.get()
+    if local is not None:
+        local[key] = value
+        return
+
+    import chainlit as cl
+    cl.user_session.set(key, value)
+
+
+@contextmanager
+def local_session(**values):
+    """Run a block with its own session values instead of cl.user_session"""
+    token = _local_session.set(dict(values))
+    try:
+        yield _local_session.get()
+    finally:
+        _local_session.reset(token)
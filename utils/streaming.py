@@ -0,0 +1,137 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import sys
+import time
+import uuid
+from utils.callbacks import TokenBuffer
+
+# Request the current task is working on; inherited by agent tasks it spawns
+_current_request: ContextVar[Optional[str]] = ContextVar("current_request", default=None)
+
+
+@dataclass
+class StreamEvent:
+    kind: str  # "start", "token" or "end"
+    agent: str
+    request_id: str
+    role: Optional[str] = None
+    token: str = ""
+    metadata: dict = field(default_factory=dict)
+
+
+class StreamDispatcher:
+    """Receives tagged stream events for one session and renders them"""
+
+    async def dispatch(self, event: StreamEvent) -> None:
+        handler = getattr(self, f"on_{event.kind}", None)
+        if handler:
+            await handler(event)
+
+    async def on_start(self, event: StreamEvent) -> None:
+        pass
+
+    async def on_token(self, event: StreamEvent) -> None:
+        pass
+
+    async def on_end(self, event: StreamEvent) -> None:
+        pass
+
+
+class ConsoleDispatcher(StreamDispatcher):
+    """Streams the answer to stdout; agent outputs are printed as whole blocks so they never interleave"""
+
+    def __init__(self):
+        self.buffers: Dict[tuple, TokenBuffer] = {}
+        self.live: Dict[str, str] = {}
+
+    async def on_start(self, event: StreamEvent) -> None:
+        if event.agent == "meta" or event.metadata.get("direct"):
+            self.live[event.request_id] = event.agent
+        else:
+            self.buffers[(event.request_id, event.agent)] = TokenBuffer()
+
+    async def on_token(self, event: StreamEvent) -> None:
+        if event.role == "router":
+            return
+        buffer = self.buffers.get((event.request_id, event.agent))
+        if buffer:
+            buffer.append(event.token)
+        elif self.live.get(event.request_id) == event.agent:
+            sys.stdout.write(event.token)
+            sys.stdout.flush()
+
+    async def on_end(self, event: StreamEvent) -> None:
+        buffer = self.buffers.pop((event.request_id, event.agent), None)
+        if buffer:
+            sys.stdout.write(f"\n[{event.agent}]\n{buffer.text}\n")
+        elif self.live.get(event.request_id) == event.agent:
+            self.live.pop(event.request_id)
+            sys.stdout.write("\n")
+        sys.stdout.flush()
+
+
+class CollectingDispatcher(StreamDispatcher):
+    """Keeps the answer text, the agents that ran and answer timing, for callers that want a result instead of a live view"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.agents = []
+        self.answer_agent: Optional[str] = None
+        self.first_token: Optional[float] = None
+        self.tokens = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self.tokens).strip()
+
+    async def on_start(self, event: StreamEvent) -> None:
+        if event.agent == "meta" or event.metadata.get("direct"):
+            self.answer_agent = event.agent
+        if event.agent != "meta" and event.agent not in self.agents:
+            self.agents.append(event.agent)
+
+    async def on_token(self, event: StreamEvent) -> None:
+        if event.role == "router" or event.agent != self.answer_agent:
+            return
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+        self.tokens.append(event.token)
+
+
+class StreamMultiplexer:
+    """Routes agent start/end and token events to the dispatcher of the request they belong to"""
+
+    def __init__(self):
+        self._dispatchers: Dict[str, StreamDispatcher] = {}
+
+    @asynccontextmanager
+    async def request(self, dispatcher: StreamDispatcher, request_id: Optional[str] = None):
+        """Register a dispatcher for one query; agent calls made inside are routed to it"""
+        request_id = request_id or uuid.uuid4().hex[:12]
+        self._dispatchers[request_id] = dispatcher
+        token = _current_request.set(request_id)
+        try:
+            yield request_id
+        finally:
+            _current_request.reset(token)
+            self._dispatchers.pop(request_id, None)
+
+    def current_request_id(self) -> Optional[str]:
+        request_id = _current_request.get()
+        return request_id if request_id in self._dispatchers else None
+
+    async def emit(self, kind: str, agent: str, role: Optional[str] = None, token: str = "", **metadata) -> None:
+        """Send a lifecycle (start/end) or token event for the current request"""
+        request_id = self.current_request_id()
+        if request_id is None:
+            return
+        await self._dispatchers[request_id].dispatch(StreamEvent(
+            kind=kind,
+            agent=agent,
+            request_id=request_id,
+            role=role,
+            token=token,
+            metadata=metadata
+        ))
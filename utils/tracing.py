@@ -0,0 +1,129 @@
+from contextlib import contextmanager
+from typing import Optional, Sequence
+import functools
+import inspect
+import json
+import threading
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.trace import Status, StatusCode
+from utils.config import Config
+
+tracer = trace.get_tracer("expert_agent")
+_configured = False
+
+
+class JsonFileSpanExporter(SpanExporter):
+    """Appends finished spans to a JSON-lines file, one span per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = [json.dumps(span_to_dict(span)) for span in spans]
+        with self._lock, open(self.path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def span_to_dict(span: ReadableSpan) -> dict:
+    """Flat, human-readable span record"""
+    return {
+        "name": span.name,
+        "trace_id": format(span.context.trace_id, "032x"),
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "start_time": span.start_time / 1e9,
+        "duration_ms": (span.end_time - span.start_time) / 1e6,
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {})
+    }
+
+
+def configure_tracing() -> None:
+    """Install the span exporter selected by TRACE_EXPORTER (none, otlp, json, console) once per process"""
+    global _configured
+    settings = Config.tracing_config
+    if _configured or settings.exporter == "none":
+        return
+
+    if settings.exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=settings.otlp_endpoint)
+    elif settings.exporter == "json":
+        exporter = JsonFileSpanExporter(settings.trace_file)
+    elif settings.exporter == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unknown trace exporter: {settings.exporter}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _configured = True
+    print(f"Tracing enabled ({settings.exporter})")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Start a child span of the current one; exceptions are recorded and re-raised"""
+    with tracer.start_as_current_span(name, attributes=_clean(attributes)) as current:
+        yield current
+
+
+def traced(name: str):
+    """Decorator wrapping a sync or async function in a span"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attributes) -> None:
+    """Add attributes to the current span (no-op outside a span)"""
+    trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def mark_error(message: str) -> None:
+    """Flag the current span as failed for errors returned as strings rather than raised"""
+    trace.get_current_span().set_status(Status(StatusCode.ERROR, message))
+
+
+def _clean(attributes: dict) -> dict:
+    # OpenTelemetry attributes must be primitives (or lists of them) and never None
+    clean = {}
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if not isinstance(value, (str, bool, int, float, list, tuple)):
+            value = str(value)
+        clean[key] = value
+    return clean
+
+
+def shutdown_tracing(timeout_millis: Optional[int] = 5000) -> None:
+    """Flush pending spans, e.g. before a batch run exits"""
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "force_flush"):
+        provider.force_flush(timeout_millis)
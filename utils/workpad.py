@@ -1,16 +1,31 @@
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional
 
 class Workpad:
     def __init__(self):
         self.content: Dict[str, str] = {}
         self.metadata: Dict[str, dict] = {}
+        self.pending: List[str] = []
+        # Agents cut off or unavailable for this query, with the reason shown to synthesis
+        self.missing: Dict[str, str] = {}
+        
+    def expect(self, agents: Iterable[str]):
+        """Mark agents whose output has not arrived yet"""
+        self.pending = [agent for agent in agents if agent not in self.content]
         
     def write(self, agent: str, content: str, metadata: Optional[dict] = None):
         """Write agent output to workpad"""
         self.content[agent] = content
+        if agent in self.pending:
+            self.pending.remove(agent)
         if metadata:
             self.metadata[agent] = metadata
             
+    def mark_missing(self, agent: str, reason: str):
+        """Record that an agent produced nothing for this query"""
+        self.missing[agent] = reason
+        if agent in self.pending:
+            self.pending.remove(agent)
+            
     def get_content(self, agent: str) -> Optional[str]:
         """Get specific agent's content"""
         return self.content.get(agent)
@@ -19,7 +34,18 @@ class Workpad:
         """Get all content"""
         return self.content
         
+    def render(self, agents: Optional[Iterable[str]] = None) -> str:
+        """Render agent outputs as compact text sections for synthesis prompts"""
+        agents = list(agents) if agents is not None else list(self.content) + list(self.missing)
+        return "\n\n".join(
+            f"[{agent}]\n{self.content[agent].strip()}" if agent in self.content
+            else f"[{agent}]\n(unavailable: {self.missing[agent]})"
+            for agent in agents if agent in self.content or agent in self.missing
+        )
+        
     def clear(self):
         """Clear workpad"""
         self.content.clear()
-        self.metadata.clear() 
\ No newline at end of file
+        self.metadata.clear()
+        self.pending.clear()
+        self.missing.clear()